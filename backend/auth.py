@@ -1,24 +1,128 @@
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import hashlib
 import os
+import time
+
+import metrics
+from database import users_collection
 
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
 ALGORITHM = 'HS256'
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', '4096'))
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', '4096'))
+USER_CACHE_TTL_SECONDS = int(os.environ.get('USER_CACHE_TTL_SECONDS', '30'))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '2'))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', '32'))
 
 pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 security = HTTPBearer()
 
+class ExpiringLRUCache:
+    """Bounded LRU mapping whose entries each expire at their own deadline"""
+    def __init__(self, max_entries: int, name: str):
+        self.max_entries = max_entries
+        self.name = name
+        self._entries = OrderedDict()
+
+    def get(self, key) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.time():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            metrics.cache_lookups.inc(cache=self.name, result='miss')
+            return None
+        metrics.cache_lookups.inc(cache=self.name, result='hit')
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key, value, expires_at: float):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+# Verified token claims keyed by token digest, kept until the token's `exp`
+token_cache = ExpiringLRUCache(TOKEN_CACHE_SIZE, 'token')
+# User documents (without password hash) keyed by user_id
+user_cache = ExpiringLRUCache(USER_CACHE_SIZE, 'user')
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+password_hash_seconds = metrics.histogram(
+    'password_hash_seconds',
+    'Time spent hashing or verifying a password in the bcrypt pool',
+    ['operation']
+)
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated thread pool so it never blocks the event loop.
+
+    At most `workers` operations run at once and `queue_limit` more may wait;
+    beyond that requests fail fast with a 503 instead of piling up.
+    """
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, queue_limit: int = PASSWORD_HASH_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._pending = 0
+
+    async def hash(self, password: str) -> str:
+        return await self._run('hash', get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run('verify', verify_password, plain_password, hashed_password)
+
+    async def _run(self, operation: str, fn, *args):
+        if self._pending >= self.workers + self.queue_limit:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail='Too many password operations in progress, please retry',
+                headers={'Retry-After': '1'},
+            )
+        self._pending += 1
+        loop = asyncio.get_running_loop()
+        future = self._executor.submit(self._timed, operation, fn, *args)
+        # The slot is freed when the thread is done, not when the awaiting
+        # request is cancelled; bcrypt keeps running after a disconnect.
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+        return await asyncio.wrap_future(future)
+
+    def _release(self):
+        self._pending -= 1
+
+    @staticmethod
+    def _timed(operation: str, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            password_hash_seconds.observe(time.perf_counter() - started, operation=operation)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+password_hasher = PasswordHasher()
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -30,15 +134,21 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 def decode_token(token: str) -> dict:
+    digest = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(digest)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail='Could not validate credentials',
             headers={'WWW-Authenticate': 'Bearer'},
         )
+    if 'exp' in payload:
+        token_cache.set(digest, payload, payload['exp'])
+    return payload
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
@@ -59,4 +169,17 @@ async def get_admin_user(current_user: dict = Depends(get_current_user)):
             status_code=status.HTTP_403_FORBIDDEN,
             detail='Admin access required',
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+async def get_user_document(user_id: str) -> Optional[dict]:
+    """User document without its password hash, cached for USER_CACHE_TTL_SECONDS"""
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await users_collection.find_one({"user_id": user_id}, {"_id": 0, "password_hash": 0})
+        if user is None:
+            return None
+        user_cache.set(user_id, user, time.time() + USER_CACHE_TTL_SECONDS)
+    return user
+
+def invalidate_user(user_id: str):
+    user_cache.pop(user_id)
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""CPU cost of building and encoding the hot public read responses.
+
+Compares, per endpoint, the previous path (validated models, revalidated
+through `response_model`, then jsonable_encoder + json.dumps) with the one
+used now (trusted_content + orjson via the response cache), and shows what
+`model_construct` + orjson would cost instead. No database is needed; the
+documents are synthetic but shaped like production data.
+
+    python bench_serialization.py [--teams 500] [--iterations 200]
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import Callable, List
+
+import pydantic
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from http_cache import ResponseCache, trusted_content
+from models import Announcement, Country, LeaderboardEntry, Team
+
+
+def sample_data(team_count: int):
+    now = datetime.utcnow()
+    countries = [
+        {'country_id': f'country{i}', 'name': f'Country {i}', 'flag': '🏳️', 'color': '#123456', 'created_at': now}
+        for i in range(max(1, team_count // 10))
+    ]
+    teams = [
+        {
+            'team_id': f'team{i}', 'name': f'Team {i}', 'country_id': countries[i % len(countries)]['country_id'],
+            'country_name': countries[i % len(countries)]['name'], 'flag': '🏳️',
+            'shirt_design_url': f'/uploads/shirts/team{i}.png', 'color': '#ff0000', 'color2': '#ffffff',
+            'goals': team_count - i, 'created_at': now,
+        }
+        for i in range(team_count)
+    ]
+    entries = [
+        {
+            'rank': i + 1, 'team_id': team['team_id'], 'team_name': team['name'],
+            'country_name': team['country_name'], 'flag': team['flag'], 'goals': team['goals'], 'color': team['color'],
+        }
+        for i, team in enumerate(teams)
+    ]
+    announcements = [
+        {
+            'announcement_id': f'announcement{i}', 'icon': '📣', 'date': '2025-01-01', 'is_active': True,
+            'order': i, 'created_at': now, 'updated_at': now,
+            **{f'{kind}_{lang}': f'{kind} {i} ({lang}) ' * 4
+               for kind in ('title', 'description') for lang in ('en', 'es', 'pt', 'fr', 'it')},
+        }
+        for i in range(10)
+    ]
+    return countries, teams, entries, announcements
+
+
+def validated_path(model, documents: List[dict]) -> Callable[[], bytes]:
+    field = create_response_field(name='response', type_=List[model], mode='serialization')
+
+    loop = asyncio.new_event_loop()
+
+    def run() -> bytes:
+        content = [model(**document) for document in documents]
+        serialized = loop.run_until_complete(serialize_response(field=field, response_content=content))
+        return JSONResponse(serialized).body
+    return run
+
+
+def fast_path(model, documents: List[dict]) -> Callable[[], bytes]:
+    def run() -> bytes:
+        return ResponseCache._encode(trusted_content(model, documents))
+    return run
+
+
+def constructed_path(model, documents: List[dict]) -> Callable[[], bytes]:
+    def run() -> bytes:
+        return ResponseCache._encode([model.model_construct(**document) for document in documents])
+    return run
+
+
+def measure(run: Callable[[], bytes], iterations: int) -> float:
+    run()
+    start = time.process_time()
+    for _ in range(iterations):
+        run()
+    return (time.process_time() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--teams', type=int, default=500)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    countries, teams, entries, announcements = sample_data(args.teams)
+    endpoints = [
+        ('/api/countries', Country, countries),
+        ('/api/teams', Team, teams),
+        ('/api/leaderboard', LeaderboardEntry, entries),
+        ('/api/announcements', Announcement, announcements),
+    ]
+
+    print(f"pydantic {pydantic.VERSION}")
+    print(f"{'endpoint':<20} {'items':>6} {'before µs':>11} {'after µs':>10} {'saved µs':>10} {'speedup':>8} "
+          f"{'construct µs':>13}")
+    for path, model, documents in endpoints:
+        before, after = validated_path(model, documents), fast_path(model, documents)
+        constructed = constructed_path(model, documents)
+        assert json.loads(before()) == json.loads(after()), f"{path}: responses differ"
+        before_seconds = measure(before, args.iterations)
+        after_seconds = measure(after, args.iterations)
+        constructed_seconds = measure(constructed, args.iterations)
+        print(
+            f"{path:<20} {len(documents):>6} {before_seconds * 1e6:>11.0f} {after_seconds * 1e6:>10.0f} "
+            f"{(before_seconds - after_seconds) * 1e6:>10.0f} {before_seconds / after_seconds:>7.1f}x "
+            f"{constructed_seconds * 1e6:>13.0f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
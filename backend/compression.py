@@ -0,0 +1,143 @@
+"""gzip/brotli response compression.
+
+`CompressionMiddleware` compresses complete responses on the fly. Bodies
+served from `ResponseCache` arrive already encoded, since the cache keeps
+the compressed bytes next to the raw body, and are passed through
+untouched. Brotli is pinned in requirements.txt but stays optional: where
+the package is missing, only gzip is offered.
+"""
+import gzip
+import os
+from typing import Iterable, Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+# Bodies smaller than this are sent as they are; the savings would not pay
+# for the CPU and the extra headers
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+
+# Per-request compression favours speed; cached bodies are compressed once
+# per change, so they get the stronger settings unless they change nearly
+# as often as they are requested (see ResponseCache)
+DYNAMIC_LEVELS = {'br': 4, 'gzip': 6}
+CACHED_LEVELS = {'br': 9, 'gzip': 9}
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'text/')
+
+# Server preference when the client accepts several encodings equally
+SUPPORTED_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encoding: Optional[str], available: Iterable[str] = SUPPORTED_ENCODINGS) -> Optional[str]:
+    """Best of `available` the client accepts, or None for the identity encoding.
+
+    Honours q-values (`gzip;q=0` refuses gzip) and the `*` wildcard; ties
+    go to the order of `available`.
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for encoding in available:
+        weight = weights.get(encoding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    return bool(content_type) and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """Compresses complete compressible responses of at least `minimum_size` bytes.
+
+    Streaming responses (NDJSON exports, the live feed) and responses that
+    already carry a Content-Encoding are passed through unchanged. A strong
+    ETag is weakened when the body is compressed, since it no longer
+    describes the bytes on the wire.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(_header(scope['headers'], b'accept-encoding'))
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message['type'] == 'http.response.start':
+                start = message
+                return
+            if start is None or message['type'] != 'http.response.body':
+                await send(message)
+                return
+
+            headers = start.get('headers', [])
+            start_message, start = start, None
+            body = message.get('body', b'')
+            if (message.get('more_body', False)
+                    or _header(headers, b'content-encoding') is not None
+                    or not is_compressible(_header(headers, b'content-type'))
+                    or len(body) < self.minimum_size):
+                await send(start_message)
+                await send(message)
+                return
+
+            headers = [(name, value) for name, value in headers if name.lower() != b'vary'] + [
+                (b'vary', _vary(_header(headers, b'vary')))
+            ]
+            if encoding is not None:
+                body = compress(body, encoding, DYNAMIC_LEVELS[encoding])
+                headers = [
+                    (name, _weaken(value) if name.lower() == b'etag' else value)
+                    for name, value in headers if name.lower() != b'content-length'
+                ] + [(b'content-encoding', encoding.encode()), (b'content-length', str(len(body)).encode())]
+            await send({**start_message, 'headers': headers})
+            await send({**message, 'body': body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def _header(headers, name: bytes) -> Optional[str]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value.decode('latin-1')
+    return None
+
+
+def _vary(existing: Optional[str]) -> bytes:
+    if not existing:
+        return b'Accept-Encoding'
+    if 'accept-encoding' in existing.lower():
+        return existing.encode('latin-1')
+    return f'{existing}, Accept-Encoding'.encode('latin-1')
+
+
+def _weaken(etag: bytes) -> bytes:
+    return etag if etag.startswith(b'W/') else b'W/' + etag
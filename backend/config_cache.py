@@ -0,0 +1,58 @@
+from datetime import datetime
+from typing import Optional
+
+from pymongo import ReturnDocument
+
+from database import config_collection
+from http_cache import response_cache
+from models import GameConfig
+
+# Default configuration values
+DEFAULT_CONFIG = {
+    "config_id": "default",
+    "free_plays": 2,
+    "plays_per_ad": 2,
+    "plays_per_share": 2,
+    "max_ad_views": 5,
+    "max_share_rewards": 3
+}
+
+
+class GameConfigCache:
+    """In-memory GameConfig.
+
+    Updated in place by `update`; other worker processes reload it when the
+    'config' resource is published on the invalidation bus.
+    """
+
+    def __init__(self):
+        self._config = GameConfig(**DEFAULT_CONFIG)
+
+    @property
+    def config(self) -> GameConfig:
+        return self._config
+
+    async def load(self):
+        config = await config_collection.find_one({"config_id": "default"}, {"_id": 0})
+        self._apply(config)
+
+    async def update(self, update_data: dict) -> GameConfig:
+        update_data = {**update_data, "updated_at": datetime.utcnow()}
+        defaults = {k: v for k, v in DEFAULT_CONFIG.items() if k not in update_data}
+        config = await config_collection.find_one_and_update(
+            {"config_id": "default"},
+            {"$set": update_data, "$setOnInsert": defaults},
+            projection={"_id": 0},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._apply(config)
+        return self._config
+
+    def _apply(self, config: Optional[dict]):
+        # A missing document means the defaults, never an insert on the read path
+        self._config = GameConfig(**(config or DEFAULT_CONFIG))
+        response_cache.bump('config')
+
+
+game_config = GameConfigCache()
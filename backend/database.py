@@ -3,13 +3,32 @@ from dotenv import load_dotenv
 from pathlib import Path
 import os
 
+from instrumentation import CountingDatabase, mongo_listeners
+
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+if mongo_url.startswith('mongomock://'):
+    # In-memory stand-in for tests and load_test.py; needs mongomock-motor
+    from mongomock_motor import AsyncMongoMockClient
+    client = AsyncMongoMockClient()
+else:
+    client = AsyncIOMotorClient(mongo_url, event_listeners=mongo_listeners())
 db = client[os.environ.get('DB_NAME', 'mini_cup_db')]
+if mongo_url.startswith('mongomock://'):
+    db = CountingDatabase(db)
+
+# 'view': game_sessions is the only record of scored goals and `goals` is a
+# read-only view over it (see migrate_goals.py). 'dual': every scoring game
+# is also copied into a separate `goals` collection, as before.
+GOALS_STORAGE_MODE = os.environ.get('GOALS_STORAGE_MODE', 'view')
+if GOALS_STORAGE_MODE not in ('view', 'dual'):
+    raise ValueError(f"GOALS_STORAGE_MODE must be 'view' or 'dual', not {GOALS_STORAGE_MODE!r}")
+
+# Error code of a write rejected by a unique index
+DUPLICATE_KEY_ERROR = 11000
 
 # Collections
 countries_collection = db.countries
@@ -19,3 +38,7 @@ users_collection = db.users
 game_sessions_collection = db.game_sessions
 config_collection = db.config
 announcements_collection = db.announcements
+stats_rollups_collection = db.stats_rollups
+session_idempotency_collection = db.session_idempotency
+team_goal_shards_collection = db.team_goal_shards
+write_dead_letters_collection = db.write_dead_letters
@@ -0,0 +1,43 @@
+"""Sharded goal counters for teams that score faster than one document takes writes.
+
+A team's total is `teams.goals` plus the `goals` of its documents in
+`team_goal_shards`. Teams are unsharded by default; setting `goal_shards`
+above 1 on a team (PUT /api/admin/teams/{team_id}) sends each flushed
+increment to a random one of that many shard documents instead of the
+team document. The count can be changed at any time: shards past a
+lowered count stop receiving increments but are still summed.
+"""
+import random
+from typing import Dict, Tuple
+
+from pymongo import UpdateOne
+
+from database import team_goal_shards_collection
+from reference_cache import reference_cache
+
+
+def shard_count(team_id: str) -> int:
+    team = reference_cache.team(team_id)
+    return (team or {}).get('goal_shards') or 1
+
+
+def increment_ops(team_incs: Dict[str, int]) -> Tuple[Dict[str, UpdateOne], Dict[str, UpdateOne]]:
+    """Per-team goal increments as `teams` and `team_goal_shards` updates, keyed by team."""
+    team_ops, shard_ops = {}, {}
+    for team_id, goals_delta in team_incs.items():
+        shards = shard_count(team_id)
+        if shards > 1:
+            shard_ops[team_id] = UpdateOne(
+                {"team_id": team_id, "shard": random.randrange(shards)},
+                {"$inc": {"goals": goals_delta}},
+                upsert=True
+            )
+        else:
+            team_ops[team_id] = UpdateOne({"team_id": team_id}, {"$inc": {"goals": goals_delta}})
+    return team_ops, shard_ops
+
+
+async def shard_totals() -> Dict[str, int]:
+    """Goals held in shard documents, summed per team in one aggregation."""
+    pipeline = [{'$group': {'_id': '$team_id', 'goals': {'$sum': '$goals'}}}]
+    return {doc['_id']: doc['goals'] async for doc in team_goal_shards_collection.aggregate(pipeline)}
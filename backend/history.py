@@ -0,0 +1,142 @@
+import logging
+import os
+from collections import deque
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from bson import ObjectId
+
+import metrics
+from database import game_sessions_collection
+from periodic import PeriodicTask
+from write_behind import goal_writer
+
+HISTORY_BUFFER_SIZE = int(os.environ.get('HISTORY_BUFFER_SIZE', '1000'))
+HISTORY_REFRESH_SECONDS = float(os.environ.get('HISTORY_REFRESH_SECONDS', '2'))
+# Refreshes look this far behind the previous one, since ObjectIds only
+# carry whole seconds and worker clocks drift
+HISTORY_REFRESH_OVERLAP = timedelta(seconds=5)
+
+# Newest first; the session_id tie-break makes the order total for keyset cursors
+HISTORY_SORT_FIELDS = ('timestamp', 'session_id')
+
+HISTORY_PROJECTION = {"_id": 0, "session_id": 1, "team_id": 1, "team_name": 1, "user_id": 1, "score": 1, "timestamp": 1}
+
+logger = logging.getLogger(__name__)
+
+
+class RecentGames:
+    """Ring buffer of the newest game sessions.
+
+    Warmed from Mongo at startup and fed by every session this process
+    records, so the common "latest N" history requests never reach the
+    database. Games recorded by other worker processes are pulled in every
+    `HISTORY_REFRESH_SECONDS`, by reading the documents inserted since the
+    previous refresh, so the ring trails the database by at most one
+    refresh plus the writers' flush window.
+    """
+
+    def __init__(self, size: int = HISTORY_BUFFER_SIZE, refresh_seconds: float = HISTORY_REFRESH_SECONDS):
+        self.size = size
+        self.refresh_seconds = refresh_seconds
+        self._ring = deque(maxlen=size)
+        self._ids = set()
+        # True while the ring holds every session there is, e.g. on a young database
+        self._complete = False
+        self._refreshed_at: Optional[datetime] = None
+        self._refresher = PeriodicTask(self.refresh, refresh_seconds, logger, "Game history refresh failed")
+
+    async def load(self):
+        if self.size <= 0:
+            return
+        # Sessions this process recorded but has not flushed are not in Mongo
+        # yet; holding the flush lock keeps them from landing mid-load
+        async with goal_writer.flush_lock:
+            started = datetime.utcnow()
+            sessions = await game_sessions_collection.find({}, HISTORY_PROJECTION).sort(
+                [(field, -1) for field in HISTORY_SORT_FIELDS]
+            ).to_list(self.size)
+            self._ring.clear()
+            self._ring.extend(reversed(sessions))
+            self._ids = {session['session_id'] for session in self._ring}
+            self._complete = len(sessions) < self.size
+            self._refreshed_at = started
+            for session in goal_writer.pending_sessions():
+                self.add(session)
+
+    async def refresh(self):
+        """Merge in the sessions inserted since the previous load or refresh."""
+        if self.size <= 0 or self._refreshed_at is None:
+            return
+        started = datetime.utcnow()
+        since = ObjectId.from_datetime(self._refreshed_at - HISTORY_REFRESH_OVERLAP)
+        sessions = await game_sessions_collection.find({"_id": {"$gte": since}}, HISTORY_PROJECTION).sort(
+            [(field, -1) for field in HISTORY_SORT_FIELDS]
+        ).to_list(self.size)
+        for session in reversed(sessions):
+            self._insert(session)
+        self._refreshed_at = started
+
+    def start(self):
+        if self.size > 0 and self.refresh_seconds > 0:
+            self._refresher.start()
+
+    async def close(self):
+        await self._refresher.close()
+
+    def add(self, session: dict):
+        if self.size <= 0:
+            return
+        entry = {field: session.get(field) for field in HISTORY_PROJECTION if field != '_id'}
+        # Mongo keeps milliseconds; match it so ring pages and cursor pages agree
+        timestamp = entry['timestamp']
+        entry['timestamp'] = timestamp.replace(microsecond=timestamp.microsecond // 1000 * 1000)
+        self._insert(entry)
+
+    def _insert(self, entry: dict):
+        if entry['session_id'] in self._ids:
+            return
+        key = _sort_key(entry)
+        if len(self._ring) == self.size:
+            self._complete = False
+            if key < _sort_key(self._ring[0]):
+                # Older than everything kept
+                return
+            self._ids.discard(self._ring.popleft()['session_id'])
+        # Keep (timestamp, session_id) order; new sessions almost always go at the end
+        position = len(self._ring)
+        while position > 0 and _sort_key(self._ring[position - 1]) > key:
+            position -= 1
+        self._ring.insert(position, entry)
+        self._ids.add(entry['session_id'])
+
+    def remove_team(self, team_id: str):
+        kept = [session for session in self._ring if session['team_id'] != team_id]
+        self._ring.clear()
+        self._ring.extend(kept)
+        self._ids = {session['session_id'] for session in kept}
+
+    def latest(self, limit: int, team_id: Optional[str] = None, user_id: Optional[str] = None) -> Optional[List[dict]]:
+        """Newest `limit` matching sessions, or None if the ring cannot tell for sure."""
+        matches = []
+        for session in reversed(self._ring):
+            if team_id is not None and session['team_id'] != team_id:
+                continue
+            if user_id is not None and session['user_id'] != user_id:
+                continue
+            matches.append(session)
+            if len(matches) == limit:
+                break
+        else:
+            if not self._complete:
+                metrics.cache_lookups.inc(cache='history', result='miss')
+                return None
+        metrics.cache_lookups.inc(cache='history', result='hit')
+        return matches
+
+
+def _sort_key(session: dict):
+    return tuple(session[field] for field in HISTORY_SORT_FIELDS)
+
+
+recent_games = RecentGames()
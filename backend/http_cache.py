@@ -0,0 +1,157 @@
+import hashlib
+import inspect
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+import orjson
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+import metrics
+from compression import CACHED_LEVELS, COMPRESSION_MIN_BYTES, DYNAMIC_LEVELS, compress, negotiate
+
+RESPONSE_CACHE_SIZE = 512
+
+# Bumped on nearly every flush of scored goals, so bodies built from them
+# are rarely served twice and are not worth the strongest compression
+FREQUENTLY_CHANGING_RESOURCES = frozenset({'leaderboard'})
+
+
+class CachedBody:
+    def __init__(self, versions: Tuple[int, ...], body: bytes, levels: Dict[str, int] = CACHED_LEVELS):
+        self.versions = versions
+        self.body = body
+        self.levels = levels
+        self.digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self._encoded: Dict[str, bytes] = {}
+
+    def representation(self, encoding: Optional[str]) -> Tuple[bytes, str]:
+        """Body and ETag in `encoding`, compressing on first use."""
+        if encoding is None:
+            return self.body, f'"{self.digest}"'
+        encoded = self._encoded.get(encoding)
+        if encoded is None:
+            encoded = self._encoded[encoding] = compress(self.body, encoding, self.levels[encoding])
+        return encoded, f'"{self.digest}+{encoding}"'
+
+
+class ResponseCache:
+    """Serialized JSON bodies of public read endpoints, keyed by resource versions.
+
+    Every cached body depends on one or more named resources. Writers bump a
+    resource's version, which makes every body built from it stale. ETags
+    are a hash of the body, so they stay identical across processes and
+    restarts for as long as the content does.
+
+    Compressed copies are kept with the raw body, so a popular payload is
+    compressed once per encoding and change rather than once per request.
+    Bodies depending on `FREQUENTLY_CHANGING_RESOURCES` are compressed at
+    the per-request levels, since they are usually rebuilt for the next one.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._versions = defaultdict(int)
+        self._bodies = OrderedDict()
+
+    def version(self, resource: str) -> int:
+        return self._versions[resource]
+
+    def bump(self, *resources: str):
+        for resource in resources:
+            self._versions[resource] += 1
+
+    async def respond(
+        self,
+        request: Request,
+        resources: Iterable[str],
+        build: Callable[[], Any],
+        max_age: int,
+        stale_while_revalidate: int
+    ) -> Response:
+        """Return the cached body for this request, or a 304 if the client has it.
+
+        `build` is only called when no body exists for the current versions;
+        it may return the content directly or an awaitable of it.
+        """
+        resources = tuple(resources)
+        versions = tuple(self._versions[resource] for resource in resources)
+        key = (request.url.path, str(request.query_params), resources)
+
+        cached = self._bodies.get(key)
+        if cached is not None and cached.versions == versions:
+            metrics.cache_lookups.inc(cache='response', result='hit')
+        else:
+            metrics.cache_lookups.inc(cache='response', result='miss')
+            content = build()
+            if inspect.isawaitable(content):
+                content = await content
+            levels = DYNAMIC_LEVELS if FREQUENTLY_CHANGING_RESOURCES.intersection(resources) else CACHED_LEVELS
+            cached = CachedBody(versions, self._encode(content), levels)
+            self._bodies[key] = cached
+            if len(self._bodies) > self.max_entries:
+                self._bodies.popitem(last=False)
+        self._bodies.move_to_end(key)
+
+        encoding = None
+        if len(cached.body) >= COMPRESSION_MIN_BYTES:
+            encoding = negotiate(request.headers.get('accept-encoding'))
+        body, etag = cached.representation(encoding)
+        headers = {
+            'ETag': etag,
+            'Cache-Control': f'public, max-age={max_age}, stale-while-revalidate={stale_while_revalidate}',
+        }
+        if len(cached.body) >= COMPRESSION_MIN_BYTES:
+            headers['Vary'] = 'Accept-Encoding'
+        if encoding is not None:
+            headers['Content-Encoding'] = encoding
+        if _etag_matches(request.headers.get('if-none-match'), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type='application/json', headers=headers)
+
+    @staticmethod
+    def _encode(content: Any) -> bytes:
+        # orjson handles dicts and datetimes natively; models are dumped
+        # without revalidation. Matches FastAPI's default JSON output
+        return orjson.dumps(content, default=_dump_model)
+
+
+def trusted_content(model: Type[BaseModel], documents: Iterable[dict]) -> List[dict]:
+    """Shape trusted documents like `model` without building model instances.
+
+    For data that was validated on the way into the database, or is held in
+    memory by this process. Only the model's fields are kept, in declaration
+    order, with defaults filled in, so the JSON is the same as the validated
+    path. Much cheaper than validation, and than `model_construct`, which is
+    plain Python in pydantic v2.
+    """
+    fields = _model_fields(model)
+    return [
+        {name: document[name] if name in document else field.get_default(call_default_factory=True)
+         for name, field in fields}
+        for document in documents
+    ]
+
+
+@lru_cache(maxsize=None)
+def _model_fields(model: Type[BaseModel]) -> tuple:
+    return tuple(model.model_fields.items())
+
+
+def _dump_model(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    return '*' in candidates or any(
+        candidate.removeprefix('W/') == etag for candidate in candidates
+    )
+
+
+response_cache = ResponseCache()
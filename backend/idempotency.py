@@ -0,0 +1,43 @@
+import os
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from pymongo.errors import BulkWriteError
+
+from database import DUPLICATE_KEY_ERROR, session_idempotency_collection
+
+# How long a client may retry a game submission and still get the original back
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', str(24 * 3600)))
+
+
+async def claim(sessions: List[Tuple[str, dict]]) -> Dict[str, dict]:
+    """Record each session under its (distinct) idempotency key, in one insert.
+
+    Returns the originally stored session for every key that an earlier
+    request already took; those sessions must not be recorded again. The
+    unique index on `key` settles concurrent retries, and a TTL index
+    expires keys after `IDEMPOTENCY_TTL_SECONDS`.
+    """
+    taken = {}
+    if not sessions:
+        return taken
+    now = datetime.utcnow()
+    documents = [{'key': key, 'session': session, 'created_at': now} for key, session in sessions]
+
+    try:
+        await session_idempotency_collection.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get('writeErrors', [])
+        if any(err['code'] != DUPLICATE_KEY_ERROR for err in errors):
+            raise
+        existing = [documents[err['index']]['key'] for err in errors]
+        async for document in session_idempotency_collection.find(
+            {'key': {'$in': existing}}, {'_id': 0, 'key': 1, 'session': 1}
+        ):
+            taken[document['key']] = document['session']
+    return taken
+
+
+def same_game(stored: dict, session: dict) -> bool:
+    """Whether a retry describes the game stored under its key."""
+    return all(stored.get(field) == session.get(field) for field in ('team_id', 'score', 'user_id'))
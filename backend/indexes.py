@@ -0,0 +1,176 @@
+"""Index declarations for every query shape used by the API.
+
+Run on app startup, or from the command line:
+
+    python indexes.py          # create missing indexes
+    python indexes.py check    # only report drift
+"""
+import asyncio
+import logging
+import sys
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from database import GOALS_STORAGE_MODE, db
+from idempotency import IDEMPOTENCY_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    'countries': [
+        IndexModel([('country_id', ASCENDING)], name='country_id_unique', unique=True),
+    ],
+    'teams': [
+        IndexModel([('team_id', ASCENDING)], name='team_id_unique', unique=True),
+        IndexModel([('country_id', ASCENDING)], name='country_id'),
+    ],
+    'users': [
+        IndexModel([('user_id', ASCENDING)], name='user_id_unique', unique=True),
+        IndexModel([('email', ASCENDING)], name='email_unique', unique=True),
+        IndexModel([('username', ASCENDING)], name='username_unique', unique=True),
+        IndexModel([('created_at', ASCENDING), ('user_id', ASCENDING)], name='created_at_user_id'),
+    ],
+    'game_sessions': [
+        # Settles a lost session being re-recorded by two workers at once
+        IndexModel([('session_id', ASCENDING)], name='session_id_unique', unique=True),
+        IndexModel(
+            [('timestamp', DESCENDING), ('session_id', DESCENDING)],
+            name='timestamp_session_id_desc'
+        ),
+        IndexModel(
+            [('team_id', ASCENDING), ('timestamp', DESCENDING), ('session_id', DESCENDING)],
+            name='team_id_timestamp_session_id'
+        ),
+        IndexModel(
+            [('user_id', ASCENDING), ('timestamp', DESCENDING), ('session_id', DESCENDING)],
+            name='user_id_timestamp_session_id'
+        ),
+    ],
+    'stats_rollups': [
+        IndexModel(
+            [('granularity', ASCENDING), ('bucket', ASCENDING), ('team_id', ASCENDING)],
+            name='granularity_bucket_team_id_unique', unique=True
+        ),
+        IndexModel([('team_id', ASCENDING)], name='team_id'),
+    ],
+    'team_goal_shards': [
+        IndexModel([('team_id', ASCENDING), ('shard', ASCENDING)], name='team_id_shard_unique', unique=True),
+    ],
+    'session_idempotency': [
+        IndexModel([('key', ASCENDING)], name='key_unique', unique=True),
+        IndexModel([('created_at', ASCENDING)], name='created_at_ttl', expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS),
+    ],
+    'config': [
+        IndexModel([('config_id', ASCENDING)], name='config_id_unique', unique=True),
+    ],
+    'announcements': [
+        IndexModel([('announcement_id', ASCENDING)], name='announcement_id_unique', unique=True),
+        IndexModel([('is_active', ASCENDING), ('order', ASCENDING)], name='is_active_order'),
+    ],
+}
+
+if GOALS_STORAGE_MODE == 'dual':
+    # As a view, `goals` is served by the game_sessions indexes
+    INDEXES['goals'] = [
+        IndexModel([('team_id', ASCENDING)], name='team_id'),
+    ]
+
+# Options that make two indexes on the same keys behave differently
+COMPARED_OPTIONS = ('unique', 'sparse', 'expireAfterSeconds', 'partialFilterExpression')
+
+
+def _spec(model: IndexModel) -> dict:
+    document = model.document
+    return {
+        'key': list(document['key'].items()),
+        **{opt: document[opt] for opt in COMPARED_OPTIONS if opt in document},
+    }
+
+
+def _existing_spec(info: dict) -> dict:
+    return {
+        'key': [(field, int(direction)) for field, direction in info['key']],
+        **{opt: info[opt] for opt in COMPARED_OPTIONS if opt in info},
+    }
+
+
+async def check_indexes() -> dict:
+    """Compare declared indexes with the database.
+
+    Returns a mapping of collection name to its `missing`, `mismatched` and
+    `unexpected` index names. Collections without drift are omitted.
+    """
+    drift = {}
+    for collection_name, models in INDEXES.items():
+        existing = await db[collection_name].index_information()
+        existing.pop('_id_', None)
+        declared = {model.document['name']: model for model in models}
+
+        report = {'missing': [], 'mismatched': [], 'unexpected': []}
+        for name, model in declared.items():
+            if name not in existing:
+                report['missing'].append(name)
+            elif _existing_spec(existing[name]) != _spec(model):
+                report['mismatched'].append(name)
+        report['unexpected'] = [name for name in existing if name not in declared]
+
+        if any(report.values()):
+            drift[collection_name] = report
+    return drift
+
+
+async def ensure_indexes() -> dict:
+    """Create every declared index that does not exist yet.
+
+    Existing indexes are never dropped or rebuilt; mismatches are only
+    reported, so an operator can decide how to migrate them.
+    """
+    drift = await check_indexes()
+    for collection_name, report in drift.items():
+        missing = [
+            model for model in INDEXES[collection_name]
+            if model.document['name'] in report['missing']
+        ]
+        for model in missing:
+            options = {k: v for k, v in model.document.items() if k != 'key'}
+            try:
+                await db[collection_name].create_index(
+                    list(model.document['key'].items()), background=True, **options
+                )
+                logger.info("Created index %s.%s", collection_name, model.document['name'])
+            except OperationFailure as e:
+                logger.error(
+                    "Could not create index %s.%s: %s",
+                    collection_name, model.document['name'], e
+                )
+        for name in report['mismatched']:
+            logger.warning("Index %s.%s differs from its declaration", collection_name, name)
+        for name in report['unexpected']:
+            logger.warning("Index %s.%s is not declared", collection_name, name)
+    return await check_indexes()
+
+
+async def main(command: str):
+    if command == 'check':
+        drift = await check_indexes()
+    elif command == 'ensure':
+        drift = await ensure_indexes()
+    else:
+        print(f"Unknown command: {command} (expected 'ensure' or 'check')")
+        return 2
+
+    if not drift:
+        print("✅ All indexes match their declarations")
+        return 0
+    for collection_name, report in drift.items():
+        for kind, names in report.items():
+            for name in names:
+                print(f"⚠️  {collection_name}.{name}: {kind}")
+    return 1
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else 'ensure')))
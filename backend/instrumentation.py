@@ -0,0 +1,387 @@
+"""Request and MongoDB metrics, exposed through `metrics.render()`.
+
+`RequestMetricsMiddleware` labels every HTTP request by its route template
+rather than the raw path, so `/api/countries/{country_id}/teams` is one
+series. The PyMongo listeners are passed to the Motor client in
+`database.py`; they run on Motor's worker threads.
+
+`QueryAccountingMiddleware` additionally counts the Mongo commands issued
+while serving each request. Motor runs PyMongo calls in a copy of the
+caller's context, so the listeners find the request's `QueryLog` through a
+context variable. The in-memory stand-in (`mongomock://`) emits no command
+events; `CountingDatabase` records its collection calls instead.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from pymongo import monitoring
+
+import metrics
+
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+http_requests = metrics.counter(
+    'http_requests_total', 'HTTP requests by method, route template and status', ['method', 'route', 'status']
+)
+http_request_duration = metrics.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by method, route template and status',
+    ['method', 'route', 'status']
+)
+http_requests_in_flight = metrics.gauge('http_requests_in_flight', 'HTTP requests currently being served', ['method'])
+
+mongo_command_duration = metrics.histogram(
+    'mongodb_command_duration_seconds', 'MongoDB command latency by collection, command and outcome',
+    ['collection', 'command', 'outcome'], MONGO_BUCKETS
+)
+mongo_checkout_wait = metrics.histogram(
+    'mongodb_pool_checkout_wait_seconds', 'Time spent waiting for a pooled MongoDB connection', ['outcome'],
+    MONGO_BUCKETS
+)
+mongo_connections_checked_out = metrics.gauge(
+    'mongodb_pool_connections_checked_out', 'MongoDB connections currently checked out of the pool'
+)
+n_plus_one_suspects = metrics.counter(
+    'mongodb_n_plus_one_suspects_total', 'Requests that repeated one query shape past the threshold', ['route']
+)
+
+# Identical query shapes per request at which the request is flagged as N+1
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', '5'))
+
+# Cursor continuations and cleanup repeat by design
+UNCOUNTED_SHAPE_COMMANDS = {'getMore', 'killCursors', 'endSessions'}
+
+# Collection methods and the server command each one issues
+COLLECTION_METHOD_COMMANDS = {
+    'find': 'find',
+    'find_one': 'find',
+    'aggregate': 'aggregate',
+    'count_documents': 'aggregate',
+    'estimated_document_count': 'count',
+    'distinct': 'distinct',
+    'insert_one': 'insert',
+    'insert_many': 'insert',
+    'update_one': 'update',
+    'update_many': 'update',
+    'replace_one': 'update',
+    'delete_one': 'delete',
+    'delete_many': 'delete',
+    'bulk_write': 'bulkWrite',
+    'find_one_and_update': 'findAndModify',
+    'find_one_and_replace': 'findAndModify',
+    'find_one_and_delete': 'findAndModify',
+}
+
+SERVER_TIMING_HEADER = b'server-timing'
+
+logger = logging.getLogger(__name__)
+
+UNMATCHED_ROUTE = '<unmatched>'
+
+
+def route_template(scope: dict) -> str:
+    """Path template of the route that handled `scope`, once routing has run."""
+    route = scope.get('route')
+    if route is not None:
+        return route.path
+    if 'endpoint' in scope:
+        # Mounted apps such as the uploads directory
+        return scope.get('root_path') or UNMATCHED_ROUTE
+    return UNMATCHED_ROUTE
+
+
+class RequestMetricsMiddleware:
+    """Counts, times and tracks in-flight HTTP requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        method = scope['method']
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        http_requests_in_flight.inc(method=method)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec(method=method)
+            labels = {'method': method, 'route': route_template(scope), 'status': str(status_code)}
+            http_requests.inc(**labels)
+            http_request_duration.observe(time.perf_counter() - started, **labels)
+
+
+class QueryLog:
+    """Mongo commands issued while serving one request (or a nested scope)."""
+
+    def __init__(self, parent: Optional['QueryLog'] = None):
+        self.parent = parent
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, shape: Optional[str], seconds: float):
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            if shape is not None:
+                self.shapes[shape] += 1
+        if self.parent is not None:
+            self.parent.record(shape, seconds)
+
+    def suspects(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[str]:
+        """Query shapes repeated at least `threshold` times, most repeated first."""
+        with self._lock:
+            return [shape for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.seconds * 1000:.1f};desc="{self.count} queries"'
+
+
+current_queries: ContextVar[Optional[QueryLog]] = ContextVar('current_queries', default=None)
+
+
+class QueryAccountingMiddleware:
+    """Counts and times the Mongo commands of each request.
+
+    Adds a Server-Timing header, logs the totals as structured fields and
+    warns about query shapes repeated `N_PLUS_ONE_THRESHOLD` times or more.
+    Commands issued after the response headers are sent, e.g. by streaming
+    responses, are logged but not in the header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        log = QueryLog(parent=current_queries.get())
+        token = current_queries.set(log)
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                headers = list(message.get('headers', []))
+                headers.append((SERVER_TIMING_HEADER, log.server_timing().encode()))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_queries.reset(token)
+            route = route_template(scope)
+            fields = {'route': route, 'db_queries': log.count, 'db_time_ms': round(log.seconds * 1000, 1)}
+            logger.debug("%s %s db_queries=%d db_time_ms=%.1f", scope['method'], route,
+                         log.count, log.seconds * 1000, extra=fields)
+            suspects = log.suspects()
+            if suspects:
+                n_plus_one_suspects.inc(route=route)
+                logger.warning("Possible N+1 queries in %s %s: %s", scope['method'], route,
+                               '; '.join(f"{shape} x{log.shapes[shape]}" for shape in suspects),
+                               extra={**fields, 'n_plus_one': suspects})
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryLog]:
+    """Fail if the code in the block issues more than `limit` Mongo commands.
+
+    Works around in-process requests too (e.g. through httpx ASGITransport),
+    since each request's log also counts into the enclosing one::
+
+        with assert_max_queries(2):
+            await client.get('/api/teams')
+
+    Against the in-memory stand-in every collection method call counts as
+    one command (see `CountingDatabase`).
+    """
+    log = QueryLog(parent=current_queries.get())
+    token = current_queries.set(log)
+    try:
+        yield log
+    finally:
+        current_queries.reset(token)
+    if log.count > limit:
+        shapes = '; '.join(f"{shape} x{count}" for shape, count in log.shapes.most_common())
+        raise AssertionError(f"Expected at most {limit} queries, got {log.count}: {shapes}")
+
+
+def command_collection(command_name: str, command: dict) -> str:
+    target = command.get('collection') if command_name == 'getMore' else command.get(command_name)
+    return target if isinstance(target, str) else ''
+
+
+def query_shape(command_name: str, collection: str, command: dict) -> Optional[str]:
+    """Command with the values in its filter replaced, e.g. `teams.find {"team_id": "?"}`."""
+    if command_name in UNCOUNTED_SHAPE_COMMANDS:
+        return None
+    spec = command.get('filter', command.get('query'))
+    if spec is None and command_name in ('update', 'delete'):
+        statements = command.get(f'{command_name}s') or [{}]
+        spec = statements[0].get('q')
+    if spec is None and command_name == 'aggregate':
+        spec = command.get('pipeline')
+    shape = f"{collection}.{command_name}" if collection else command_name
+    if spec is None:
+        return shape
+    return f"{shape} {json.dumps(_strip_values(spec), sort_keys=True)}"
+
+
+def _strip_values(spec):
+    if isinstance(spec, dict):
+        return {key: _strip_values(value) for key, value in spec.items()}
+    if isinstance(spec, (list, tuple)):
+        # A pipeline keeps its stages; an `$in` or `$or` list collapses to one shape
+        return [_strip_values(item) for item in spec] if spec and isinstance(spec[0], dict) else '?'
+    return '?'
+
+
+class CommandTimingListener(monitoring.CommandListener):
+    """Times every command by collection and command name.
+
+    Commands issued inside a request are also added to its `QueryLog`.
+    """
+
+    def __init__(self):
+        # Collection, query shape and request log of each in-progress command;
+        # started and finished events only share the connection and request ids
+        self._pending = {}
+
+    def started(self, event):
+        collection = command_collection(event.command_name, event.command)
+        log = current_queries.get()
+        shape = query_shape(event.command_name, collection, event.command) if log is not None else None
+        self._pending[(event.connection_id, event.request_id)] = (collection, shape, log)
+
+    def succeeded(self, event):
+        self._observe(event, 'success')
+
+    def failed(self, event):
+        self._observe(event, 'failure')
+
+    def _observe(self, event, outcome: str):
+        collection, shape, log = self._pending.pop((event.connection_id, event.request_id), ('', None, None))
+        seconds = event.duration_micros / 1e6
+        mongo_command_duration.observe(seconds, collection=collection, command=event.command_name, outcome=outcome)
+        if log is not None:
+            log.record(shape, seconds)
+
+
+class CountingDatabase:
+    """Database of the in-memory stand-in whose collections count their calls.
+
+    Each call of a method in `COLLECTION_METHOD_COMMANDS` is recorded in the
+    current `QueryLog` as one command, with no duration, so query budgets and
+    N+1 detection also work under `mongomock://`. A cursor counts once, when
+    it is created, like a real `find` that fits in its first batch.
+    """
+
+    def __init__(self, database):
+        self._database = database
+
+    def get_collection(self, *args, **kwargs) -> 'CountingCollection':
+        return CountingCollection(self._database.get_collection(*args, **kwargs))
+
+    def __getitem__(self, name: str) -> 'CountingCollection':
+        return self.get_collection(name)
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._database, name)
+        if getattr(attribute, 'database', None) is self._database:
+            return CountingCollection(attribute)
+        return attribute
+
+
+class CountingCollection:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._collection, name)
+        command_name = COLLECTION_METHOD_COMMANDS.get(name)
+        if command_name is None:
+            return attribute
+
+        def counted(*args, **kwargs):
+            log = current_queries.get()
+            if log is not None:
+                spec_key = 'pipeline' if name == 'aggregate' else 'filter'
+                spec = args[0] if args else kwargs.get(spec_key)
+                command = {} if command_name in ('insert', 'bulkWrite') else {spec_key: spec}
+                log.record(query_shape(command_name, self._collection.name, command), 0.0)
+            return attribute(*args, **kwargs)
+        return counted
+
+
+class PoolCheckoutListener(monitoring.ConnectionPoolListener):
+    """Measures connection checkout wait and connections in use.
+
+    A checkout starts and completes on the same Motor worker thread, so the
+    start time is kept in a thread-local.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        self._observe_wait('success')
+        mongo_connections_checked_out.inc()
+
+    def connection_check_out_failed(self, event):
+        self._observe_wait('failure')
+
+    def connection_checked_in(self, event):
+        mongo_connections_checked_out.dec()
+
+    def _observe_wait(self, outcome: str):
+        started = getattr(self._local, 'started', None)
+        if started is not None:
+            self._local.started = None
+            mongo_checkout_wait.observe(time.perf_counter() - started, outcome=outcome)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+
+def mongo_listeners() -> list:
+    return [CommandTimingListener(), PoolCheckoutListener()]
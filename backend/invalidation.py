@@ -0,0 +1,90 @@
+import inspect
+import logging
+import os
+from collections import defaultdict
+from typing import Callable, Dict
+
+from pymongo import ReturnDocument
+
+from database import config_collection
+from periodic import PeriodicTask
+
+INVALIDATION_POLL_SECONDS = float(os.environ.get('INVALIDATION_POLL_SECONDS', '2'))
+
+# The document in `config` holding one version counter per resource
+VERSIONS_DOCUMENT_ID = 'cache_versions'
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationBus:
+    """Tells every worker process when shared data behind a local cache changed.
+
+    Admin writes update their own process's caches directly and then
+    `publish` the resource, which increments its counter in a single
+    document of the `config` collection. Each worker polls that document
+    every `INVALIDATION_POLL_SECONDS` (one indexed lookup) and runs the
+    handlers subscribed to every resource whose counter moved, so other
+    processes converge within one poll interval.
+    """
+
+    def __init__(self, poll_seconds: float = INVALIDATION_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._seen: Dict[str, int] = {}
+        self._handlers = defaultdict(list)
+        self._poller = PeriodicTask(self.check, poll_seconds, logger, "Invalidation check failed")
+
+    def subscribe(self, resource: str, *handlers: Callable):
+        """Run `handlers` (sync or async, no arguments) when another worker publishes `resource`."""
+        self._handlers[resource].extend(handlers)
+
+    async def load(self):
+        """Record the current versions; call before the caches load their data."""
+        self._seen = dict(await self._versions())
+
+    async def publish(self, *resources: str):
+        document = await config_collection.find_one_and_update(
+            {"config_id": VERSIONS_DOCUMENT_ID},
+            {"$inc": {f"versions.{resource}": 1 for resource in resources}},
+            projection={"_id": 0, "versions": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        for resource in resources:
+            version = document['versions'][resource]
+            # Only skip our own change; if another worker published in
+            # between, the next poll still reloads
+            if version == self._seen.get(resource, 0) + 1:
+                self._seen[resource] = version
+
+    async def check(self):
+        for resource, version in (await self._versions()).items():
+            if version == self._seen.get(resource, 0):
+                continue
+            try:
+                for handler in self._handlers.get(resource, ()):
+                    result = handler()
+                    if inspect.isawaitable(result):
+                        await result
+            except Exception:
+                # Version stays unseen, so the reload is retried on the next poll
+                logger.exception("Reloading %s after invalidation failed", resource)
+                continue
+            self._seen[resource] = version
+
+    def start(self):
+        if self.poll_seconds > 0:
+            self._poller.start()
+
+    async def close(self):
+        await self._poller.close()
+
+    @staticmethod
+    async def _versions() -> Dict[str, int]:
+        document = await config_collection.find_one(
+            {"config_id": VERSIONS_DOCUMENT_ID}, {"_id": 0, "versions": 1}
+        )
+        return (document or {}).get('versions', {})
+
+
+invalidation_bus = InvalidationBus()
@@ -0,0 +1,147 @@
+import logging
+import os
+from bisect import bisect_left, insort
+from typing import List, Optional, Set, Tuple
+
+import goal_counters
+from database import teams_collection
+from periodic import PeriodicTask
+from http_cache import response_cache
+from reference_cache import reference_cache
+from write_behind import goal_writer
+
+LEADERBOARD_RECONCILE_SECONDS = int(os.environ.get('LEADERBOARD_RECONCILE_SECONDS', '60'))
+
+# Enough of each team to render its entry when the reference cache is behind
+TEAM_PROJECTION = {"_id": 0, "team_id": 1, "goals": 1, "name": 1, "country_id": 1, "color": 1}
+
+logger = logging.getLogger(__name__)
+
+
+class Leaderboard:
+    """In-memory team ranking kept in sync with every goals change.
+
+    Ranks are held as a sorted list of `(-goals, team_id)` keys, so an
+    increment is a pair of bisects and a page is a plain slice. Display
+    fields come from the reference cache, or from the team as last loaded
+    here while the cache is behind (e.g. just after another worker created
+    or deleted a team), so pages never skip a rank. A periodic reconciliation reloads
+    the goal counts from Mongo to repair any drift; it is also where sharded
+    goal counters are summed, so reads never aggregate the shards.
+    """
+
+    def __init__(self, reconcile_seconds: int = LEADERBOARD_RECONCILE_SECONDS):
+        self.reconcile_seconds = reconcile_seconds
+        self._keys = []
+        self._goals = {}
+        self._teams = {}
+        self._changed = set()
+        self._changed_all = False
+        self._reconciler = PeriodicTask(
+            self.load, reconcile_seconds, logger, "Leaderboard reconciliation failed"
+        )
+
+    async def load(self):
+        # Hold the flush lock so that buffered increments are either already
+        # in `teams.goals` (or a goal shard) or still reported by the writer,
+        # never both.
+        async with goal_writer.flush_lock:
+            teams = await teams_collection.find({}, TEAM_PROJECTION).to_list(None)
+            sharded = await goal_counters.shard_totals()
+            self._goals = {
+                team['team_id']: (
+                    team.get('goals', 0) + sharded.get(team['team_id'], 0)
+                    + goal_writer.pending_goals(team['team_id'])
+                )
+                for team in teams
+            }
+            self._teams = {team['team_id']: team for team in teams}
+            self._keys = sorted((-goals, team_id) for team_id, goals in self._goals.items())
+            self._changed_all = True
+            response_cache.bump('leaderboard')
+
+    def start(self):
+        if self.reconcile_seconds > 0:
+            self._reconciler.start()
+
+    async def close(self):
+        await self._reconciler.close()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def goals(self, team_id: str) -> int:
+        return self._goals.get(team_id, 0)
+
+    def rank(self, team_id: str) -> Optional[int]:
+        goals = self._goals.get(team_id)
+        if goals is None:
+            return None
+        return bisect_left(self._keys, (-goals, team_id)) + 1
+
+    def ranked(self, start: int = 0, stop: Optional[int] = None) -> List[Tuple[int, str, int]]:
+        """`(rank, team_id, goals)` for the positions in [start, stop)."""
+        return [
+            (start + idx + 1, team_id, -neg_goals)
+            for idx, (neg_goals, team_id) in enumerate(self._keys[start:stop])
+        ]
+
+    def drain_changes(self) -> Tuple[Set[str], bool]:
+        """Teams whose goals changed since the last call, and whether the whole board did."""
+        changed, changed_all = self._changed, self._changed_all
+        self._changed, self._changed_all = set(), False
+        return changed, changed_all
+
+    def add_goals(self, team_id: str, goals: int):
+        current = self._goals.get(team_id)
+        if current is None or not goals:
+            return
+        self._remove_key(current, team_id)
+        self._goals[team_id] = current + goals
+        insort(self._keys, (-(current + goals), team_id))
+        self._changed.add(team_id)
+        response_cache.bump('leaderboard')
+
+    def add_team(self, team: dict, goals: int = 0):
+        team_id = team['team_id']
+        if team_id not in self._goals:
+            self._teams[team_id] = {field: team.get(field) for field in TEAM_PROJECTION if field != '_id'}
+            self._goals[team_id] = goals
+            insort(self._keys, (-goals, team_id))
+            self._changed.add(team_id)
+            response_cache.bump('leaderboard')
+
+    def remove_team(self, team_id: str):
+        goals = self._goals.pop(team_id, None)
+        self._teams.pop(team_id, None)
+        if goals is not None:
+            self._remove_key(goals, team_id)
+            self._changed_all = True
+            response_cache.bump('leaderboard')
+
+    def page(self, offset: int = 0, limit: int = 1000) -> List[dict]:
+        entries = []
+        for idx, (neg_goals, team_id) in enumerate(self._keys[offset:offset + limit]):
+            team = reference_cache.team(team_id) or self._teams[team_id]
+            country = reference_cache.country(team['country_id'])
+            # Plain dicts in LeaderboardEntry shape: built from trusted in-memory
+            # data, so they skip model validation on the hot read path
+            entries.append({
+                'rank': offset + idx + 1,
+                'team_id': team_id,
+                'team_name': team['name'],
+                'country_name': country['name'] if country else '',
+                'flag': country['flag'] if country else '',
+                'goals': -neg_goals,
+                'color': team['color'],
+            })
+        return entries
+
+    def _remove_key(self, goals: int, team_id: str):
+        key = (-goals, team_id)
+        idx = bisect_left(self._keys, key)
+        if idx < len(self._keys) and self._keys[idx] == key:
+            del self._keys[idx]
+
+
+leaderboard = Leaderboard()
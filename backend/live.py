@@ -0,0 +1,156 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Optional
+
+from leaderboard import leaderboard
+from periodic import PeriodicTask
+
+LIVE_TICK_MS = int(os.environ.get('LIVE_TICK_MS', '250'))
+LIVE_QUEUE_SIZE = int(os.environ.get('LIVE_QUEUE_SIZE', '16'))
+LIVE_HEARTBEAT_SECONDS = 15
+
+logger = logging.getLogger(__name__)
+
+
+class Frame:
+    """One encoded update, shared by every subscriber it is sent to."""
+
+    def __init__(self, seq: int, kind: str, entries: list):
+        self.seq = seq
+        self.kind = kind
+        self.text = json.dumps({'type': kind, 'seq': seq, 'entries': entries}, separators=(',', ':'))
+        self._sse: Optional[bytes] = None
+
+    @property
+    def sse(self) -> bytes:
+        if self._sse is None:
+            self._sse = f"id: {self.seq}\nevent: {self.kind}\ndata: {self.text}\n\n".encode()
+        return self._sse
+
+
+class Subscriber:
+    """Bounded per-client queue of frames.
+
+    A client that falls `LIVE_QUEUE_SIZE` frames behind has its backlog
+    dropped and receives a fresh snapshot instead, so a slow consumer never
+    holds memory or delays the broadcast for everyone else.
+    """
+
+    def __init__(self, broadcaster: 'LeaderboardBroadcaster'):
+        self._broadcaster = broadcaster
+        self._queue = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+
+    def offer(self, frame: Frame):
+        try:
+            self._queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            # None tells `next_frame` to resynchronise from a snapshot
+            self._queue.put_nowait(None)
+
+    async def next_frame(self, timeout: Optional[float] = None) -> Optional[Frame]:
+        """Next frame to send, or None if nothing arrived within `timeout`."""
+        try:
+            frame = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if frame is None:
+            return self._broadcaster.snapshot()
+        return frame
+
+
+class LeaderboardBroadcaster:
+    """Pushes rank and goal deltas of the in-memory leaderboard to subscribers.
+
+    Changes are coalesced per tick; each tick produces at most one frame with
+    the absolute rank and goals of every team whose position moved, encoded
+    once and fanned out to all subscribers.
+    """
+
+    def __init__(self, tick_ms: int = LIVE_TICK_MS):
+        self.tick = tick_ms / 1000
+        self._subscribers = set()
+        self._published = {}
+        self._seq = 0
+        self._snapshot: Optional[Frame] = None
+        self._ticker = PeriodicTask(self.publish, self.tick, logger, "Leaderboard broadcast failed")
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber(self)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def snapshot(self) -> Frame:
+        """Full board as of the last published sequence number."""
+        if self._snapshot is None or self._snapshot.seq != self._seq:
+            entries = [
+                {'team_id': team_id, 'rank': rank, 'goals': goals}
+                for team_id, (rank, goals) in sorted(self._published.items(), key=lambda item: item[1])
+            ]
+            self._snapshot = Frame(self._seq, 'snapshot', entries)
+        return self._snapshot
+
+    def start(self):
+        if not self._ticker.running:
+            self._published = {team_id: (rank, goals) for rank, team_id, goals in leaderboard.ranked()}
+            leaderboard.drain_changes()
+            self._ticker.start()
+
+    async def close(self):
+        await self._ticker.close()
+
+    def publish(self) -> Optional[Frame]:
+        entries = self._collect_changes()
+        if not entries:
+            return None
+        self._seq += 1
+        frame = Frame(self._seq, 'delta', entries)
+        for subscriber in list(self._subscribers):
+            subscriber.offer(frame)
+        return frame
+
+    def _collect_changes(self) -> list:
+        changed, changed_all = leaderboard.drain_changes()
+        if not changed and not changed_all:
+            return []
+
+        if changed_all:
+            start, stop = 0, None
+        else:
+            # A team moving from rank a to rank b shifts everyone in between
+            size = len(leaderboard)
+            positions = []
+            for team_id in changed:
+                new_rank = leaderboard.rank(team_id)
+                old_rank = self._published.get(team_id, (size, 0))[0]
+                positions.extend(rank for rank in (new_rank, old_rank) if rank is not None)
+            if not positions:
+                return []
+            start, stop = min(positions) - 1, max(positions)
+
+        entries = []
+        seen = set()
+        for rank, team_id, goals in leaderboard.ranked(start, stop):
+            seen.add(team_id)
+            if self._published.get(team_id) != (rank, goals):
+                self._published[team_id] = (rank, goals)
+                entries.append({'team_id': team_id, 'rank': rank, 'goals': goals})
+
+        if changed_all:
+            for team_id in set(self._published) - seen:
+                del self._published[team_id]
+                entries.append({'team_id': team_id, 'removed': True})
+        return entries
+
+
+broadcaster = LeaderboardBroadcaster()
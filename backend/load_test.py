@@ -0,0 +1,298 @@
+"""In-process load generator for the API.
+
+Boots `server.app` behind an httpx ASGI transport, by default against an
+in-memory Mongo stand-in, seeds it at the requested scale, then drives a
+weighted mix of requests at a target rate. Per-route latency percentiles
+and throughput are printed as JSON, so runs before and after a change can
+be compared:
+
+    python load_test.py --rps 200 --duration 30 --teams 200 > before.json
+    python load_test.py --mix submit=80,leaderboard=20 --output after.json
+
+Requests are scheduled open-loop: latency is measured from the moment a
+request was due, so a server that falls behind shows up as latency rather
+than as a lower request rate. The generator shares the event loop with the
+app, which makes absolute numbers pessimistic but comparisons fair.
+
+The in-memory stand-in has no indexes and runs every operation inside the
+event loop, so database-bound routes and write-behind flushes get slower as
+the seeded history grows. For numbers that reflect Mongo itself, point
+`--mongo-url` at a local mongod; the `--db-name` database is dropped and
+reseeded.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List
+
+ADMIN_EMAIL = 'admin@loadtest.example.com'
+ADMIN_PASSWORD = 'loadtest'
+SEED_BATCH_SIZE = 1000
+
+# Relative weight of each action in the default mix
+DEFAULT_MIX = {
+    'submit': 40,
+    'leaderboard': 25,
+    'teams': 10,
+    'history': 8,
+    'countries': 3,
+    'config': 5,
+    'stats_today': 5,
+    'admin_stats': 2,
+    'login': 2,
+}
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="In-process load generator for the API")
+    parser.add_argument('--rps', type=float, default=100, help="target requests per second")
+    parser.add_argument('--duration', type=float, default=10, help="seconds of load")
+    parser.add_argument('--countries', type=int, default=10)
+    parser.add_argument('--teams', type=int, default=100)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--sessions', type=int, default=500, help="game sessions seeded as history")
+    parser.add_argument('--mix', default='', help="overrides as name=weight,... (names: %s)" % ', '.join(DEFAULT_MIX))
+    parser.add_argument('--seed', type=int, default=1, help="random seed for data and request mix")
+    parser.add_argument('--mongo-url', default='mongomock://')
+    parser.add_argument('--db-name', default='mini_cup_load_test')
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    mix = dict(DEFAULT_MIX)
+    for item in filter(None, args.mix.split(',')):
+        name, _, weight = item.partition('=')
+        if name not in DEFAULT_MIX:
+            parser.error(f"unknown action in --mix: {name}")
+        mix[name] = float(weight)
+    args.mix = {name: weight for name, weight in mix.items() if weight > 0}
+    if not args.mix:
+        parser.error("--mix leaves no actions to run")
+    if args.countries < 1 or args.teams < 1:
+        parser.error("--countries and --teams must be at least 1")
+    return args
+
+
+async def seed(args: argparse.Namespace, rng: random.Random) -> dict:
+    """Fill the database and return the ids the actions pick from."""
+    import database
+    import rollups
+    from auth import get_password_hash
+
+    await database.client.drop_database(args.db_name)
+    now = datetime.utcnow()
+
+    countries = [
+        {'country_id': f'country{i}', 'name': f'Country {i}', 'flag': '🏳️', 'color': '#1E90FF', 'created_at': now}
+        for i in range(args.countries)
+    ]
+    teams = [
+        {
+            'team_id': f'team{i}', 'name': f'Team {i}', 'country_id': countries[i % len(countries)]['country_id'],
+            'color': '#FFD700', 'goals': 0, 'created_at': now,
+        }
+        for i in range(args.teams)
+    ]
+
+    # One hash for everyone: seeding should not spend minutes in bcrypt
+    password_hash = get_password_hash(ADMIN_PASSWORD)
+    users = [{
+        'user_id': 'admin', 'username': 'admin', 'email': ADMIN_EMAIL, 'role': 'admin',
+        'password_hash': password_hash, 'created_at': now,
+    }] + [
+        {
+            'user_id': f'user{i}', 'username': f'user{i}', 'email': f'user{i}@loadtest.example.com', 'role': 'user',
+            'password_hash': password_hash, 'created_at': now,
+        }
+        for i in range(args.users)
+    ]
+
+    sessions = []
+    pending_rollups = {}
+    goals_by_team = Counter()
+    for i in range(args.sessions):
+        team = rng.choice(teams)
+        score = rng.randint(0, 10)
+        timestamp = now - timedelta(seconds=rng.randint(0, 60 * 24 * 3600))
+        sessions.append({
+            'session_id': f'seed{i}', 'team_id': team['team_id'], 'team_name': team['name'],
+            'user_id': f'user{rng.randrange(args.users)}' if args.users else None,
+            'score': score, 'timestamp': timestamp,
+        })
+        rollups.accumulate(pending_rollups, team['team_id'], timestamp, score)
+        goals_by_team[team['team_id']] += score
+    for team in teams:
+        team['goals'] = goals_by_team[team['team_id']]
+
+    await _insert_batches(database.countries_collection, countries)
+    await _insert_batches(database.teams_collection, teams)
+    await _insert_batches(database.users_collection, users)
+    await _insert_batches(database.game_sessions_collection, sessions)
+    ops = rollups.rollup_ops(pending_rollups)
+    for start in range(0, len(ops), SEED_BATCH_SIZE):
+        await database.stats_rollups_collection.bulk_write(ops[start:start + SEED_BATCH_SIZE], ordered=False)
+
+    return {
+        'team_ids': [team['team_id'] for team in teams],
+        'user_ids': [user['user_id'] for user in users[1:]],
+    }
+
+
+async def _insert_batches(collection, documents: List[dict]):
+    for start in range(0, len(documents), SEED_BATCH_SIZE):
+        await collection.insert_many(documents[start:start + SEED_BATCH_SIZE])
+
+
+def build_actions(client, data: dict, admin_headers: dict, rng: random.Random) -> Dict[str, tuple]:
+    """Name -> (route label, coroutine factory) for every action in the mix."""
+    def submit():
+        return client.post('/api/game/session', json={
+            'team_id': rng.choice(data['team_ids']),
+            'score': rng.randint(0, 10),
+            'user_id': rng.choice(data['user_ids']) if data['user_ids'] else None,
+        })
+
+    def history():
+        params = {'limit': 20}
+        if rng.random() < 0.5:
+            params['team_id'] = rng.choice(data['team_ids'])
+        return client.get('/api/game/history', params=params)
+
+    return {
+        'submit': ('POST /api/game/session', submit),
+        'leaderboard': ('GET /api/leaderboard', lambda: client.get('/api/leaderboard', params={'limit': 100})),
+        'teams': ('GET /api/teams', lambda: client.get('/api/teams')),
+        'history': ('GET /api/game/history', history),
+        'countries': ('GET /api/countries', lambda: client.get('/api/countries')),
+        'config': ('GET /api/config', lambda: client.get('/api/config')),
+        'stats_today': ('GET /api/stats/goals/today', lambda: client.get('/api/stats/goals/today')),
+        'admin_stats': ('GET /api/stats/teams', lambda: client.get('/api/stats/teams', headers=admin_headers)),
+        'login': ('POST /api/auth/login', lambda: client.post(
+            '/api/auth/login', json={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD}
+        )),
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    async def timed(self, route: str, request: Callable[[], Awaitable], due: float):
+        try:
+            response = await request()
+            status = str(response.status_code)
+        except Exception as exc:
+            status = type(exc).__name__
+        self.latencies[route].append(time.perf_counter() - due)
+        self.statuses[route][status] += 1
+
+    def report(self, elapsed: float) -> dict:
+        routes = {
+            route: self._summary(self.latencies[route], self.statuses[route], elapsed)
+            for route in sorted(self.latencies)
+        }
+        total = self._summary(
+            [latency for latencies in self.latencies.values() for latency in latencies],
+            sum(self.statuses.values(), Counter()),
+            elapsed
+        )
+        return {'elapsed_seconds': round(elapsed, 3), 'total': total, 'routes': routes}
+
+    @staticmethod
+    def _summary(latencies: List[float], statuses: Counter, elapsed: float) -> dict:
+        ordered = sorted(latencies)
+        errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 500)
+        return {
+            'requests': len(ordered),
+            'errors': errors,
+            'status': dict(sorted(statuses.items())),
+            'throughput_rps': round(len(ordered) / elapsed, 2) if elapsed else 0,
+            'latency_ms': {
+                'mean': round(sum(ordered) / len(ordered) * 1000, 3) if ordered else None,
+                'p50': _percentile(ordered, 50),
+                'p95': _percentile(ordered, 95),
+                'p99': _percentile(ordered, 99),
+                'max': round(ordered[-1] * 1000, 3) if ordered else None,
+            },
+        }
+
+
+def _percentile(ordered: List[float], percent: float):
+    """Nearest-rank percentile in milliseconds."""
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return round(ordered[int(rank) - 1] * 1000, 3)
+
+
+async def drive(actions: Dict[str, tuple], mix: Dict[str, float], rps: float, duration: float,
+                rng: random.Random) -> dict:
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    recorder = Recorder()
+    tasks = []
+    start = time.perf_counter()
+    for i in range(int(rps * duration)):
+        due = start + i / rps
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        route, request = actions[rng.choices(names, weights)[0]]
+        tasks.append(asyncio.create_task(recorder.timed(route, request, due)))
+    await asyncio.gather(*tasks)
+    return recorder.report(time.perf_counter() - start)
+
+
+async def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    # Must be set before the app modules create the Mongo client
+    os.environ['MONGO_URL'] = args.mongo_url
+    os.environ['DB_NAME'] = args.db_name
+
+    import httpx
+    from server import app
+    # One line per request would drown the report
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    rng = random.Random(args.seed)
+    data = await seed(args, rng)
+    for handler in app.router.on_startup:
+        await handler()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://loadtest') as client:
+            response = await client.post('/api/auth/login', json={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD})
+            response.raise_for_status()
+            admin_headers = {'Authorization': f"Bearer {response.json()['access_token']}"}
+            actions = build_actions(client, data, admin_headers, rng)
+            result = await drive(actions, args.mix, args.rps, args.duration, rng)
+    finally:
+        for handler in app.router.on_shutdown:
+            await handler()
+
+    report = {
+        'config': {
+            'rps': args.rps, 'duration': args.duration, 'mix': args.mix, 'mongo_url': args.mongo_url,
+            'countries': args.countries, 'teams': args.teams, 'users': args.users, 'sessions': args.sessions,
+            'seed': args.seed,
+        },
+        **result,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main(sys.argv[1:])))
@@ -0,0 +1,135 @@
+"""Turn the duplicated `goals` collection into a view over `game_sessions`.
+
+Every scoring game used to be written twice: once as a session and once as
+a goal record with its own id. With GOALS_STORAGE_MODE=view (the default)
+only the session is written, and `goals` becomes a read-only view exposing
+the scoring sessions in the old goal shape (`goal_id` is the session id).
+
+    python migrate_goals.py status       # compare legacy goals with the sessions
+    python migrate_goals.py migrate      # rename goals to goals_legacy, create the view
+    python migrate_goals.py rollback     # drop the view, rename goals_legacy back
+    python migrate_goals.py drop-legacy  # drop goals_legacy once the view is in use
+
+`migrate` keeps the old documents as `goals_legacy` rather than deleting
+them, so it can be rolled back until `drop-legacy` is run. Run it after
+every worker is on GOALS_STORAGE_MODE=view, otherwise the dual writers
+would fail against the view.
+"""
+import asyncio
+import logging
+import sys
+from typing import Dict, Optional
+
+from database import GOALS_STORAGE_MODE, db
+
+GOALS = 'goals'
+LEGACY_GOALS = 'goals_legacy'
+
+# Scoring sessions in the shape of the old goal records
+GOALS_VIEW_PIPELINE = [
+    {'$match': {'score': {'$gt': 0}}},
+    {'$project': {
+        '_id': 0,
+        'goal_id': '$session_id',
+        'team_id': 1,
+        'team_name': 1,
+        'score': 1,
+        'user_id': 1,
+        'timestamp': 1,
+    }},
+]
+
+logger = logging.getLogger(__name__)
+
+
+async def collection_type(name: str) -> Optional[str]:
+    """'collection', 'view', or None if `name` does not exist."""
+    cursor = await db.list_collections(filter={'name': name})
+    info = await cursor.to_list(None)
+    return info[0].get('type', 'collection') if info else None
+
+
+async def goals_by_team(collection_name: str) -> Dict[str, int]:
+    pipeline = [{'$match': {'score': {'$gt': 0}}}, {'$group': {'_id': '$team_id', 'goals': {'$sum': '$score'}}}]
+    return {doc['_id']: doc['goals'] async for doc in db[collection_name].aggregate(pipeline)}
+
+
+async def compare(legacy_name: str) -> Dict[str, tuple]:
+    """Teams whose legacy goal total differs from their sessions, as (legacy, sessions)."""
+    legacy = await goals_by_team(legacy_name)
+    sessions = await goals_by_team('game_sessions')
+    return {
+        team_id: (legacy.get(team_id, 0), sessions.get(team_id, 0))
+        for team_id in sorted(legacy.keys() | sessions.keys())
+        if legacy.get(team_id, 0) != sessions.get(team_id, 0)
+    }
+
+
+async def status() -> int:
+    goals_type = await collection_type(GOALS)
+    legacy_type = await collection_type(LEGACY_GOALS)
+    print(f"GOALS_STORAGE_MODE={GOALS_STORAGE_MODE}, {GOALS}: {goals_type or 'missing'}, "
+          f"{LEGACY_GOALS}: {legacy_type or 'missing'}")
+    legacy_name = LEGACY_GOALS if legacy_type else GOALS if goals_type == 'collection' else None
+    if legacy_name is None:
+        return 0
+    differences = await compare(legacy_name)
+    for team_id, (legacy, sessions) in differences.items():
+        print(f"  {team_id}: {legacy} goals in {legacy_name}, {sessions} in game_sessions")
+    if not differences:
+        print(f"  {legacy_name} matches game_sessions for every team")
+    return 0
+
+
+async def migrate() -> int:
+    goals_type = await collection_type(GOALS)
+    if goals_type == 'view':
+        print(f"✅ {GOALS} is already a view")
+        return 0
+    if GOALS_STORAGE_MODE != 'view':
+        print("GOALS_STORAGE_MODE is not 'view'; switch every worker over before migrating")
+        return 1
+    if goals_type == 'collection':
+        if await collection_type(LEGACY_GOALS):
+            print(f"{LEGACY_GOALS} already exists; drop or rename it first")
+            return 1
+        await db[GOALS].rename(LEGACY_GOALS)
+        logger.info("Renamed %s to %s", GOALS, LEGACY_GOALS)
+    await db.create_collection(GOALS, viewOn='game_sessions', pipeline=GOALS_VIEW_PIPELINE)
+    print(f"✅ {GOALS} is now a view over game_sessions")
+    return 0
+
+
+async def rollback() -> int:
+    if await collection_type(GOALS) == 'view':
+        await db.drop_collection(GOALS)
+    if await collection_type(LEGACY_GOALS) is None:
+        print(f"{LEGACY_GOALS} does not exist; nothing to restore")
+        return 1
+    await db[LEGACY_GOALS].rename(GOALS)
+    print(f"✅ Restored {GOALS} from {LEGACY_GOALS}; games scored since the migration are only in game_sessions")
+    return 0
+
+
+async def drop_legacy() -> int:
+    if await collection_type(GOALS) != 'view':
+        print(f"{GOALS} is not a view yet; run migrate first")
+        return 1
+    await db.drop_collection(LEGACY_GOALS)
+    print(f"✅ Dropped {LEGACY_GOALS}")
+    return 0
+
+
+COMMANDS = {'status': status, 'migrate': migrate, 'rollback': rollback, 'drop-legacy': drop_legacy}
+
+
+async def main(command: str):
+    if command not in COMMANDS:
+        print(f"Unknown command: {command} (expected one of {', '.join(COMMANDS)})")
+        return 2
+    return await COMMANDS[command]()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else 'status')))
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 from enum import Enum
 
@@ -34,11 +34,17 @@ class Team(BaseModel):
     country_name: Optional[str] = None
     flag: Optional[str] = None
     shirt_design_url: Optional[str] = None
+    # Resized copies of the shirt keyed by "<size>.<format>", e.g. "96.webp"
+    shirt_variants: Optional[Dict[str, str]] = None
     color: str
     color2: Optional[str] = None
     goals: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class AdminTeam(Team):
+    # Documents the team's goal counter is spread over; see goal_counters.py
+    goal_shards: int = 1
+
 class TeamCreate(BaseModel):
     team_id: str
     name: str
@@ -53,6 +59,7 @@ class TeamUpdate(BaseModel):
     color: Optional[str] = None
     color2: Optional[str] = None
     shirt_design_url: Optional[str] = None
+    goal_shards: Optional[int] = Field(None, ge=1, le=64)
 
 # Goal Models
 class Goal(BaseModel):
@@ -124,6 +131,21 @@ class GameSessionCreate(BaseModel):
     team_id: str
     score: int
     user_id: Optional[str] = None
+    # Client-generated (e.g. a UUID per game); a retry with the same key
+    # returns the original session instead of counting the game again
+    idempotency_key: Optional[str] = Field(None, min_length=8, max_length=128)
+
+class GameSessionBatchItem(BaseModel):
+    index: int
+    status: str  # "created", "duplicate" (key seen before; original session) or "rejected"
+    session: Optional[GameSession] = None
+    error: Optional[str] = None
+
+class GameSessionBatchResult(BaseModel):
+    created: int
+    rejected: int
+    duplicates: int = 0
+    results: List[GameSessionBatchItem]
 
 # Stats Models
 class TeamStats(BaseModel):
@@ -147,6 +169,12 @@ class MonthlyStats(BaseModel):
     total_games: int
     unique_teams: int
 
+class AdminSummary(BaseModel):
+    total_countries: int
+    total_teams: int
+    total_goals: int
+    total_users: int
+
 class LeaderboardEntry(BaseModel):
     rank: int
     team_id: str
@@ -0,0 +1,74 @@
+import base64
+import json
+import re
+from typing import AsyncIterator, Callable, List, Optional, Sequence, Tuple
+
+from bson import json_util
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+def encode_cursor(document: dict, sort_fields: Sequence[str]) -> str:
+    """Opaque cursor pointing just after `document` in `sort_fields` order."""
+    values = [document.get(field) for field in sort_fields]
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, sort_fields: Sequence[str]) -> list:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(sort_fields):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def keyset_filter(sort_fields: Sequence[str], values: list, descending: bool = False) -> dict:
+    """Match documents strictly after `values` in `sort_fields` order."""
+    operator = "$lt" if descending else "$gt"
+    clauses = []
+    for idx, field in enumerate(sort_fields):
+        clause = {previous: values[i] for i, previous in enumerate(sort_fields[:idx])}
+        clause[field] = {operator: values[idx]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def prefix_filter(fields: Sequence[str], prefix: str) -> dict:
+    """Anchored, case-sensitive prefix match so that the field indexes are used."""
+    pattern = {"$regex": f"^{re.escape(prefix)}"}
+    clauses = [{field: pattern} for field in fields]
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def build_query(sort_fields: Sequence[str], after: Optional[str], *filters: dict, descending: bool = False) -> dict:
+    clauses = [f for f in filters if f]
+    if after:
+        clauses.append(keyset_filter(sort_fields, decode_cursor(after, sort_fields), descending))
+    if not clauses:
+        return {}
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+async def fetch_page(
+    collection, query: dict, sort_fields: Sequence[str], limit: int,
+    projection: Optional[dict] = None, descending: bool = False
+) -> Tuple[List[dict], Optional[str]]:
+    """One page of documents and the cursor of the next page, if there is one."""
+    documents = await collection.find(query, projection).sort(
+        [(field, -1 if descending else 1) for field in sort_fields]
+    ).to_list(limit + 1)
+    if len(documents) <= limit:
+        return documents, None
+    documents = documents[:limit]
+    return documents, encode_cursor(documents[-1], sort_fields)
+
+
+async def ndjson_lines(cursor, serialize: Callable[[dict], object]) -> AsyncIterator[bytes]:
+    """Encode documents one line at a time as they come off a Motor cursor."""
+    async for document in cursor:
+        yield json.dumps(jsonable_encoder(serialize(document)), ensure_ascii=False).encode() + b'\n'
@@ -0,0 +1,56 @@
+import asyncio
+import inspect
+import logging
+from typing import Callable, Optional
+
+
+class PeriodicTask:
+    """Calls `action` every `interval` seconds on a background task.
+
+    `action` may be sync or async. A failing call is logged to `logger` with
+    `failure_message` and the loop carries on. Setting `wakeup`, if given,
+    runs the action straight away instead of at the end of the interval.
+    """
+
+    def __init__(self, action: Callable, interval: float, logger: logging.Logger, failure_message: str,
+                 wakeup: Optional[asyncio.Event] = None):
+        self.action = action
+        self.interval = interval
+        self.logger = logger
+        self.failure_message = failure_message
+        self.wakeup = wakeup
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            if self.wakeup is None:
+                await asyncio.sleep(self.interval)
+            else:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                self.wakeup.clear()
+            try:
+                result = self.action()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                self.logger.exception(self.failure_message)
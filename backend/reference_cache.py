@@ -0,0 +1,79 @@
+from collections import defaultdict
+from typing import List, Optional
+
+from database import countries_collection, teams_collection
+from http_cache import response_cache
+
+
+class ReferenceCache:
+    """Process-local copy of the country and team reference data.
+
+    Loaded once at startup and kept current by the admin write routes, which
+    are the only code paths that change countries or team metadata. Team
+    goal counts held here are not maintained; read them from the leaderboard.
+    """
+
+    def __init__(self):
+        self._countries = {}
+        self._teams = {}
+        self._teams_by_country = defaultdict(dict)
+
+    async def load(self):
+        countries = await countries_collection.find({}, {"_id": 0}).to_list(None)
+        teams = await teams_collection.find({}, {"_id": 0}).to_list(None)
+        self._countries = {country['country_id']: country for country in countries}
+        response_cache.bump('countries')
+        self._teams = {}
+        self._teams_by_country = defaultdict(dict)
+        for team in teams:
+            self.set_team(team)
+
+    def country(self, country_id: str) -> Optional[dict]:
+        return self._countries.get(country_id)
+
+    def countries(self) -> List[dict]:
+        return list(self._countries.values())
+
+    def team(self, team_id: str) -> Optional[dict]:
+        return self._teams.get(team_id)
+
+    def teams(self) -> List[dict]:
+        return list(self._teams.values())
+
+    def country_teams(self, country_id: str) -> List[dict]:
+        return list(self._teams_by_country.get(country_id, {}).values())
+
+    def set_country(self, country: dict):
+        self._countries[country['country_id']] = {k: v for k, v in country.items() if k != '_id'}
+        response_cache.bump('countries')
+
+    def remove_country(self, country_id: str):
+        self._countries.pop(country_id, None)
+        response_cache.bump('countries')
+
+    def set_team(self, team: dict):
+        team = {k: v for k, v in team.items() if k != '_id'}
+        previous = self._teams.get(team['team_id'])
+        if previous and previous['country_id'] != team['country_id']:
+            self._teams_by_country[previous['country_id']].pop(team['team_id'], None)
+        self._teams[team['team_id']] = team
+        self._teams_by_country[team['country_id']][team['team_id']] = team
+        response_cache.bump('teams')
+
+    def remove_team(self, team_id: str):
+        team = self._teams.pop(team_id, None)
+        if team:
+            self._teams_by_country[team['country_id']].pop(team_id, None)
+        response_cache.bump('teams')
+
+    def enrich_team(self, team: dict) -> dict:
+        """Return a copy of `team` with the country name and flag filled in."""
+        enriched = dict(team)
+        country = self._countries.get(team['country_id'])
+        if country:
+            enriched['country_name'] = country['name']
+            enriched['flag'] = country['flag']
+        return enriched
+
+
+reference_cache = ReferenceCache()
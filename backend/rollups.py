@@ -0,0 +1,181 @@
+"""Per-team hourly, daily and monthly rollups of game sessions.
+
+Buckets are maintained by the write-behind flush as sessions are recorded.
+Existing history can be (re)built from `game_sessions`, with every server
+stopped, using:
+
+    python rollups.py backfill
+"""
+import asyncio
+import logging
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from database import game_sessions_collection, stats_rollups_collection
+
+GRANULARITIES = ('hour', 'day', 'month')
+
+# Date parts kept by each granularity when truncating a timestamp
+BUCKET_PARTS = {
+    'hour': ('year', 'month', 'day', 'hour'),
+    'day': ('year', 'month', 'day'),
+    'month': ('year', 'month'),
+}
+
+# Aggregation operator extracting each date part from a session timestamp
+DATE_PART_OPERATORS = {'year': '$year', 'month': '$month', 'day': '$dayOfMonth', 'hour': '$hour'}
+
+BACKFILL_BATCH_SIZE = 1000
+
+RollupKey = Tuple[str, datetime, str]
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    parts = {part: getattr(timestamp, part) for part in BUCKET_PARTS[granularity]}
+    parts.setdefault('day', 1)
+    return datetime(**parts)
+
+
+def accumulate(pending: Dict[RollupKey, dict], team_id: str, timestamp: datetime, score: int):
+    """Add one session to the pending deltas of every granularity."""
+    for granularity in GRANULARITIES:
+        key = (granularity, bucket_start(timestamp, granularity), team_id)
+        delta = pending.setdefault(key, {'goals': 0, 'games': 0, 'max_score': score})
+        delta['goals'] += score
+        delta['games'] += 1
+        delta['max_score'] = max(delta['max_score'], score)
+
+
+def retract(pending: Dict[RollupKey, dict], team_id: str, timestamp: datetime, score: int):
+    """Take one accumulated session back out of the pending deltas; `max_score` stays.
+
+    A delta left without games is dropped, so no empty bucket is upserted.
+    """
+    for granularity in GRANULARITIES:
+        key = (granularity, bucket_start(timestamp, granularity), team_id)
+        delta = pending.get(key)
+        if delta is not None:
+            delta['goals'] -= score
+            delta['games'] -= 1
+            if not delta['games']:
+                del pending[key]
+
+
+def merge(pending: Dict[RollupKey, dict], other: Dict[RollupKey, dict]):
+    for key, delta in other.items():
+        current = pending.get(key)
+        if current is None:
+            pending[key] = dict(delta)
+            continue
+        current['goals'] += delta['goals']
+        current['games'] += delta['games']
+        current['max_score'] = max(current['max_score'], delta['max_score'])
+
+
+def rollup_ops(pending: Dict[RollupKey, dict]) -> List[UpdateOne]:
+    return [
+        UpdateOne(
+            {'granularity': granularity, 'bucket': bucket, 'team_id': team_id},
+            {
+                '$inc': {'goals': delta['goals'], 'games': delta['games']},
+                '$max': {'max_score': delta['max_score']},
+            },
+            upsert=True
+        )
+        for (granularity, bucket, team_id), delta in pending.items()
+    ]
+
+
+async def team_totals(granularity: str, start: datetime, end: Optional[datetime] = None) -> Dict[str, dict]:
+    """Goals, games and best score per team over the buckets in [start, end)."""
+    bucket_filter = {'$gte': bucket_start(start, granularity)}
+    if end is not None:
+        bucket_filter['$lt'] = end
+    totals = defaultdict(lambda: {'goals': 0, 'games': 0, 'max_score': 0})
+    async for doc in stats_rollups_collection.find({'granularity': granularity, 'bucket': bucket_filter}):
+        total = totals[doc['team_id']]
+        total['goals'] += doc['goals']
+        total['games'] += doc['games']
+        total['max_score'] = max(total['max_score'], doc['max_score'])
+    return dict(totals)
+
+
+async def period_totals(granularity: str, start: datetime) -> List[dict]:
+    """Goals, games and distinct teams per bucket since `start`, oldest first."""
+    periods = {}
+    cursor = stats_rollups_collection.find(
+        {'granularity': granularity, 'bucket': {'$gte': bucket_start(start, granularity)}}
+    ).sort('bucket', 1)
+    async for doc in cursor:
+        period = periods.setdefault(doc['bucket'], {
+            'bucket': doc['bucket'], 'total_goals': 0, 'total_games': 0, 'unique_teams': 0
+        })
+        period['total_goals'] += doc['goals']
+        period['total_games'] += doc['games']
+        period['unique_teams'] += 1
+    return list(periods.values())
+
+
+async def backfill(granularity: str) -> int:
+    """Rebuild every bucket of one granularity from the raw game sessions.
+
+    Bucket totals are overwritten, so this can be re-run, but only while no
+    server is recording games: a session flushed between the aggregation and
+    the overwrite would be counted by both or lost. `main` refuses to start
+    while a write-behind heartbeat is recent.
+    """
+    bucket = {
+        '$dateFromParts': {
+            part: {DATE_PART_OPERATORS[part]: '$timestamp'}
+            for part in BUCKET_PARTS[granularity]
+        }
+    }
+    pipeline = [
+        {'$group': {
+            '_id': {'team_id': '$team_id', 'bucket': bucket},
+            'goals': {'$sum': '$score'},
+            'games': {'$sum': 1},
+            'max_score': {'$max': '$score'},
+        }}
+    ]
+
+    written = 0
+    ops = []
+    async for doc in game_sessions_collection.aggregate(pipeline, allowDiskUse=True):
+        ops.append(UpdateOne(
+            {'granularity': granularity, 'bucket': doc['_id']['bucket'], 'team_id': doc['_id']['team_id']},
+            {'$set': {'goals': doc['goals'], 'games': doc['games'], 'max_score': doc['max_score']}},
+            upsert=True
+        ))
+        if len(ops) >= BACKFILL_BATCH_SIZE:
+            await stats_rollups_collection.bulk_write(ops, ordered=False)
+            written += len(ops)
+            ops = []
+    if ops:
+        await stats_rollups_collection.bulk_write(ops, ordered=False)
+        written += len(ops)
+    return written
+
+
+async def main(command: str):
+    if command != 'backfill':
+        print(f"Unknown command: {command} (expected 'backfill')")
+        return 2
+    from write_behind import WRITER_HEARTBEAT_SECONDS, writer_seen_since
+
+    if await writer_seen_since(datetime.utcnow() - timedelta(seconds=6 * WRITER_HEARTBEAT_SECONDS)):
+        print("A server recorded games in the last minute; stop every server before backfilling")
+        return 1
+    for granularity in GRANULARITIES:
+        written = await backfill(granularity)
+        print(f"✅ Backfilled {written} {granularity} buckets")
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else 'backfill')))
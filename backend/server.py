@@ -1,5 +1,8 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, UploadFile, File, status
-from fastapi.staticfiles import StaticFiles
+from fastapi import (
+    FastAPI, APIRouter, Depends, HTTPException, UploadFile, File, Query, Request, Response, status,
+    WebSocket, WebSocketDisconnect
+)
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 import os
@@ -8,39 +11,57 @@ from pathlib import Path
 from typing import List, Optional
 import uuid
 from datetime import datetime, timedelta
-import shutil
+
+from pymongo.errors import DuplicateKeyError
 
 from models import (
     Country, CountryCreate, CountryUpdate,
-    Team, TeamCreate, TeamUpdate,
+    Team, AdminTeam, TeamCreate, TeamUpdate,
     Goal, GoalCreate,
     User, UserInDB, UserCreate, UserUpdate,
-    GameSession, GameSessionCreate,
+    GameSession, GameSessionCreate, GameSessionBatchItem, GameSessionBatchResult,
     Token, LoginRequest,
-    TeamStats, DailyStats, MonthlyStats, LeaderboardEntry,
+    TeamStats, DailyStats, MonthlyStats, AdminSummary, LeaderboardEntry,
     UserRole,
     GameConfig, GameConfigUpdate,
     Announcement, AnnouncementCreate, AnnouncementUpdate
 )
 from auth import (
-    get_password_hash, verify_password, create_access_token,
-    get_current_user, get_admin_user
+    create_access_token,
+    get_current_user, get_admin_user, get_user_document, invalidate_user, user_cache,
+    password_hasher
 )
 from database import (
-    countries_collection, teams_collection, goals_collection,
-    users_collection, game_sessions_collection, config_collection, 
+    countries_collection, teams_collection, GOALS_STORAGE_MODE,
+    users_collection, game_sessions_collection,
     announcements_collection, db
 )
+from write_behind import goal_writer
+from leaderboard import leaderboard
+from reference_cache import reference_cache
+from indexes import ensure_indexes
+import metrics
+import rollups
+from instrumentation import QueryAccountingMiddleware, RequestMetricsMiddleware
+from compression import CompressionMiddleware
+from live import broadcaster, LIVE_HEARTBEAT_SECONDS
+from http_cache import response_cache, trusted_content
+from config_cache import game_config
+from invalidation import invalidation_bus
+from shirt_storage import (
+    SHIRT_URL_PREFIX, UploadSizeLimitMiddleware, cancel_release_retries, release_shirt, shirt_path, store_shirt
+)
+from shirt_images import variant_renderer
+from static_files import ImmutableStaticFiles
+from pagination import NEXT_CURSOR_HEADER, build_query, encode_cursor, fetch_page, ndjson_lines, prefix_filter
+from history import HISTORY_PROJECTION, HISTORY_SORT_FIELDS, recent_games
+import idempotency
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# Create uploads directory
-UPLOAD_DIR = ROOT_DIR / 'uploads' / 'shirts'
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-
 # Create the main app
-app = FastAPI(title="Mini Cup API", version="1.0.0")
+app = FastAPI(title="Mini Cup API", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -52,28 +73,38 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Cache-Control lifetimes (seconds) of public read endpoints: reference data
+# changes only through the admin routes, goal counts change constantly
+REFERENCE_MAX_AGE = 60
+REFERENCE_STALE_WHILE_REVALIDATE = 600
+LIVE_MAX_AGE = 5
+LIVE_STALE_WHILE_REVALIDATE = 30
+
+# Largest number of games accepted by one POST /game/sessions/batch
+MAX_BATCH_SESSIONS = 500
+
+# Default and largest page sizes of the admin listings
+ADMIN_PAGE_SIZE = 1000
+ADMIN_MAX_PAGE_SIZE = 5000
+
+def _duplicate_key_field(error: DuplicateKeyError) -> Optional[str]:
+    """Name of the first field of the unique index that rejected a write"""
+    key_pattern = (error.details or {}).get('keyPattern')
+    if key_pattern:
+        return next(iter(key_pattern))
+    return None
+
 # ==================== AUTH ROUTES ====================
 
 @api_router.post("/auth/register", response_model=User)
 async def register(user_data: UserCreate):
-    # Check if user exists
-    existing_user = await users_collection.find_one({"email": user_data.email})
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    existing_username = await users_collection.find_one({"username": user_data.username})
-    if existing_username:
-        raise HTTPException(status_code=400, detail="Username already taken")
-    
     # Verify country and team if provided
     if user_data.country_id:
-        country = await countries_collection.find_one({"country_id": user_data.country_id})
-        if not country:
+        if not reference_cache.country(user_data.country_id):
             raise HTTPException(status_code=404, detail="Country not found")
     
     if user_data.team_id:
-        team = await teams_collection.find_one({"team_id": user_data.team_id})
-        if not team:
+        if not reference_cache.team(user_data.team_id):
             raise HTTPException(status_code=404, detail="Team not found")
     
     # Create user
@@ -81,17 +112,23 @@ async def register(user_data: UserCreate):
     user_dict = user_data.dict()
     password = user_dict.pop('password')
     user_dict['user_id'] = user_id
-    user_dict['password_hash'] = get_password_hash(password)
+    user_dict['password_hash'] = await password_hasher.hash(password)
     user_dict['created_at'] = datetime.utcnow()
     
-    await users_collection.insert_one(user_dict)
+    # Email and username uniqueness is enforced by unique indexes
+    try:
+        await users_collection.insert_one(user_dict)
+    except DuplicateKeyError as e:
+        if _duplicate_key_field(e) == 'username':
+            raise HTTPException(status_code=400, detail="Username already taken")
+        raise HTTPException(status_code=400, detail="Email already registered")
     
     return User(**{k: v for k, v in user_dict.items() if k != 'password_hash'})
 
 @api_router.post("/auth/login", response_model=Token)
 async def login(login_data: LoginRequest):
     user = await users_collection.find_one({"email": login_data.email})
-    if not user or not verify_password(login_data.password, user['password_hash']):
+    if not user or not await password_hasher.verify(login_data.password, user['password_hash']):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -104,29 +141,67 @@ async def login(login_data: LoginRequest):
 
 @api_router.get("/auth/me", response_model=User)
 async def get_me(current_user: dict = Depends(get_current_user)):
-    user = await users_collection.find_one({"user_id": current_user['user_id']})
+    user = await get_user_document(current_user['user_id'])
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return User(**{k: v for k, v in user.items() if k != 'password_hash'})
+    return User(**user)
+
+async def _admin_listing(
+    response: Response, collection, sort_fields, serialize, limit: int, after: Optional[str],
+    format: str, *filters: Optional[dict], projection: Optional[dict] = None
+):
+    """Keyset-paginated admin listing, or the whole result streamed as NDJSON.
+    
+    The next page's cursor is returned in the X-Next-Cursor header; the
+    NDJSON format ignores `limit` and streams everything after `after`.
+    """
+    query = build_query(sort_fields, after, *filters)
+    if format == "ndjson":
+        cursor = collection.find(query, projection).sort([(field, 1) for field in sort_fields])
+        return StreamingResponse(ndjson_lines(cursor, serialize), media_type="application/x-ndjson")
+    
+    documents, next_cursor = await fetch_page(collection, query, sort_fields, limit, projection)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return [serialize(document) for document in documents]
+
+@api_router.get("/admin/summary", response_model=AdminSummary)
+async def get_admin_summary(current_user: dict = Depends(get_admin_user)):
+    """Dashboard totals; the listings are paginated and cannot be counted client-side"""
+    return AdminSummary(
+        total_countries=len(reference_cache.countries()),
+        total_teams=len(reference_cache.teams()),
+        total_goals=sum(goals for _, _, goals in leaderboard.ranked()),
+        total_users=await users_collection.estimated_document_count(),
+    )
 
 # ==================== ADMIN COUNTRY ROUTES ====================
 
 @api_router.get("/admin/countries", response_model=List[Country])
-async def get_all_countries_admin(current_user: dict = Depends(get_admin_user)):
-    countries = await countries_collection.find().to_list(1000)
-    return [Country(**country) for country in countries]
+async def get_all_countries_admin(
+    response: Response,
+    limit: int = Query(ADMIN_PAGE_SIZE, ge=1, le=ADMIN_MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    current_user: dict = Depends(get_admin_user)
+):
+    return await _admin_listing(
+        response, countries_collection, ('country_id',), lambda country: Country(**country),
+        limit, after, format
+    )
 
 @api_router.post("/admin/countries", response_model=Country)
 async def create_country(country_data: CountryCreate, current_user: dict = Depends(get_admin_user)):
-    # Check if country_id exists
-    existing = await countries_collection.find_one({"country_id": country_data.country_id})
-    if existing:
-        raise HTTPException(status_code=400, detail="Country ID already exists")
-    
     country_dict = country_data.dict()
     country_dict['created_at'] = datetime.utcnow()
     
-    await countries_collection.insert_one(country_dict)
+    # country_id uniqueness is enforced by a unique index
+    try:
+        await countries_collection.insert_one(country_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Country ID already exists")
+    reference_cache.set_country(country_dict)
+    await invalidation_bus.publish('countries')
     return Country(**country_dict)
 
 @api_router.put("/admin/countries/{country_id}", response_model=Country)
@@ -144,6 +219,8 @@ async def update_country(country_id: str, country_data: CountryUpdate, current_u
     if not result:
         raise HTTPException(status_code=404, detail="Country not found")
     
+    reference_cache.set_country(result)
+    await invalidation_bus.publish('countries')
     return Country(**result)
 
 @api_router.delete("/admin/countries/{country_id}")
@@ -157,32 +234,31 @@ async def delete_country(country_id: str, current_user: dict = Depends(get_admin
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Country not found")
     
+    reference_cache.remove_country(country_id)
+    await invalidation_bus.publish('countries')
     return {"message": "Country deleted successfully"}
 
 # ==================== ADMIN TEAM ROUTES ====================
 
-@api_router.get("/admin/teams", response_model=List[Team])
-async def get_all_teams_admin(current_user: dict = Depends(get_admin_user)):
-    teams = await teams_collection.find().to_list(1000)
-    
-    # Enrich with country data
-    for team in teams:
-        country = await countries_collection.find_one({"country_id": team['country_id']})
-        if country:
-            team['country_name'] = country['name']
-            team['flag'] = country['flag']
-    
-    return [Team(**team) for team in teams]
+@api_router.get("/admin/teams", response_model=List[AdminTeam])
+async def get_all_teams_admin(
+    response: Response,
+    limit: int = Query(ADMIN_PAGE_SIZE, ge=1, le=ADMIN_MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    country_id: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    current_user: dict = Depends(get_admin_user)
+):
+    return await _admin_listing(
+        response, teams_collection, ('team_id',), lambda team: AdminTeam(**_team_with_goals(team)),
+        limit, after, format,
+        {"country_id": country_id} if country_id else None
+    )
 
-@api_router.post("/admin/teams", response_model=Team)
+@api_router.post("/admin/teams", response_model=AdminTeam)
 async def create_team(team_data: TeamCreate, current_user: dict = Depends(get_admin_user)):
-    # Check if team_id exists
-    existing = await teams_collection.find_one({"team_id": team_data.team_id})
-    if existing:
-        raise HTTPException(status_code=400, detail="Team ID already exists")
-    
     # Verify country exists
-    country = await countries_collection.find_one({"country_id": team_data.country_id})
+    country = reference_cache.country(team_data.country_id)
     if not country:
         raise HTTPException(status_code=404, detail="Country not found")
     
@@ -192,10 +268,17 @@ async def create_team(team_data: TeamCreate, current_user: dict = Depends(get_ad
     team_dict['country_name'] = country['name']
     team_dict['flag'] = country['flag']
     
-    await teams_collection.insert_one(team_dict)
-    return Team(**team_dict)
+    # team_id uniqueness is enforced by a unique index
+    try:
+        await teams_collection.insert_one(team_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Team ID already exists")
+    reference_cache.set_team(team_dict)
+    leaderboard.add_team(team_dict)
+    await invalidation_bus.publish('teams')
+    return AdminTeam(**team_dict)
 
-@api_router.put("/admin/teams/{team_id}", response_model=Team)
+@api_router.put("/admin/teams/{team_id}", response_model=AdminTeam)
 async def update_team(team_id: str, team_data: TeamUpdate, current_user: dict = Depends(get_admin_user)):
     update_data = {k: v for k, v in team_data.dict().items() if v is not None}
     if not update_data:
@@ -203,32 +286,48 @@ async def update_team(team_id: str, team_data: TeamUpdate, current_user: dict =
     
     # If updating country, verify it exists
     if 'country_id' in update_data:
-        country = await countries_collection.find_one({"country_id": update_data['country_id']})
+        country = reference_cache.country(update_data['country_id'])
         if not country:
             raise HTTPException(status_code=404, detail="Country not found")
         update_data['country_name'] = country['name']
         update_data['flag'] = country['flag']
     
-    result = await teams_collection.find_one_and_update(
+    # Variants belong to an uploaded shirt, not to an arbitrary URL
+    if 'shirt_design_url' in update_data:
+        update_data['shirt_variants'] = None
+    
+    previous = await teams_collection.find_one_and_update(
         {"team_id": team_id},
         {"$set": update_data},
-        return_document=True
+        return_document=False
     )
     
-    if not result:
+    if not previous:
         raise HTTPException(status_code=404, detail="Team not found")
     
-    return Team(**result)
+    result = {**previous, **update_data}
+    reference_cache.set_team(result)
+    await invalidation_bus.publish('teams')
+    if 'shirt_design_url' in update_data and previous.get('shirt_design_url') != update_data['shirt_design_url']:
+        await release_shirt(previous.get('shirt_design_url'))
+    return _team_with_goals(result)
 
 @api_router.delete("/admin/teams/{team_id}")
 async def delete_team(team_id: str, current_user: dict = Depends(get_admin_user)):
-    result = await teams_collection.delete_one({"team_id": team_id})
-    if result.deleted_count == 0:
+    team = await teams_collection.find_one_and_delete(
+        {"team_id": team_id}, {"_id": 0, "team_id": 1, "shirt_design_url": 1}
+    )
+    if team is None:
         raise HTTPException(status_code=404, detail="Team not found")
     
-    # Delete associated goals
-    await goals_collection.delete_many({"team_id": team_id})
-    await game_sessions_collection.delete_many({"team_id": team_id})
+    reference_cache.remove_team(team_id)
+    leaderboard.remove_team(team_id)
+    recent_games.remove_team(team_id)
+    
+    # Delete associated games, goals, rollups and goal shards
+    await goal_writer.purge_teams([team_id])
+    await invalidation_bus.publish('teams')
+    await release_shirt(team.get('shirt_design_url'))
     
     return {"message": "Team deleted successfully"}
 
@@ -239,40 +338,50 @@ async def upload_shirt_design(team_id: str, file: UploadFile = File(...), curren
     if not team:
         raise HTTPException(status_code=404, detail="Team not found")
     
-    # Validate file type
-    if not file.content_type.startswith('image/'):
-        raise HTTPException(status_code=400, detail="File must be an image")
-    
-    # Save file
-    file_extension = file.filename.split('.')[-1]
-    filename = f"{team_id}_{uuid.uuid4()}.{file_extension}"
-    file_path = UPLOAD_DIR / filename
-    
-    with file_path.open('wb') as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Stored under its content hash; type and size are checked while copying
+    shirt_url = await store_shirt(file)
+    # Thumbnails are rendered once here rather than resized by every client
+    shirt_variants = await variant_renderer.render(shirt_path(shirt_url), SHIRT_URL_PREFIX)
     
     # Update team with shirt URL
-    shirt_url = f"/api/uploads/shirts/{filename}"
-    await teams_collection.update_one(
+    update = {"shirt_design_url": shirt_url, "shirt_variants": shirt_variants}
+    previous = await teams_collection.find_one_and_update(
         {"team_id": team_id},
-        {"$set": {"shirt_design_url": shirt_url}}
+        {"$set": update},
+        return_document=False
     )
+    if previous:
+        reference_cache.set_team({**previous, **update})
+        await invalidation_bus.publish('teams')
+        if previous.get('shirt_design_url') != shirt_url:
+            await release_shirt(previous.get('shirt_design_url'))
     
-    return {"shirt_design_url": shirt_url}
+    return update
 
 # ==================== ADMIN USER ROUTES ====================
 
 @api_router.get("/admin/users", response_model=List[User])
-async def get_all_users(current_user: dict = Depends(get_admin_user)):
-    users = await users_collection.find().to_list(1000)
-    return [User(**{k: v for k, v in user.items() if k != 'password_hash'}) for user in users]
+async def get_all_users(
+    response: Response,
+    limit: int = Query(ADMIN_PAGE_SIZE, ge=1, le=ADMIN_MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    q: Optional[str] = Query(None, min_length=1, description="Username or email prefix"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    current_user: dict = Depends(get_admin_user)
+):
+    return await _admin_listing(
+        response, users_collection, ('created_at', 'user_id'), lambda user: User(**user),
+        limit, after, format,
+        prefix_filter(('username', 'email'), q) if q else None,
+        projection={"_id": 0, "password_hash": 0}
+    )
 
 @api_router.put("/admin/users/{user_id}", response_model=User)
 async def update_user(user_id: str, user_data: UserUpdate, current_user: dict = Depends(get_admin_user)):
     update_data = {k: v for k, v in user_data.dict().items() if v is not None}
     
     if 'password' in update_data:
-        update_data['password_hash'] = get_password_hash(update_data.pop('password'))
+        update_data['password_hash'] = await password_hasher.hash(update_data.pop('password'))
     
     if not update_data:
         raise HTTPException(status_code=400, detail="No data to update")
@@ -286,6 +395,8 @@ async def update_user(user_id: str, user_data: UserUpdate, current_user: dict =
     if not result:
         raise HTTPException(status_code=404, detail="User not found")
     
+    invalidate_user(user_id)
+    await invalidation_bus.publish('users')
     return User(**{k: v for k, v in result.items() if k != 'password_hash'})
 
 @api_router.delete("/admin/users/{user_id}")
@@ -297,222 +408,364 @@ async def delete_user(user_id: str, current_user: dict = Depends(get_admin_user)
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
     
+    invalidate_user(user_id)
+    await invalidation_bus.publish('users')
     return {"message": "User deleted successfully"}
 
 # ==================== PUBLIC GAME ROUTES ====================
 
+def _team_with_goals(team: dict) -> dict:
+    """Team document enriched with country data and its live goal count"""
+    enriched = reference_cache.enrich_team(team)
+    enriched['goals'] = leaderboard.goals(team['team_id'])
+    return enriched
+
 @api_router.get("/countries", response_model=List[Country])
-async def get_countries():
-    countries = await countries_collection.find().to_list(1000)
-    return [Country(**country) for country in countries]
+async def get_countries(request: Request):
+    return await response_cache.respond(
+        request, ('countries',),
+        lambda: trusted_content(Country, reference_cache.countries()),
+        max_age=REFERENCE_MAX_AGE,
+        stale_while_revalidate=REFERENCE_STALE_WHILE_REVALIDATE
+    )
 
 @api_router.get("/countries/{country_id}/teams", response_model=List[Team])
-async def get_country_teams(country_id: str):
-    teams = await teams_collection.find({"country_id": country_id}).to_list(1000)
-    
-    # Enrich with country data
-    country = await countries_collection.find_one({"country_id": country_id})
-    for team in teams:
-        if country:
-            team['country_name'] = country['name']
-            team['flag'] = country['flag']
-    
-    return [Team(**team) for team in teams]
+async def get_country_teams(country_id: str, request: Request):
+    return await response_cache.respond(
+        request, ('countries', 'teams', 'leaderboard'),
+        lambda: trusted_content(Team, map(_team_with_goals, reference_cache.country_teams(country_id))),
+        max_age=LIVE_MAX_AGE,
+        stale_while_revalidate=LIVE_STALE_WHILE_REVALIDATE
+    )
 
 @api_router.get("/teams", response_model=List[Team])
-async def get_all_teams():
-    teams = await teams_collection.find().to_list(1000)
-    
-    # Enrich with country data
-    for team in teams:
-        country = await countries_collection.find_one({"country_id": team['country_id']})
-        if country:
-            team['country_name'] = country['name']
-            team['flag'] = country['flag']
+async def get_all_teams(request: Request):
+    return await response_cache.respond(
+        request, ('countries', 'teams', 'leaderboard'),
+        lambda: trusted_content(Team, map(_team_with_goals, reference_cache.teams())),
+        max_age=LIVE_MAX_AGE,
+        stale_while_revalidate=LIVE_STALE_WHILE_REVALIDATE
+    )
+
+def _new_game_session(session_data: GameSessionCreate, team: dict) -> dict:
+    session_dict = session_data.dict(exclude={'idempotency_key'})
+    session_dict['session_id'] = str(uuid.uuid4())
+    session_dict['team_name'] = team['name']
+    # MongoDB keeps milliseconds; truncating up front makes a replayed
+    # session identical to the first response
+    now = datetime.utcnow()
+    session_dict['timestamp'] = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    return session_dict
+
+def _record_game_session(session_dict: dict):
+    """Queue a finished game for writing and count its goals on the leaderboard"""
+    # Separate goal record, only kept when goals are not a view of the sessions
+    goal_dict = None
+    if session_dict['score'] > 0 and GOALS_STORAGE_MODE == 'dual':
+        goal_dict = {
+            'goal_id': session_dict['session_id'],
+            'team_id': session_dict['team_id'],
+            'team_name': session_dict['team_name'],
+            'score': session_dict['score'],
+            'user_id': session_dict['user_id'],
+            'timestamp': session_dict['timestamp']
+        }
     
-    return [Team(**team) for team in teams]
+    # Session, goal record and team goals increment are written in batches
+    goal_writer.add_session(session_dict, goal_dict)
+    leaderboard.add_goals(session_dict['team_id'], session_dict['score'])
+    recent_games.add(session_dict)
+
+async def _record_lost_originals(originals: List[dict]):
+    """Re-record replayed sessions that never reached the database.
+
+    The key is claimed before the session is flushed, so a worker dying in
+    between leaves a key whose game was never counted. Holding the flush
+    lock keeps this worker's batches from landing mid-check; a game that
+    two workers re-record at once is settled by the session_id index.
+    """
+    if not originals:
+        return
+    async with goal_writer.flush_lock:
+        unbuffered = {
+            original['session_id']: original for original in originals
+            if not goal_writer.is_pending(original['session_id'])
+        }
+        if not unbuffered:
+            return
+        async for saved in game_sessions_collection.find(
+            {"session_id": {"$in": list(unbuffered)}}, {"_id": 0, "session_id": 1}
+        ):
+            del unbuffered[saved['session_id']]
+        for original in unbuffered.values():
+            if not reference_cache.team(original['team_id']):
+                # Its team was deleted since; the game goes with it
+                continue
+            logger.warning("Re-recording game session %s, claimed but never saved", original['session_id'])
+            _record_game_session(original)
+
+def _require_write_room(count: int):
+    """Turn games away while the write buffer is full, e.g. during a MongoDB outage"""
+    if not goal_writer.has_room(count):
+        raise HTTPException(
+            status_code=503,
+            detail="Too many games waiting to be saved, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
 
 @api_router.post("/game/session", response_model=GameSession)
 async def create_game_session(session_data: GameSessionCreate):
     # Verify team exists
-    team = await teams_collection.find_one({"team_id": session_data.team_id})
+    team = reference_cache.team(session_data.team_id)
     if not team:
         raise HTTPException(status_code=404, detail="Team not found")
+    _require_write_room(1)
+    
+    session_dict = _new_game_session(session_data, team)
+    key = session_data.idempotency_key
+    if key:
+        # A retry gets the original session back and counts nothing again
+        original = (await idempotency.claim([(key, session_dict)])).get(key)
+        if original is not None:
+            await _record_lost_originals([original])
+            if not idempotency.same_game(original, session_dict):
+                raise HTTPException(status_code=422, detail="Idempotency key was already used for a different game")
+            return GameSession(**original)
+    
+    _record_game_session(session_dict)
+    return GameSession(**session_dict)
+
+@api_router.post("/game/sessions/batch", response_model=GameSessionBatchResult)
+async def create_game_sessions_batch(sessions: List[GameSessionCreate]):
+    """Record many finished games at once, e.g. from a relay or an offline queue"""
+    if len(sessions) > MAX_BATCH_SESSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch cannot contain more than {MAX_BATCH_SESSIONS} sessions"
+        )
+    _require_write_room(len(sessions))
     
-    # Create game session
-    session_id = str(uuid.uuid4())
-    session_dict = session_data.dict()
-    session_dict['session_id'] = session_id
-    session_dict['team_name'] = team['name']
-    session_dict['timestamp'] = datetime.utcnow()
-    
-    await game_sessions_collection.insert_one(session_dict)
-    
-    # Update team goals
-    await teams_collection.update_one(
-        {"team_id": session_data.team_id},
-        {"$inc": {"goals": session_data.score}}
+    results = {}
+    accepted = []
+    for index, session_data in enumerate(sessions):
+        team = reference_cache.team(session_data.team_id)
+        if not team:
+            results[index] = GameSessionBatchItem(index=index, status="rejected", error="Team not found")
+            continue
+        accepted.append((index, session_data.idempotency_key, _new_game_session(session_data, team)))
+    
+    # Claim every key with one insert; a key repeated within the batch
+    # belongs to its first game
+    first_by_key = {}
+    for _, key, session_dict in accepted:
+        if key:
+            first_by_key.setdefault(key, session_dict)
+    taken = await idempotency.claim(list(first_by_key.items()))
+    
+    for index, key, session_dict in accepted:
+        original = None
+        if key:
+            original = taken.get(key) or (first_by_key[key] if first_by_key[key] is not session_dict else None)
+        if original is None:
+            _record_game_session(session_dict)
+            results[index] = GameSessionBatchItem(index=index, status="created", session=GameSession(**session_dict))
+        elif idempotency.same_game(original, session_dict):
+            results[index] = GameSessionBatchItem(index=index, status="duplicate", session=GameSession(**original))
+        else:
+            results[index] = GameSessionBatchItem(
+                index=index, status="rejected", error="Idempotency key was already used for a different game"
+            )
+    results = [results[index] for index in sorted(results)]
+    await _record_lost_originals(list(taken.values()))
+    
+    # Write the whole batch now: one insert_many per collection and one
+    # bulk_write of team increments. On failure it stays queued for retry.
+    try:
+        await goal_writer.flush()
+    except Exception:
+        logger.exception("Batch flush failed, sessions remain queued")
+    
+    created = sum(1 for result in results if result.status == "created")
+    duplicates = sum(1 for result in results if result.status == "duplicate")
+    return GameSessionBatchResult(
+        created=created, rejected=len(results) - created - duplicates, duplicates=duplicates, results=results
     )
-    
-    # Create goal record for each goal scored
-    if session_data.score > 0:
-        goal_dict = {
-            'goal_id': str(uuid.uuid4()),
-            'team_id': session_data.team_id,
-            'team_name': team['name'],
-            'score': session_data.score,
-            'user_id': session_data.user_id,
-            'timestamp': datetime.utcnow()
-        }
-        await goals_collection.insert_one(goal_dict)
-    
-    return GameSession(**session_dict)
+
+@api_router.get("/game/history", response_model=List[GameSession])
+async def get_game_history(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    before: Optional[str] = None,
+    team_id: Optional[str] = None,
+    user_id: Optional[str] = None
+):
+    """Most recent games first. Pass the X-Next-Cursor header back as `before` for older games"""
+    if not before:
+        # The first page usually comes straight from the in-memory ring
+        sessions = recent_games.latest(limit + 1, team_id, user_id)
+        if sessions is not None:
+            if len(sessions) > limit:
+                sessions = sessions[:limit]
+                response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sessions[-1], HISTORY_SORT_FIELDS)
+            return sessions
+    
+    filters = {}
+    if team_id:
+        filters['team_id'] = team_id
+    if user_id:
+        filters['user_id'] = user_id
+    query = build_query(HISTORY_SORT_FIELDS, before, filters, descending=True)
+    sessions, next_cursor = await fetch_page(
+        game_sessions_collection, query, HISTORY_SORT_FIELDS, limit, HISTORY_PROJECTION, descending=True
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return sessions
 
 @api_router.get("/leaderboard", response_model=List[LeaderboardEntry])
-async def get_leaderboard():
-    teams = await teams_collection.find().sort("goals", -1).to_list(1000)
-    
-    leaderboard = []
-    for idx, team in enumerate(teams):
-        country = await countries_collection.find_one({"country_id": team['country_id']})
-        leaderboard.append(LeaderboardEntry(
-            rank=idx + 1,
-            team_id=team['team_id'],
-            team_name=team['name'],
-            country_name=country['name'] if country else '',
-            flag=country['flag'] if country else '',
-            goals=team['goals'],
-            color=team['color']
-        ))
-    
-    return leaderboard
+async def get_leaderboard(
+    request: Request,
+    limit: int = Query(1000, ge=1, le=1000),
+    offset: int = Query(0, ge=0)
+):
+    """Served from the in-memory ranking, no database access"""
+    return await response_cache.respond(
+        request, ('countries', 'teams', 'leaderboard'),
+        lambda: leaderboard.page(offset, limit),
+        max_age=LIVE_MAX_AGE,
+        stale_while_revalidate=LIVE_STALE_WHILE_REVALIDATE
+    )
+
+@api_router.get("/leaderboard/stream")
+async def stream_leaderboard():
+    """Server-sent events: a snapshot, then rank and goal deltas as games are recorded"""
+    async def events():
+        subscriber = broadcaster.subscribe()
+        try:
+            yield broadcaster.snapshot().sse
+            while True:
+                frame = await subscriber.next_frame(timeout=LIVE_HEARTBEAT_SECONDS)
+                yield frame.sse if frame else b": heartbeat\n\n"
+        finally:
+            broadcaster.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.websocket("/leaderboard/ws")
+async def leaderboard_websocket(websocket: WebSocket):
+    """Same frames as /leaderboard/stream, as WebSocket text messages"""
+    await websocket.accept()
+    subscriber = broadcaster.subscribe()
+    try:
+        await websocket.send_text(broadcaster.snapshot().text)
+        while True:
+            frame = await subscriber.next_frame(timeout=LIVE_HEARTBEAT_SECONDS)
+            await websocket.send_text(frame.text if frame else '{"type":"heartbeat"}')
+    except WebSocketDisconnect:
+        pass
+    finally:
+        broadcaster.unsubscribe(subscriber)
 
 # ==================== PUBLIC STATS ROUTES ====================
 
-@api_router.get("/stats/goals/today", response_model=List[TeamStats])
-async def get_goals_today():
-    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    pipeline = [
-        {"$match": {"timestamp": {"$gte": today_start}}},
-        {"$group": {
-            "_id": "$team_id",
-            "total_goals": {"$sum": "$score"},
-            "total_games": {"$sum": 1}
-        }}
-    ]
-    
-    results = await game_sessions_collection.aggregate(pipeline).to_list(1000)
-    
+def _ranked_team_stats(totals: dict) -> List[TeamStats]:
+    """Team stats from rollup totals, best scoring team first"""
     stats = []
-    for result in results:
-        team = await teams_collection.find_one({"team_id": result['_id']})
-        if team:
-            country = await countries_collection.find_one({"country_id": team['country_id']})
+    for team_id, total in totals.items():
+        team = reference_cache.team(team_id)
+        # Buckets emptied by a retracted session count no games
+        if team and total['games']:
+            country = reference_cache.country(team['country_id'])
             stats.append(TeamStats(
                 team_id=team['team_id'],
                 team_name=team['name'],
                 country_name=country['name'] if country else '',
-                total_goals=result['total_goals'],
-                total_games=result['total_games'],
-                average_score=round(result['total_goals'] / result['total_games'], 2),
-                best_score=0
+                total_goals=total['goals'],
+                total_games=total['games'],
+                average_score=round(total['goals'] / total['games'], 2),
+                best_score=total['max_score']
             ))
     
     stats.sort(key=lambda x: x.total_goals, reverse=True)
     return stats
 
+@api_router.get("/stats/goals/today", response_model=List[TeamStats])
+async def get_goals_today():
+    totals = await rollups.team_totals('day', datetime.utcnow())
+    return _ranked_team_stats(totals)
+
 @api_router.get("/stats/goals/month", response_model=List[TeamStats])
 async def get_goals_month():
-    month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    
-    pipeline = [
-        {"$match": {"timestamp": {"$gte": month_start}}},
-        {"$group": {
-            "_id": "$team_id",
-            "total_goals": {"$sum": "$score"},
-            "total_games": {"$sum": 1},
-            "max_score": {"$max": "$score"}
-        }}
-    ]
-    
-    results = await game_sessions_collection.aggregate(pipeline).to_list(1000)
-    
-    stats = []
-    for result in results:
-        team = await teams_collection.find_one({"team_id": result['_id']})
-        if team:
-            country = await countries_collection.find_one({"country_id": team['country_id']})
-            stats.append(TeamStats(
-                team_id=team['team_id'],
-                team_name=team['name'],
-                country_name=country['name'] if country else '',
-                total_goals=result['total_goals'],
-                total_games=result['total_games'],
-                average_score=round(result['total_goals'] / result['total_games'], 2),
-                best_score=result['max_score']
-            ))
-    
-    stats.sort(key=lambda x: x.total_goals, reverse=True)
-    return stats
+    totals = await rollups.team_totals('month', datetime.utcnow())
+    return _ranked_team_stats(totals)
 
 @api_router.get("/stats/goals/year", response_model=List[TeamStats])
 async def get_goals_year():
     year_start = datetime.utcnow().replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    totals = await rollups.team_totals('month', year_start)
+    return _ranked_team_stats(totals)
+
+# ==================== ADMIN STATS ROUTES ====================
+
+@api_router.get("/stats/teams", response_model=List[TeamStats])
+async def get_team_stats(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    country_id: Optional[str] = None,
+    current_user: dict = Depends(get_admin_user)
+):
+    teams = reference_cache.country_teams(country_id) if country_id else reference_cache.teams()
+    
+    match = {}
+    if start or end:
+        match['timestamp'] = {}
+        if start:
+            match['timestamp']['$gte'] = start
+        if end:
+            match['timestamp']['$lt'] = end
+    if country_id:
+        match['team_id'] = {"$in": [team['team_id'] for team in teams]}
     
     pipeline = [
-        {"$match": {"timestamp": {"$gte": year_start}}},
         {"$group": {
             "_id": "$team_id",
-            "total_goals": {"$sum": "$score"},
+            "total_score": {"$sum": "$score"},
             "total_games": {"$sum": 1},
+            "average_score": {"$avg": "$score"},
             "max_score": {"$max": "$score"}
         }}
     ]
+    if match:
+        pipeline.insert(0, {"$match": match})
     
-    results = await game_sessions_collection.aggregate(pipeline).to_list(1000)
-    
-    stats = []
-    for result in results:
-        team = await teams_collection.find_one({"team_id": result['_id']})
-        if team:
-            country = await countries_collection.find_one({"country_id": team['country_id']})
-            stats.append(TeamStats(
-                team_id=team['team_id'],
-                team_name=team['name'],
-                country_name=country['name'] if country else '',
-                total_goals=result['total_goals'],
-                total_games=result['total_games'],
-                average_score=round(result['total_goals'] / result['total_games'], 2),
-                best_score=result['max_score']
-            ))
-    
-    stats.sort(key=lambda x: x.total_goals, reverse=True)
-    return stats
-
-# ==================== ADMIN STATS ROUTES ====================
-
-@api_router.get("/stats/teams", response_model=List[TeamStats])
-async def get_team_stats(current_user: dict = Depends(get_admin_user)):
-    teams = await teams_collection.find().to_list(1000)
+    results = {
+        result['_id']: result
+        for result in await game_sessions_collection.aggregate(pipeline).to_list(None)
+    }
     
     stats = []
     for team in teams:
-        country = await countries_collection.find_one({"country_id": team['country_id']})
-        sessions = await game_sessions_collection.find({"team_id": team['team_id']}).to_list(10000)
+        country = reference_cache.country(team['country_id'])
+        result = results.get(team['team_id'], {})
         
-        total_games = len(sessions)
-        best_score = max([s['score'] for s in sessions], default=0)
-        average_score = sum([s['score'] for s in sessions]) / total_games if total_games > 0 else 0
+        # Without a date range, report the team's all-time goals counter
+        if start or end:
+            total_goals = result.get('total_score', 0)
+        else:
+            total_goals = leaderboard.goals(team['team_id'])
         
         stats.append(TeamStats(
             team_id=team['team_id'],
             team_name=team['name'],
             country_name=country['name'] if country else '',
-            total_goals=team['goals'],
-            total_games=total_games,
-            average_score=round(average_score, 2),
-            best_score=best_score
+            total_goals=total_goals,
+            total_games=result.get('total_games', 0),
+            average_score=round(result.get('average_score', 0), 2),
+            best_score=result.get('max_score', 0)
         ))
     
     return stats
@@ -520,81 +773,37 @@ async def get_team_stats(current_user: dict = Depends(get_admin_user)):
 @api_router.get("/stats/daily", response_model=List[DailyStats])
 async def get_daily_stats(days: int = 30, current_user: dict = Depends(get_admin_user)):
     start_date = datetime.utcnow() - timedelta(days=days)
-    
-    pipeline = [
-        {"$match": {"timestamp": {"$gte": start_date}}},
-        {"$group": {
-            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
-            "total_goals": {"$sum": "$score"},
-            "total_games": {"$sum": 1},
-            "unique_teams": {"$addToSet": "$team_id"}
-        }},
-        {"$project": {
-            "date": "$_id",
-            "total_goals": 1,
-            "total_games": 1,
-            "unique_teams": {"$size": "$unique_teams"}
-        }},
-        {"$sort": {"date": 1}}
+    periods = await rollups.period_totals('day', start_date)
+    return [
+        DailyStats(date=p.pop('bucket').strftime('%Y-%m-%d'), **p)
+        for p in periods
     ]
-    
-    results = await game_sessions_collection.aggregate(pipeline).to_list(1000)
-    return [DailyStats(**{k: v for k, v in r.items() if k != '_id'}) for r in results]
 
 @api_router.get("/stats/monthly", response_model=List[MonthlyStats])
 async def get_monthly_stats(months: int = 12, current_user: dict = Depends(get_admin_user)):
     start_date = datetime.utcnow() - timedelta(days=months * 30)
-    
-    pipeline = [
-        {"$match": {"timestamp": {"$gte": start_date}}},
-        {"$group": {
-            "_id": {"$dateToString": {"format": "%Y-%m", "date": "$timestamp"}},
-            "total_goals": {"$sum": "$score"},
-            "total_games": {"$sum": 1},
-            "unique_teams": {"$addToSet": "$team_id"}
-        }},
-        {"$project": {
-            "month": "$_id",
-            "total_goals": 1,
-            "total_games": 1,
-            "unique_teams": {"$size": "$unique_teams"}
-        }},
-        {"$sort": {"month": 1}}
+    periods = await rollups.period_totals('month', start_date)
+    return [
+        MonthlyStats(month=p.pop('bucket').strftime('%Y-%m'), **p)
+        for p in periods
     ]
-    
-    results = await game_sessions_collection.aggregate(pipeline).to_list(1000)
-    return [MonthlyStats(**{k: v for k, v in r.items() if k != '_id'}) for r in results]
 
 # ==================== GAME CONFIGURATION ROUTES ====================
 
-# Default configuration values
-DEFAULT_CONFIG = {
-    "config_id": "default",
-    "free_plays": 2,
-    "plays_per_ad": 2,
-    "plays_per_share": 2,
-    "max_ad_views": 5,
-    "max_share_rewards": 3
-}
-
 @api_router.get("/config", response_model=GameConfig)
-async def get_game_config():
-    """Public endpoint to get game configuration"""
-    config = await config_collection.find_one({"config_id": "default"}, {"_id": 0})
-    if not config:
-        # Create default config if it doesn't exist
-        config = {**DEFAULT_CONFIG, "updated_at": datetime.utcnow()}
-        await config_collection.insert_one(config)
-    return GameConfig(**config)
+async def get_game_config(request: Request):
+    """Public endpoint to get game configuration, served from memory"""
+    return await response_cache.respond(
+        request, ('config',), lambda: game_config.config,
+        max_age=REFERENCE_MAX_AGE,
+        stale_while_revalidate=REFERENCE_STALE_WHILE_REVALIDATE
+    )
 
 @api_router.get("/admin/config", response_model=GameConfig)
 async def get_admin_config(current_user: dict = Depends(get_admin_user)):
     """Admin endpoint to get game configuration"""
-    config = await config_collection.find_one({"config_id": "default"}, {"_id": 0})
-    if not config:
-        config = {**DEFAULT_CONFIG, "updated_at": datetime.utcnow()}
-        await config_collection.insert_one(config)
-    return GameConfig(**config)
+    await game_config.load()
+    return game_config.config
 
 @api_router.put("/admin/config", response_model=GameConfig)
 async def update_game_config(
@@ -602,35 +811,29 @@ async def update_game_config(
     current_user: dict = Depends(get_admin_user)
 ):
     """Admin endpoint to update game configuration"""
-    # Get existing config or create default
-    existing = await config_collection.find_one({"config_id": "default"})
-    if not existing:
-        existing = {**DEFAULT_CONFIG}
-    
     # Update only provided fields
     update_data = {k: v for k, v in config_update.dict().items() if v is not None}
-    update_data["updated_at"] = datetime.utcnow()
-    
-    await config_collection.update_one(
-        {"config_id": "default"},
-        {"$set": update_data},
-        upsert=True
-    )
-    
-    # Return updated config
-    config = await config_collection.find_one({"config_id": "default"}, {"_id": 0})
-    return GameConfig(**config)
+    config = await game_config.update(update_data)
+    await invalidation_bus.publish('config')
+    return config
 
 # ==================== ANNOUNCEMENTS ====================
 
 @api_router.get("/announcements", response_model=List[Announcement])
-async def get_announcements():
+async def get_announcements(request: Request):
     """Public endpoint to get active announcements"""
-    announcements = await announcements_collection.find(
-        {"is_active": True}, 
-        {"_id": 0}
-    ).sort("order", 1).to_list(100)
-    return announcements
+    async def build():
+        announcements = await announcements_collection.find(
+            {"is_active": True}, 
+            {"_id": 0}
+        ).sort("order", 1).to_list(100)
+        return trusted_content(Announcement, announcements)
+    
+    return await response_cache.respond(
+        request, ('announcements',), build,
+        max_age=REFERENCE_MAX_AGE,
+        stale_while_revalidate=REFERENCE_STALE_WHILE_REVALIDATE
+    )
 
 @api_router.get("/admin/announcements", response_model=List[Announcement])
 async def get_all_announcements(current_user: dict = Depends(get_admin_user)):
@@ -653,6 +856,8 @@ async def create_announcement(
         "created_at": datetime.utcnow()
     }
     await announcements_collection.insert_one(new_announcement)
+    response_cache.bump('announcements')
+    await invalidation_bus.publish('announcements')
     created = await announcements_collection.find_one(
         {"announcement_id": announcement_id}, {"_id": 0}
     )
@@ -675,6 +880,8 @@ async def update_announcement(
             {"announcement_id": announcement_id},
             {"$set": update_data}
         )
+        response_cache.bump('announcements')
+        await invalidation_bus.publish('announcements')
     
     updated = await announcements_collection.find_one(
         {"announcement_id": announcement_id}, {"_id": 0}
@@ -690,6 +897,8 @@ async def delete_announcement(
     result = await announcements_collection.delete_one({"announcement_id": announcement_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Announcement not found")
+    response_cache.bump('announcements')
+    await invalidation_bus.publish('announcements')
     return {"message": "Announcement deleted successfully"}
 
 # ==================== ROOT & HEALTH CHECK ====================
@@ -705,8 +914,14 @@ async def health_check():
 # Include the router in the main app
 app.include_router(api_router)
 
-# Mount static files for shirt designs under /api/uploads
-app.mount("/api/uploads", StaticFiles(directory=str(ROOT_DIR / 'uploads')), name="uploads")
+# Mount static files for shirt designs under /api/uploads; uploads are
+# content-addressed, so they are served as immutable
+app.mount("/api/uploads", ImmutableStaticFiles(directory=str(ROOT_DIR / 'uploads')), name="uploads")
+
+# Prometheus scrape target; outside /api so it is not routed through the public ingress
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 app.add_middleware(
     CORSMiddleware,
@@ -714,9 +929,55 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(QueryAccountingMiddleware)
+app.add_middleware(UploadSizeLimitMiddleware)
+app.add_middleware(RequestMetricsMiddleware)
+
+async def _reload_teams():
+    """Reload the teams another worker changed and purge the ones it deleted.
+
+    Games this worker accepted or flushed for a deleted team before the
+    reload are dropped from the buffer and from the database.
+    """
+    known = {team['team_id'] for team in reference_cache.teams()}
+    await reference_cache.load()
+    await goal_writer.purge_teams(known - {team['team_id'] for team in reference_cache.teams()})
+
+# Admin writes in other worker processes reload the matching local state
+invalidation_bus.subscribe('countries', reference_cache.load)
+invalidation_bus.subscribe('teams', _reload_teams, leaderboard.load, recent_games.load)
+invalidation_bus.subscribe('config', game_config.load)
+invalidation_bus.subscribe('announcements', lambda: response_cache.bump('announcements'))
+invalidation_bus.subscribe('users', user_cache.clear)
+
+@app.on_event("startup")
+async def startup_background_tasks():
+    await ensure_indexes()
+    goal_writer.start()
+    # Versions first, so changes published while the caches load are not missed
+    await invalidation_bus.load()
+    await reference_cache.load()
+    await game_config.load()
+    await leaderboard.load()
+    leaderboard.start()
+    await recent_games.load()
+    recent_games.start()
+    invalidation_bus.start()
+    broadcaster.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     from database import client
+    await broadcaster.close()
+    await invalidation_bus.close()
+    await recent_games.close()
+    await leaderboard.close()
+    await goal_writer.close()
+    await cancel_release_retries()
+    password_hasher.shutdown()
+    variant_renderer.shutdown()
     client.close()
\ No newline at end of file
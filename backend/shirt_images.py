@@ -0,0 +1,197 @@
+"""Resized and re-encoded variants of stored shirt images.
+
+Every stored shirt gets square thumbnails in `VARIANT_SIZES`, each as WebP
+and PNG, named after the original (`<sha256>.<size>.<ext>`) so they are as
+immutable as the original. Files that gzip (or brotli, when installed)
+shrinks noticeably also get a precompressed `.gz`/`.br` sibling.
+
+Rendering runs in a process pool. Pillow is optional: without it no
+variants are produced and clients keep using the original. Variants for
+shirts uploaded before this existed can be generated with:
+
+    python shirt_images.py backfill
+
+This module must stay importable without the database, since the pool's
+worker processes import it.
+"""
+import asyncio
+import gzip
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - optional dependency
+    Image = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+# Shirts are drawn on a 12x12 grid, so these keep every cell a whole number of pixels
+VARIANT_SIZES = (48, 96, 240)
+SHIRT_IMAGE_WORKERS = int(os.environ.get('SHIRT_IMAGE_WORKERS', '1'))
+# Keep a precompressed sibling only if it is at most this fraction of the original
+PRECOMPRESS_MAX_RATIO = 0.9
+# Images with at most this many colours are treated as pixel art and scaled without smoothing
+PIXEL_ART_MAX_COLORS = 256
+
+logger = logging.getLogger(__name__)
+
+
+def variant_name(original_name: str, size: int, extension: str) -> str:
+    stem = original_name.split('.', 1)[0]
+    return f"{stem}.{size}.{extension}"
+
+
+def render_variants(original_path: str, sizes: Sequence[int] = VARIANT_SIZES) -> List[str]:
+    """Write the variants of one image next to it and return their file names.
+
+    Runs in a worker process. Existing files are left alone, so repeated
+    uploads of the same image cost nothing.
+    """
+    source = Path(original_path)
+    names = []
+    with Image.open(source) as image:
+        image.load()
+        pixel_art = image.getcolors(PIXEL_ART_MAX_COLORS) is not None
+        image = image.convert('RGBA')
+        resample = Image.NEAREST if pixel_art else Image.LANCZOS
+        for size in sizes:
+            scale = size / max(image.size)
+            resized = None
+            for extension, options in (
+                ('webp', {'lossless': True} if pixel_art else {'quality': 85}),
+                ('png', {'optimize': True}),
+            ):
+                target = source.with_name(variant_name(source.name, size, extension))
+                names.append(target.name)
+                if target.exists():
+                    continue
+                if resized is None:
+                    resized = image.resize(
+                        (max(1, round(image.width * scale)), max(1, round(image.height * scale))), resample
+                    )
+                _atomic_write(target, lambda f: resized.save(f, format=extension.upper(), **options))
+    for name in [source.name] + names:
+        precompress(source.with_name(name))
+    return names
+
+
+def is_readable_image(path: Path) -> bool:
+    """Whether Pillow can decode the whole image; always True without Pillow."""
+    if Image is None:
+        return True
+    try:
+        with Image.open(path) as image:
+            image.load()
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        return False
+    return True
+
+
+def precompress(path: Path):
+    """Write `.gz` (and `.br`) siblings of `path` when they are worth serving."""
+    data = path.read_bytes()
+    encoders = [('gz', lambda raw: gzip.compress(raw, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        encoders.append(('br', lambda raw: brotli.compress(raw, quality=11)))
+    for suffix, encode in encoders:
+        target = path.with_name(f"{path.name}.{suffix}")
+        if target.exists():
+            continue
+        compressed = encode(data)
+        if len(compressed) <= len(data) * PRECOMPRESS_MAX_RATIO:
+            _atomic_write(target, lambda f: f.write(compressed))
+
+
+def _atomic_write(target: Path, write):
+    temp = target.with_name(f".{target.name}.tmp")
+    try:
+        with temp.open('wb') as f:
+            write(f)
+        os.replace(temp, target)
+    finally:
+        temp.unlink(missing_ok=True)
+
+
+class VariantRenderer:
+    """Process pool that renders shirt variants off the event loop."""
+
+    def __init__(self, workers: int = SHIRT_IMAGE_WORKERS):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def available(self) -> bool:
+        return Image is not None
+
+    async def render(self, original_path: Path, url_prefix: str) -> Optional[Dict[str, str]]:
+        """URLs of the variants keyed by `<size>.<ext>`, or None without Pillow or on failure."""
+        if not self.available:
+            return None
+        if self._executor is None:
+            # Spawned rather than forked: the server process runs Motor's threads
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        loop = asyncio.get_running_loop()
+        try:
+            names = await loop.run_in_executor(self._executor, render_variants, str(original_path))
+        except Exception:
+            logger.exception("Rendering variants of %s failed", original_path.name)
+            return None
+        return {name.split('.', 1)[1]: url_prefix + name for name in names}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+variant_renderer = VariantRenderer()
+
+
+async def backfill() -> int:
+    """Render variants for every team shirt that has none yet."""
+    from database import teams_collection
+    from shirt_storage import SHIRT_URL_PREFIX, shirt_path
+
+    updated = 0
+    cursor = teams_collection.find(
+        {"shirt_design_url": {"$ne": None}, "shirt_variants": None},
+        {"_id": 0, "team_id": 1, "shirt_design_url": 1}
+    )
+    async for team in cursor:
+        path = shirt_path(team['shirt_design_url'])
+        if path is None or not path.exists():
+            continue
+        variants = await variant_renderer.render(path, SHIRT_URL_PREFIX)
+        if variants:
+            await teams_collection.update_one({"team_id": team['team_id']}, {"$set": {"shirt_variants": variants}})
+            updated += 1
+    return updated
+
+
+async def main(command: str):
+    if command != 'backfill':
+        print(f"Unknown command: {command} (expected 'backfill')")
+        return 2
+    if not variant_renderer.available:
+        print("Pillow is not installed, no variants can be rendered")
+        return 1
+    try:
+        updated = await backfill()
+    finally:
+        variant_renderer.shutdown()
+    print(f"✅ Rendered shirt variants for {updated} teams")
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else 'backfill')))
@@ -0,0 +1,235 @@
+"""Content-addressed storage for team shirt images.
+
+Files are named by the SHA-256 of their bytes, so identical uploads share
+one file, and the extension comes from the image's magic bytes rather than
+the client's filename. A file is deleted, along with its variants and
+precompressed copies (`<sha256>.*`), once no team references it and it
+is past the grace period; releases inside it are retried when it ends.
+Leftovers (legacy names, interrupted uploads, retries lost to a restart)
+can be swept with:
+
+    python shirt_storage.py gc
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from database import teams_collection
+from shirt_images import is_readable_image
+
+ROOT_DIR = Path(__file__).parent
+UPLOAD_DIR = ROOT_DIR / 'uploads' / 'shirts'
+UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+SHIRT_URL_PREFIX = '/api/uploads/shirts/'
+
+SHIRT_MAX_BYTES = int(os.environ.get('SHIRT_MAX_BYTES', str(2 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Files younger than this are never collected, so an upload that is about to
+# reference a deduplicated file cannot lose it to a concurrent cleanup
+SHIRT_GC_GRACE_SECONDS = int(os.environ.get('SHIRT_GC_GRACE_SECONDS', '300'))
+# Room for the multipart boundaries and part headers around the image
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+TEMP_PREFIX = '.upload-'
+
+# (extension, signature test) for the image formats accepted as shirts
+IMAGE_SIGNATURES = (
+    ('png', lambda head: head.startswith(b'\x89PNG\r\n\x1a\n')),
+    ('jpg', lambda head: head.startswith(b'\xff\xd8\xff')),
+    ('gif', lambda head: head[:6] in (b'GIF87a', b'GIF89a')),
+    ('webp', lambda head: head[:4] == b'RIFF' and head[8:12] == b'WEBP'),
+)
+
+logger = logging.getLogger(__name__)
+
+# Pending delayed releases, by shirt URL
+_release_retries: Dict[str, asyncio.Task] = {}
+
+
+def sniff_extension(head: bytes) -> Optional[str]:
+    for extension, matches in IMAGE_SIGNATURES:
+        if matches(head):
+            return extension
+    return None
+
+
+def shirt_path(url: Optional[str]) -> Optional[Path]:
+    """Local file behind a shirt URL, or None if the URL is not one of ours."""
+    if not url or not url.startswith(SHIRT_URL_PREFIX):
+        return None
+    name = Path(url[len(SHIRT_URL_PREFIX):]).name
+    return UPLOAD_DIR / name if name else None
+
+
+async def store_shirt(file: UploadFile) -> str:
+    """Copy an uploaded image into storage and return its URL.
+
+    Reads and writes in chunks off the event loop, rejects files over
+    `SHIRT_MAX_BYTES` (413) and anything that is not a PNG, JPEG, GIF or
+    WebP image Pillow can decode (415).
+    """
+    temp_path = UPLOAD_DIR / f"{TEMP_PREFIX}{uuid.uuid4().hex}"
+    digest = hashlib.sha256()
+    size = 0
+    extension = None
+    try:
+        with temp_path.open('wb') as buffer:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if extension is None:
+                    extension = sniff_extension(chunk)
+                    if extension is None:
+                        raise HTTPException(status_code=415, detail="File must be a PNG, JPEG, GIF or WebP image")
+                size += len(chunk)
+                if size > SHIRT_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail=_too_large_detail())
+                digest.update(chunk)
+                await run_in_threadpool(buffer.write, chunk)
+        if extension is None:
+            raise HTTPException(status_code=400, detail="File is empty")
+        if not await run_in_threadpool(is_readable_image, temp_path):
+            raise HTTPException(status_code=415, detail="File is not a readable PNG, JPEG, GIF or WebP image")
+
+        filename = f"{digest.hexdigest()}.{extension}"
+        target = UPLOAD_DIR / filename
+        if target.exists():
+            # Same image already stored; refresh it so cleanup leaves it alone
+            os.utime(target)
+        else:
+            os.replace(temp_path, target)
+        return SHIRT_URL_PREFIX + filename
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+
+def file_stem(name: str) -> str:
+    """Name shared by an original and all files derived from it."""
+    return name.split('.', 1)[0]
+
+
+async def release_shirt(url: Optional[str]):
+    """Delete a shirt and its derived files once no team references it any more."""
+    path = shirt_path(url)
+    if path is None or not path.exists():
+        return
+    if await teams_collection.count_documents({"shirt_design_url": url}, limit=1):
+        return
+    age = time.time() - path.stat().st_mtime
+    if age < SHIRT_GC_GRACE_SECONDS:
+        _retry_release(url, SHIRT_GC_GRACE_SECONDS - age)
+        return
+    for derived in UPLOAD_DIR.glob(f"{file_stem(path.name)}.*"):
+        derived.unlink(missing_ok=True)
+    logger.info("Removed unreferenced shirt %s", path.name)
+
+
+def _retry_release(url: str, delay: float):
+    if url not in _release_retries:
+        _release_retries[url] = asyncio.create_task(_release_later(url, delay))
+
+
+async def _release_later(url: str, delay: float):
+    await asyncio.sleep(delay)
+    del _release_retries[url]
+    try:
+        await release_shirt(url)
+    except Exception:
+        logger.exception("Releasing shirt %s failed", url)
+
+
+async def cancel_release_retries():
+    """Drop the pending delayed releases; `python shirt_storage.py gc` catches them later."""
+    tasks = list(_release_retries.values())
+    _release_retries.clear()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def collect_garbage() -> int:
+    """Delete every stored file no team references, past the grace period."""
+    referenced = {
+        file_stem(path.name)
+        for path in map(shirt_path, await teams_collection.distinct("shirt_design_url"))
+        if path is not None
+    }
+    cutoff = time.time() - SHIRT_GC_GRACE_SECONDS
+    removed = 0
+    for path in UPLOAD_DIR.iterdir():
+        if path.name.startswith('.') and not path.name.startswith(TEMP_PREFIX):
+            continue
+        if path.is_file() and file_stem(path.name) not in referenced and path.stat().st_mtime < cutoff:
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
+def _too_large_detail() -> str:
+    return f"Shirt image must be at most {SHIRT_MAX_BYTES // 1024} KB"
+
+
+class UploadSizeLimitMiddleware:
+    """Rejects oversized shirt uploads before their body is read into memory.
+
+    A declared Content-Length over the limit gets a 413 straight away;
+    otherwise the body is counted as it streams in and the request fails
+    with 413 as soon as it crosses the limit.
+    """
+
+    def __init__(self, app, path_pattern: str = r'^/api/admin/teams/[^/]+/shirt$',
+                 max_bytes: int = SHIRT_MAX_BYTES + MULTIPART_OVERHEAD_BYTES):
+        self.app = app
+        self.path_pattern = re.compile(path_pattern)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.path_pattern.match(scope['path']):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope['headers'])
+        content_length = headers.get(b'content-length')
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = JSONResponse({"detail": _too_large_detail()}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_limited():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail=_too_large_detail())
+            return message
+
+        await self.app(scope, receive_limited, send)
+
+
+async def main(command: str):
+    if command != 'gc':
+        print(f"Unknown command: {command} (expected 'gc')")
+        return 2
+    removed = await collect_garbage()
+    print(f"✅ Removed {removed} unreferenced shirt files")
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else 'gc')))
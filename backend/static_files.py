@@ -0,0 +1,53 @@
+import mimetypes
+import re
+from pathlib import Path
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from compression import negotiate
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Served in order of preference when the client accepts them and a sibling exists
+PRECOMPRESSED_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+CONTENT_HASH_NAME = re.compile(r'^[0-9a-f]{64}\.')
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """StaticFiles for directories whose files never change once written.
+
+    Every response may be cached forever. Content-hash file names double as
+    strong ETags, and a precompressed `.br`/`.gz` sibling is sent instead of
+    the file itself when the client accepts that encoding.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        path = Path(full_path)
+        media_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+
+        siblings = {
+            candidate: path.with_name(path.name + suffix) for candidate, suffix in PRECOMPRESSED_ENCODINGS
+        }
+        encoding = negotiate(
+            request_headers.get('accept-encoding'),
+            [candidate for candidate, sibling in siblings.items() if sibling.is_file()]
+        )
+        if encoding is not None:
+            path = siblings[encoding]
+            stat_result = path.stat()
+
+        response = FileResponse(path, status_code=status_code, stat_result=stat_result, media_type=media_type)
+        if CONTENT_HASH_NAME.match(Path(full_path).name):
+            tag = Path(full_path).name if encoding is None else f"{Path(full_path).name}+{encoding}"
+            response.headers['etag'] = f'"{tag}"'
+        response.headers['cache-control'] = IMMUTABLE_CACHE_CONTROL
+        response.headers['vary'] = 'Accept-Encoding'
+        if encoding is not None:
+            response.headers['content-encoding'] = encoding
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,306 @@
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError
+
+import goal_counters
+import metrics
+import rollups
+from periodic import PeriodicTask
+from database import (
+    DUPLICATE_KEY_ERROR, GOALS_STORAGE_MODE, config_collection, game_sessions_collection, goals_collection, teams_collection, stats_rollups_collection,
+    team_goal_shards_collection, write_dead_letters_collection
+)
+
+WRITE_BEHIND_WINDOW_MS = int(os.environ.get('WRITE_BEHIND_WINDOW_MS', '200'))
+WRITE_BEHIND_BATCH_SIZE = int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', '500'))
+# Sessions the buffer holds before new games are turned away, e.g. while
+# MongoDB is unreachable and nothing drains
+WRITE_BEHIND_MAX_PENDING = int(os.environ.get('WRITE_BEHIND_MAX_PENDING', '50000'))
+# How often a running writer records that it is alive, so maintenance jobs
+# such as the rollup backfill can tell whether any server is still writing
+WRITER_HEARTBEAT_SECONDS = 10
+HEARTBEAT_DOCUMENT_ID = 'write_behind_heartbeat'
+
+pending_sessions = metrics.gauge('write_behind_pending_sessions', 'Game sessions buffered and not yet written')
+requeued_items = metrics.counter(
+    'write_behind_requeued_total', 'Buffered writes put back for the next flush after a retryable failure', ['stage']
+)
+dead_letters = metrics.counter(
+    'write_behind_dead_letters_total', 'Buffered writes MongoDB rejected, moved to write_dead_letters',
+    ['collection']
+)
+rejected_sessions = metrics.counter(
+    'write_behind_rejected_sessions_total', 'Game sessions turned away because the buffer was full'
+)
+
+logger = logging.getLogger(__name__)
+
+
+class GoalWriteBehind:
+    """Buffers game session writes and flushes them in batches.
+
+    Sessions and goal records (only passed in 'dual' goals storage mode) are
+    written with one insert_many per collection, while the per-team goal
+    increments and the stats rollup deltas are coalesced into one bulk_write
+    each, either every `window_ms` or as soon as `batch_size` sessions are
+    pending. Increments of teams with sharded goal counters go to a random
+    shard document instead of the team.
+
+    A stage that fails as a whole (e.g. a lost connection) is re-queued for
+    the next flush. Single documents or updates MongoDB rejects are moved to
+    `write_dead_letters` instead, so they cannot block everything queued
+    behind them. A session another worker already wrote (a replayed game
+    both re-recorded) is dropped together with its goals and rollup deltas.
+    Callers check `has_room` before adding sessions.
+    """
+
+    def __init__(self, window_ms: int = WRITE_BEHIND_WINDOW_MS, batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+                 max_pending: int = WRITE_BEHIND_MAX_PENDING):
+        self.window = window_ms / 1000
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._sessions = []
+        self._goals = []
+        self._team_incs = defaultdict(int)
+        self._rollups = {}
+        self._last_heartbeat = None
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._flusher = PeriodicTask(
+            self.flush, self.window, logger, "Write-behind flush failed, batch re-queued", wakeup=self._wakeup
+        )
+
+    @property
+    def flush_lock(self) -> asyncio.Lock:
+        """Held while a batch is being written; hold it to see a stable DB + buffer view."""
+        return self._flush_lock
+
+    def has_room(self, count: int = 1) -> bool:
+        """Whether `count` more sessions may be added; counts the rejection if not."""
+        if len(self._sessions) + count <= self.max_pending:
+            return True
+        rejected_sessions.inc(count)
+        return False
+
+    def add_session(self, session: dict, goal: Optional[dict] = None):
+        self._sessions.append(session)
+        pending_sessions.set(len(self._sessions))
+        if goal:
+            self._goals.append(goal)
+        if session['score']:
+            self._team_incs[session['team_id']] += session['score']
+        rollups.accumulate(self._rollups, session['team_id'], session['timestamp'], session['score'])
+        if len(self._sessions) >= self.batch_size:
+            self._wakeup.set()
+
+    def pending_sessions(self) -> List[dict]:
+        """Sessions added but not yet written to `game_sessions`, oldest first."""
+        return list(self._sessions)
+
+    def is_pending(self, session_id: str) -> bool:
+        return any(session['session_id'] == session_id for session in self._sessions)
+
+    def pending_goals(self, team_id: str) -> int:
+        """Goals buffered for a team that are not yet reflected in `teams.goals`."""
+        return self._team_incs.get(team_id, 0)
+
+    def discard_team(self, team_id: str):
+        """Drop everything buffered for a team that is being deleted."""
+        self._sessions = [s for s in self._sessions if s['team_id'] != team_id]
+        self._goals = [g for g in self._goals if g['team_id'] != team_id]
+        self._team_incs.pop(team_id, None)
+        self._rollups = {key: delta for key, delta in self._rollups.items() if key[2] != team_id}
+        pending_sessions.set(len(self._sessions))
+
+    async def purge_teams(self, team_ids: Iterable[str]):
+        """Drop everything buffered or already written for deleted teams.
+
+        Holding the flush lock keeps a batch in flight from upserting shard
+        or rollup documents after they are gone. Every worker purges again
+        once it notices the deletion, which also sweeps up the games it
+        flushed for the team in the meantime.
+        """
+        team_ids = list(team_ids)
+        if not team_ids:
+            return
+        async with self._flush_lock:
+            for team_id in team_ids:
+                self.discard_team(team_id)
+            written = {'team_id': {'$in': team_ids}}
+            if GOALS_STORAGE_MODE == 'dual':
+                await goals_collection.delete_many(written)
+            await game_sessions_collection.delete_many(written)
+            await stats_rollups_collection.delete_many(written)
+            await team_goal_shards_collection.delete_many(written)
+
+    def start(self):
+        self._flusher.start()
+
+    async def close(self):
+        """Stop the background flusher and drain whatever is still buffered."""
+        await self._flusher.close()
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Final write-behind flush failed")
+            await self._dead_letter_pending()
+
+    async def flush(self):
+        async with self._flush_lock:
+            await self._heartbeat()
+            sessions, self._sessions = self._sessions, []
+            goals, self._goals = self._goals, []
+            team_incs, self._team_incs = self._team_incs, defaultdict(int)
+            pending_rollups, self._rollups = self._rollups, {}
+
+            try:
+                # Inserted documents keep the _id assigned by insert_many, so a
+                # re-queued batch only reports duplicates for what already landed.
+                duplicates = await self._insert_many(game_sessions_collection, sessions)
+                sessions = []
+                if duplicates:
+                    goals = await self._drop_written_elsewhere(duplicates, goals, team_incs, pending_rollups)
+                failed = await self._bulk_write(
+                    stats_rollups_collection,
+                    dict(zip(pending_rollups, rollups.rollup_ops(pending_rollups))),
+                    lambda key: {
+                        'granularity': key[0], 'bucket': key[1], 'team_id': key[2], **pending_rollups[key]
+                    }
+                )
+                pending_rollups = {key: pending_rollups[key] for key in failed}
+                await self._insert_many(goals_collection, goals)
+                goals = []
+                team_ops, shard_ops = goal_counters.increment_ops(team_incs)
+
+                def increment(team_id):
+                    return {'team_id': team_id, 'goals': team_incs[team_id]}
+                failed = await self._bulk_write(teams_collection, team_ops, increment)
+                failed += await self._bulk_write(team_goal_shards_collection, shard_ops, increment)
+                team_incs = {team_id: team_incs[team_id] for team_id in failed}
+            finally:
+                self._requeue(sessions, goals, team_incs, pending_rollups)
+
+    async def _heartbeat(self):
+        if self._last_heartbeat is not None and time.monotonic() - self._last_heartbeat < WRITER_HEARTBEAT_SECONDS:
+            return
+        await config_collection.update_one(
+            {'config_id': HEARTBEAT_DOCUMENT_ID}, {'$max': {'heartbeat_at': datetime.utcnow()}}, upsert=True
+        )
+        self._last_heartbeat = time.monotonic()
+
+    async def _insert_many(self, collection, documents: list) -> list:
+        """Insert documents, dead-letter the rejected ones and return the duplicates."""
+        if not documents:
+            return []
+        try:
+            await collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            await self._dead_letter(collection.name, [
+                (documents[err['index']], err) for err in errors if err['code'] != DUPLICATE_KEY_ERROR
+            ])
+            return [documents[err['index']] for err in errors if err['code'] == DUPLICATE_KEY_ERROR]
+        return []
+
+    async def _drop_written_elsewhere(self, duplicates: list, goals: list, team_incs: dict,
+                                      pending_rollups: dict) -> list:
+        """Retract the duplicate sessions that are not ours; returns the goals left to write.
+
+        A duplicate whose _id is stored is one of ours from an earlier,
+        partly failed attempt. Any other hit the session_id index: the same
+        game was already written by another worker.
+        """
+        landed = {
+            document['_id'] async for document in game_sessions_collection.find(
+                {'_id': {'$in': [session['_id'] for session in duplicates]}}, {'_id': 1}
+            )
+        }
+        elsewhere = [session for session in duplicates if session['_id'] not in landed]
+        for session in elsewhere:
+            if session['score']:
+                team_incs[session['team_id']] -= session['score']
+            rollups.retract(pending_rollups, session['team_id'], session['timestamp'], session['score'])
+        if elsewhere:
+            logger.info("Dropped %d sessions already written by another worker", len(elsewhere))
+        dropped = {session['session_id'] for session in elsewhere}
+        return [goal for goal in goals if goal['goal_id'] not in dropped]
+
+    async def _bulk_write(self, collection, ops: dict, payload: Callable[[object], dict]) -> list:
+        """Run keyed update ops as one bulk_write and return the keys worth retrying.
+
+        Upserts racing on a unique index are retried; any other rejected
+        update is dead-lettered with `payload(key)`.
+        """
+        if not ops:
+            return []
+        keys = list(ops)
+        try:
+            await collection.bulk_write(list(ops.values()), ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            await self._dead_letter(collection.name, [
+                (payload(keys[err['index']]), err) for err in errors if err['code'] != DUPLICATE_KEY_ERROR
+            ])
+            return [keys[err['index']] for err in errors if err['code'] == DUPLICATE_KEY_ERROR]
+        return []
+
+    async def _dead_letter(self, collection_name: str, rejected: List[Tuple[dict, dict]]):
+        if not rejected:
+            return
+        dead_letters.inc(len(rejected), collection=collection_name)
+        logger.error("Dead-lettered %d writes to %s: %s",
+                     len(rejected), collection_name, rejected[0][1].get('errmsg'))
+        now = datetime.utcnow()
+        try:
+            await write_dead_letters_collection.insert_many([
+                {'collection': collection_name, 'document': document, 'code': err.get('code'),
+                 'error': err.get('errmsg'), 'failed_at': now}
+                for document, err in rejected
+            ], ordered=False)
+        except Exception:
+            # Keep going; the log line is the last record of them
+            logger.exception("Could not store dead letters for %s: %r", collection_name, rejected)
+
+    async def _dead_letter_pending(self):
+        """Move whatever is still buffered to `write_dead_letters`, e.g. at shutdown."""
+        unflushed = {'errmsg': 'Not flushed before shutdown'}
+        await self._dead_letter(game_sessions_collection.name, [(session, unflushed) for session in self._sessions])
+        await self._dead_letter(goals_collection.name, [(goal, unflushed) for goal in self._goals])
+        await self._dead_letter(teams_collection.name, [
+            ({'team_id': team_id, 'goals': goals_delta}, unflushed) for team_id, goals_delta in self._team_incs.items()
+        ])
+        await self._dead_letter(stats_rollups_collection.name, [
+            ({'granularity': key[0], 'bucket': key[1], 'team_id': key[2], **delta}, unflushed)
+            for key, delta in self._rollups.items()
+        ])
+        self._sessions, self._goals, self._team_incs, self._rollups = [], [], defaultdict(int), {}
+        pending_sessions.set(0)
+
+    def _requeue(self, sessions: list, goals: list, team_incs: dict, pending_rollups: dict):
+        for stage, items in (('sessions', sessions), ('goals', goals), ('team_goals', team_incs),
+                             ('rollups', pending_rollups)):
+            if items:
+                requeued_items.inc(len(items), stage=stage)
+        if sessions:
+            self._sessions[:0] = sessions
+        if goals:
+            self._goals[:0] = goals
+        for team_id, goals_delta in team_incs.items():
+            self._team_incs[team_id] += goals_delta
+        rollups.merge(self._rollups, pending_rollups)
+        pending_sessions.set(len(self._sessions))
+
+
+async def writer_seen_since(since: datetime) -> bool:
+    """Whether any server's writer has flushed since `since`."""
+    document = await config_collection.find_one({'config_id': HEARTBEAT_DOCUMENT_ID}, {'_id': 0})
+    return document is not None and document['heartbeat_at'] >= since
+
+
+goal_writer = GoalWriteBehind()
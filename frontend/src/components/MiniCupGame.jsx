@@ -28,6 +28,15 @@ const DESTINATION_POSITIONS = {
   [DESTINATIONS.BOTTOM_RIGHT]: { ball: { x: 75, y: 75 }, keeper: { x: 80, y: 70 } },
 };
 
+// Waits between attempts to submit a finished game
+const SUBMIT_RETRY_DELAYS_MS = [1000, 3000, 10000];
+
+// crypto.randomUUID needs a secure context; plain http falls back to random digits
+const newIdempotencyKey = () => (
+  window.crypto?.randomUUID?.() ||
+  `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}${Math.random().toString(36).slice(2)}`
+);
+
 const MiniCupGame = ({ selectedTeam, onBack, onGoHome }) => {
   const [score, setScore] = useState(0);
   const [gameOver, setGameOver] = useState(false);
@@ -141,15 +150,26 @@ const MiniCupGame = ({ selectedTeam, onBack, onGoHome }) => {
       if (isSaved) {
         setShowResult('saved');
         
-        // Post game session to API
+        // Post game session to API. The key makes retries safe: the server
+        // counts the game once however many attempts reach it
         const postGameSession = async () => {
-          try {
-            await axios.post(`${API}/game/session`, {
-              team_id: selectedTeam.team_id,
-              score: score
-            });
-          } catch (error) {
-            console.error('Error posting game session:', error);
+          const game = {
+            team_id: selectedTeam.team_id,
+            score: score,
+            idempotency_key: newIdempotencyKey()
+          };
+          for (let attempt = 0; ; attempt++) {
+            try {
+              await axios.post(`${API}/game/session`, game);
+              return;
+            } catch (error) {
+              const retryable = !error.response || error.response.status >= 500;
+              if (!retryable || attempt >= SUBMIT_RETRY_DELAYS_MS.length) {
+                console.error('Error posting game session:', error);
+                return;
+              }
+              await new Promise(resolve => setTimeout(resolve, SUBMIT_RETRY_DELAYS_MS[attempt]));
+            }
           }
         };
         postGameSession();
@@ -7,6 +7,7 @@ import { Dialog, DialogContent, DialogHeader, DialogTitle } from '../ui/dialog';
 import { Plus, Edit, Trash2 } from 'lucide-react';
 import axios from 'axios';
 import { useAuth } from '../../contexts/AuthContext';
+import { fetchAllPages } from '../../lib/adminApi';
 import { useToast } from '../../hooks/use-toast';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
@@ -32,10 +33,10 @@ const CountriesManager = () => {
 
   const fetchCountries = async () => {
     try {
-      const response = await axios.get(`${API}/admin/countries`, {
+      const countriesList = await fetchAllPages(`${API}/admin/countries`, {
         headers: getAuthHeaders(),
       });
-      setCountries(response.data);
+      setCountries(countriesList);
     } catch (error) {
       toast({
         title: 'Error',
@@ -24,23 +24,19 @@ const Dashboard = () => {
 
   const fetchDashboardData = async () => {
     try {
-      const [countriesRes, teamsRes, usersRes, leaderboardRes] = await Promise.all([
-        axios.get(`${API}/admin/countries`, { headers: getAuthHeaders() }),
-        axios.get(`${API}/admin/teams`, { headers: getAuthHeaders() }),
-        axios.get(`${API}/admin/users`, { headers: getAuthHeaders() }),
-        axios.get(`${API}/leaderboard`),
+      const [summaryRes, leaderboardRes] = await Promise.all([
+        axios.get(`${API}/admin/summary`, { headers: getAuthHeaders() }),
+        axios.get(`${API}/leaderboard`, { params: { limit: 5 } }),
       ]);
 
-      const totalGoals = teamsRes.data.reduce((sum, team) => sum + team.goals, 0);
-
       setStats({
-        totalCountries: countriesRes.data.length,
-        totalTeams: teamsRes.data.length,
-        totalGoals,
-        totalUsers: usersRes.data.length,
+        totalCountries: summaryRes.data.total_countries,
+        totalTeams: summaryRes.data.total_teams,
+        totalGoals: summaryRes.data.total_goals,
+        totalUsers: summaryRes.data.total_users,
       });
 
-      setTopTeams(leaderboardRes.data.slice(0, 5));
+      setTopTeams(leaderboardRes.data);
     } catch (error) {
       console.error('Error fetching dashboard data:', error);
     } finally {
@@ -8,6 +8,7 @@ import { Tabs, TabsContent, TabsList, TabsTrigger } from '../ui/tabs';
 import { Plus, Edit, Trash2, Shirt } from 'lucide-react';
 import axios from 'axios';
 import { useAuth } from '../../contexts/AuthContext';
+import { fetchAllPages } from '../../lib/adminApi';
 import { useToast } from '../../hooks/use-toast';
 import ShirtBuilder from './ShirtBuilder';
 
@@ -38,12 +39,12 @@ const TeamsManager = () => {
 
   const fetchData = async () => {
     try {
-      const [teamsRes, countriesRes] = await Promise.all([
-        axios.get(`${API}/admin/teams`, { headers: getAuthHeaders() }),
-        axios.get(`${API}/admin/countries`, { headers: getAuthHeaders() }),
+      const [teamsList, countriesList] = await Promise.all([
+        fetchAllPages(`${API}/admin/teams`, { headers: getAuthHeaders() }),
+        fetchAllPages(`${API}/admin/countries`, { headers: getAuthHeaders() }),
       ]);
-      setTeams(teamsRes.data);
-      setCountries(countriesRes.data);
+      setTeams(teamsList);
+      setCountries(countriesList);
     } catch (error) {
       toast({
         title: 'Error',
@@ -265,7 +266,10 @@ const TeamsManager = () => {
             {team.shirt_design_url && (
               <div className="mb-3">
                 <img
-                  src={`${BACKEND_URL}${team.shirt_design_url}`}
+                  src={`${BACKEND_URL}${team.shirt_variants?.['96.webp'] || team.shirt_design_url}`}
+                  srcSet={team.shirt_variants
+                    ? `${BACKEND_URL}${team.shirt_variants['96.webp']} 1x, ${BACKEND_URL}${team.shirt_variants['240.webp']} 2x`
+                    : undefined}
                   alt="Shirt design"
                   className="w-24 h-24 object-contain border-2 border-gray-200 rounded bg-gray-50"
                   onError={(e) => {
@@ -7,6 +7,7 @@ import { Dialog, DialogContent, DialogHeader, DialogTitle } from '../ui/dialog';
 import { Plus, Edit, Trash2, Shield, User } from 'lucide-react';
 import axios from 'axios';
 import { useAuth } from '../../contexts/AuthContext';
+import { fetchAllPages } from '../../lib/adminApi';
 import { useToast } from '../../hooks/use-toast';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
@@ -45,14 +46,14 @@ const UsersManager = () => {
 
   const fetchData = async () => {
     try {
-      const [usersRes, countriesRes, teamsRes] = await Promise.all([
-        axios.get(`${API}/admin/users`, { headers: getAuthHeaders() }),
-        axios.get(`${API}/admin/countries`, { headers: getAuthHeaders() }),
-        axios.get(`${API}/admin/teams`, { headers: getAuthHeaders() }),
+      const [usersList, countriesList, teamsList] = await Promise.all([
+        fetchAllPages(`${API}/admin/users`, { headers: getAuthHeaders() }),
+        fetchAllPages(`${API}/admin/countries`, { headers: getAuthHeaders() }),
+        fetchAllPages(`${API}/admin/teams`, { headers: getAuthHeaders() }),
       ]);
-      setUsers(usersRes.data);
-      setCountries(countriesRes.data);
-      setAllTeams(teamsRes.data);
+      setUsers(usersList);
+      setCountries(countriesList);
+      setAllTeams(teamsList);
     } catch (error) {
       toast({
         title: 'Error',
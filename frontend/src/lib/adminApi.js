@@ -0,0 +1,14 @@
+import axios from 'axios';
+
+// Admin listings are keyset-paginated: every page but the last names the
+// next one in the X-Next-Cursor header, to be passed back as `after`.
+export async function fetchAllPages(url, config = {}) {
+  const items = [];
+  let after;
+  do {
+    const response = await axios.get(url, { ...config, params: { ...config.params, after } });
+    items.push(...response.data);
+    after = response.headers['x-next-cursor'];
+  } while (after);
+  return items;
+}
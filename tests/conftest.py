@@ -0,0 +1,27 @@
+"""Shared setup: the backend runs against the in-memory MongoDB stand-in.
+
+Async tests use the anyio pytest plugin (`pytestmark = pytest.mark.anyio`).
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+os.environ['MONGO_URL'] = 'mongomock://'
+os.environ.setdefault('DB_NAME', 'mini_cup_test')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+import database  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+@pytest.fixture(autouse=True)
+async def empty_database(anyio_backend):
+    for name in await database.db.list_collection_names():
+        await database.db[name].delete_many({})
+    yield
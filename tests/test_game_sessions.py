@@ -0,0 +1,60 @@
+from datetime import datetime
+
+import httpx
+import pytest
+
+from database import game_sessions_collection, teams_collection
+from indexes import ensure_indexes
+from reference_cache import reference_cache
+from write_behind import goal_writer
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def client():
+    import server
+
+    await ensure_indexes()
+    await teams_collection.insert_one({'team_id': 'arg1', 'name': 'Gallinas', 'country_id': 'argentina',
+                                       'color': '#ffffff', 'goals': 10, 'created_at': datetime.utcnow()})
+    await reference_cache.load()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url='http://test') as client:
+        yield client
+    await goal_writer.flush()
+
+
+async def test_batch_reports_the_outcome_of_every_game(client):
+    response = await client.post('/api/game/sessions/batch', json=[
+        {'team_id': 'arg1', 'score': 2, 'idempotency_key': 'batch-key-0001'},
+        {'team_id': 'missing', 'score': 4},
+        {'team_id': 'arg1', 'score': 2, 'idempotency_key': 'batch-key-0001'},
+        {'team_id': 'arg1', 'score': 5, 'idempotency_key': 'batch-key-0001'},
+        {'team_id': 'arg1', 'score': 1},
+    ])
+
+    body = response.json()
+    assert response.status_code == 200
+    assert [(item['index'], item['status'], item['error']) for item in body['results']] == [
+        (0, 'created', None),
+        (1, 'rejected', 'Team not found'),
+        (2, 'duplicate', None),
+        (3, 'rejected', 'Idempotency key was already used for a different game'),
+        (4, 'created', None),
+    ]
+    assert (body['created'], body['duplicates'], body['rejected']) == (2, 1, 2)
+    assert body['results'][2]['session'] == body['results'][0]['session']
+    # The batch is flushed before answering
+    assert await game_sessions_collection.count_documents({}) == 2
+    assert (await teams_collection.find_one({'team_id': 'arg1'}))['goals'] == 13
+
+
+async def test_batch_over_the_size_limit_is_refused_whole(client, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, 'MAX_BATCH_SESSIONS', 2)
+
+    response = await client.post('/api/game/sessions/batch', json=[{'team_id': 'arg1', 'score': 1}] * 3)
+
+    assert response.status_code == 400
+    assert await game_sessions_collection.count_documents({}) == 0
@@ -0,0 +1,46 @@
+import pytest
+
+import goal_counters
+from database import team_goal_shards_collection, teams_collection
+from leaderboard import Leaderboard
+from reference_cache import ReferenceCache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def teams(monkeypatch):
+    cache = ReferenceCache()
+    for team in [{'team_id': 'arg1', 'country_id': 'argentina', 'goal_shards': 4},
+                 {'team_id': 'esp1', 'country_id': 'spain'}]:
+        cache.set_team(team)
+    monkeypatch.setattr(goal_counters, 'reference_cache', cache)
+    await teams_collection.insert_many([
+        {'team_id': 'arg1', 'name': 'Gallinas', 'country_id': 'argentina', 'color': '#ffffff', 'goals': 10},
+        {'team_id': 'esp1', 'name': 'Madrid', 'country_id': 'spain', 'color': '#ffffff', 'goals': 20},
+    ])
+
+
+async def test_sharded_increments_are_summed_with_the_team_counter(teams):
+    for goals in (1, 2, 3, 4, 5):
+        team_ops, shard_ops = goal_counters.increment_ops({'arg1': goals, 'esp1': goals})
+        assert list(team_ops) == ['esp1'] and list(shard_ops) == ['arg1']
+        await teams_collection.bulk_write(list(team_ops.values()))
+        await team_goal_shards_collection.bulk_write(list(shard_ops.values()))
+
+    assert 1 <= await team_goal_shards_collection.count_documents({'team_id': 'arg1'}) <= 4
+    assert await goal_counters.shard_totals() == {'arg1': 15}
+    assert (await teams_collection.find_one({'team_id': 'arg1'}))['goals'] == 10
+
+    board = Leaderboard(reconcile_seconds=0)
+    await board.load()
+    assert board.ranked() == [(1, 'esp1', 35), (2, 'arg1', 25)]
+
+
+async def test_shards_past_a_lowered_count_are_still_summed(teams):
+    await team_goal_shards_collection.insert_many([
+        {'team_id': 'arg1', 'shard': 0, 'goals': 3},
+        {'team_id': 'arg1', 'shard': 7, 'goals': 4},
+    ])
+
+    assert await goal_counters.shard_totals() == {'arg1': 7}
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import history
+from database import game_sessions_collection
+from history import RecentGames
+from write_behind import GoalWriteBehind
+
+pytestmark = pytest.mark.anyio
+
+START = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def session(session_id, minutes, team_id='arg1'):
+    return {
+        'session_id': session_id,
+        'team_id': team_id,
+        'team_name': team_id,
+        'user_id': None,
+        'score': 1,
+        'timestamp': START + timedelta(minutes=minutes),
+    }
+
+
+def ids(ring, limit=10):
+    return [entry['session_id'] for entry in ring.latest(limit)]
+
+
+async def test_refresh_picks_up_other_workers_sessions():
+    ring = RecentGames(size=10)
+    await game_sessions_collection.insert_one(session('s1', 1))
+    await ring.load()
+
+    # Flushed by another worker, with a game timestamp older than ours
+    await game_sessions_collection.insert_one(session('s0', 0))
+    await ring.refresh()
+
+    assert ids(ring) == ['s1', 's0']
+
+
+async def test_refresh_does_not_repeat_sessions_recorded_here():
+    ring = RecentGames(size=10)
+    await ring.load()
+    ring.add(session('s1', 1))
+    await game_sessions_collection.insert_one(session('s1', 1))
+
+    await ring.refresh()
+    await ring.refresh()
+
+    assert ids(ring) == ['s1']
+
+
+async def test_refresh_keeps_the_newest_when_the_ring_is_full():
+    ring = RecentGames(size=2)
+    await game_sessions_collection.insert_many([session('s2', 2), session('s3', 3)])
+    await ring.load()
+
+    await game_sessions_collection.insert_many([session('s1', 1), session('s4', 4)])
+    await ring.refresh()
+
+    assert ids(ring, limit=2) == ['s4', 's3']
+    assert ring.latest(10, team_id='arg1') is None
+
+
+async def test_load_keeps_sessions_not_yet_flushed(monkeypatch):
+    writer = GoalWriteBehind()
+    monkeypatch.setattr(history, 'goal_writer', writer)
+    ring = RecentGames(size=10)
+    await game_sessions_collection.insert_one(session('s1', 1))
+    writer.add_session(session('s2', 2))
+
+    await ring.load()
+    assert ids(ring) == ['s2', 's1']
+
+    await writer.flush()
+    await ring.load()
+    assert ids(ring) == ['s2', 's1']
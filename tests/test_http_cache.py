@@ -0,0 +1,43 @@
+import gzip
+
+import pytest
+from starlette.requests import Request
+
+from compression import CACHED_LEVELS, DYNAMIC_LEVELS, compress
+from http_cache import ResponseCache
+
+pytestmark = pytest.mark.anyio
+
+CONTENT = [{'team_id': f'team{i}', 'name': f'Team {i}', 'goals': 1000 - i} for i in range(200)]
+
+
+def request(path: str, accept_encoding: bytes = b'gzip') -> Request:
+    return Request({
+        'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'',
+        'headers': [(b'accept-encoding', accept_encoding)],
+    })
+
+
+@pytest.mark.parametrize('resources, levels', [
+    (('countries', 'teams', 'leaderboard'), DYNAMIC_LEVELS),
+    (('countries',), CACHED_LEVELS),
+])
+async def test_compression_level_follows_how_often_the_body_changes(resources, levels):
+    cache = ResponseCache()
+
+    response = await cache.respond(request('/api/teams'), resources, lambda: CONTENT, 60, 60)
+
+    raw = ResponseCache._encode(CONTENT)
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.body == compress(raw, 'gzip', levels['gzip'])
+    assert gzip.decompress(response.body) == raw
+
+
+async def test_brotli_is_preferred_when_installed():
+    brotli = pytest.importorskip('brotli')
+    cache = ResponseCache()
+
+    response = await cache.respond(request('/api/countries', b'gzip, br'), ('countries',), lambda: CONTENT, 60, 60)
+
+    assert response.headers['content-encoding'] == 'br'
+    assert brotli.decompress(response.body) == ResponseCache._encode(CONTENT)
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+import httpx
+import pytest
+
+from database import game_sessions_collection, session_idempotency_collection, teams_collection
+from indexes import ensure_indexes
+from reference_cache import reference_cache
+from write_behind import goal_writer
+
+pytestmark = pytest.mark.anyio
+
+GAME = {'team_id': 'arg1', 'score': 3, 'idempotency_key': 'game-key-0001'}
+
+
+@pytest.fixture
+async def client():
+    import server
+
+    await ensure_indexes()
+    await teams_collection.insert_one({'team_id': 'arg1', 'name': 'Gallinas', 'country_id': 'argentina',
+                                       'color': '#ffffff', 'goals': 10, 'created_at': datetime.utcnow()})
+    await reference_cache.load()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url='http://test') as client:
+        yield client
+    await goal_writer.flush()
+
+
+async def team_goals() -> int:
+    return (await teams_collection.find_one({'team_id': 'arg1'}))['goals']
+
+
+async def test_retry_returns_the_original_and_counts_it_once(client):
+    first = await client.post('/api/game/session', json=GAME)
+    retry = await client.post('/api/game/session', json=GAME)
+    await goal_writer.flush()
+    again = await client.post('/api/game/session', json=GAME)
+    await goal_writer.flush()
+
+    assert first.json() == retry.json() == again.json()
+    assert await game_sessions_collection.count_documents({}) == 1
+    assert await team_goals() == 13
+
+
+async def test_retry_records_a_game_whose_worker_died_before_saving_it(client):
+    # Key claimed, then the worker died with the session still buffered
+    original = {'session_id': 'lost-session', 'team_id': 'arg1', 'team_name': 'Gallinas', 'user_id': None,
+                'score': 3, 'timestamp': datetime(2026, 5, 1, 12, 0, 0)}
+    await session_idempotency_collection.insert_one(
+        {'key': GAME['idempotency_key'], 'session': original, 'created_at': datetime.utcnow()}
+    )
+
+    retry = await client.post('/api/game/session', json=GAME)
+    again = await client.post('/api/game/session', json=GAME)
+    await goal_writer.flush()
+
+    assert retry.json()['session_id'] == again.json()['session_id'] == 'lost-session'
+    assert await game_sessions_collection.count_documents({'session_id': 'lost-session'}) == 1
+    assert await team_goals() == 13
+
+
+async def test_batch_retry_records_a_lost_game_once(client):
+    original = {'session_id': 'lost-session', 'team_id': 'arg1', 'team_name': 'Gallinas', 'user_id': None,
+                'score': 3, 'timestamp': datetime(2026, 5, 1, 12, 0, 0)}
+    await session_idempotency_collection.insert_one(
+        {'key': GAME['idempotency_key'], 'session': original, 'created_at': datetime.utcnow()}
+    )
+
+    response = await client.post('/api/game/sessions/batch', json=[GAME, GAME])
+
+    assert response.json()['duplicates'] == 2
+    assert await game_sessions_collection.count_documents({'session_id': 'lost-session'}) == 1
+    assert await team_goals() == 13
@@ -0,0 +1,115 @@
+from datetime import datetime
+
+import httpx
+import pytest
+
+from database import (
+    game_sessions_collection, stats_rollups_collection, team_goal_shards_collection, teams_collection
+)
+from invalidation import InvalidationBus, invalidation_bus
+from reference_cache import reference_cache
+from write_behind import GoalWriteBehind, goal_writer
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_other_workers_run_their_handlers_once_per_change():
+    calls = []
+    worker_a, worker_b = InvalidationBus(poll_seconds=0), InvalidationBus(poll_seconds=0)
+    worker_a.subscribe('teams', lambda: calls.append('a'))
+    worker_b.subscribe('teams', lambda: calls.append('b'))
+    await worker_a.load()
+    await worker_b.load()
+
+    await worker_a.publish('teams')
+    await worker_a.check()
+    await worker_b.check()
+    await worker_b.check()
+
+    assert calls == ['b']
+
+
+async def test_failed_reload_is_retried_on_the_next_poll():
+    attempts = []
+
+    def reload():
+        attempts.append(len(attempts))
+        if len(attempts) == 1:
+            raise RuntimeError("database unreachable")
+
+    worker_a, worker_b = InvalidationBus(poll_seconds=0), InvalidationBus(poll_seconds=0)
+    worker_b.subscribe('countries', reload)
+    await worker_b.load()
+
+    await worker_a.publish('countries')
+    await worker_b.check()
+    await worker_b.check()
+    await worker_b.check()
+
+    assert attempts == [0, 1]
+
+
+async def test_team_deleted_elsewhere_loses_its_buffered_games_here():
+    import server
+
+    await teams_collection.insert_many([
+        {'team_id': team_id, 'name': team_id, 'country_id': 'argentina', 'color': '#ffffff', 'goals': 0,
+         'created_at': datetime.utcnow()}
+        for team_id in ('arg1', 'arg2')
+    ])
+    # The server singletons are this worker; another worker deletes arg1
+    await invalidation_bus.load()
+    await reference_cache.load()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url='http://test') as client:
+        for team_id in ('arg1', 'arg2'):
+            assert (await client.post('/api/game/session', json={'team_id': team_id, 'score': 2})).status_code == 200
+
+        await teams_collection.delete_one({'team_id': 'arg1'})
+        await InvalidationBus(poll_seconds=0).publish('teams')
+        await invalidation_bus.check()
+
+        rejected = await client.post('/api/game/session', json={'team_id': 'arg1', 'score': 2})
+        batch = await client.post('/api/game/sessions/batch', json=[{'team_id': 'arg1', 'score': 2}])
+    await goal_writer.flush()
+
+    assert rejected.status_code == 404
+    assert batch.json()['results'][0]['error'] == 'Team not found'
+    assert await game_sessions_collection.distinct('team_id') == ['arg2']
+    assert goal_writer.pending_goals('arg1') == 0
+
+
+async def test_no_writes_of_a_deleted_team_survive_on_any_worker():
+    import server
+
+    await teams_collection.insert_many([
+        {'team_id': 'arg1', 'name': 'arg1', 'country_id': 'argentina', 'color': '#ffffff', 'goals': 0,
+         'goal_shards': 4, 'created_at': datetime.utcnow()},
+        {'team_id': 'arg2', 'name': 'arg2', 'country_id': 'argentina', 'color': '#ffffff', 'goals': 0,
+         'created_at': datetime.utcnow()},
+    ])
+    # The server singletons are worker B; worker A deletes arg1
+    await invalidation_bus.load()
+    await reference_cache.load()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url='http://test') as client:
+        async def play(team_id):
+            assert (await client.post('/api/game/session', json={'team_id': team_id, 'score': 2})).status_code == 200
+
+        await play('arg1')
+        await play('arg2')
+        await goal_writer.flush()
+        await play('arg1')
+
+        await teams_collection.delete_one({'team_id': 'arg1'})
+        await GoalWriteBehind().purge_teams(['arg1'])
+        await InvalidationBus(poll_seconds=0).publish('teams')
+
+        # B has not polled yet: it flushes what it buffered and accepts more
+        await goal_writer.flush()
+        await play('arg1')
+        await invalidation_bus.check()
+    await goal_writer.flush()
+
+    for collection in (game_sessions_collection, stats_rollups_collection, team_goal_shards_collection):
+        assert await collection.count_documents({'team_id': 'arg1'}) == 0
+    assert await game_sessions_collection.count_documents({'team_id': 'arg2'}) == 1
+    assert await stats_rollups_collection.count_documents({'team_id': 'arg2'}) == 3
@@ -0,0 +1,69 @@
+from datetime import datetime
+
+import pytest
+
+from database import countries_collection, teams_collection
+from leaderboard import Leaderboard
+from reference_cache import reference_cache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def board():
+    await countries_collection.insert_one(
+        {'country_id': 'argentina', 'name': 'Argentina', 'flag': '🇦🇷', 'color': '#75aadb'}
+    )
+    await teams_collection.insert_many([
+        {'team_id': team_id, 'name': name, 'country_id': 'argentina', 'color': '#ffffff', 'goals': goals,
+         'created_at': datetime.utcnow()}
+        for team_id, name, goals in [('arg1', 'Gallinas', 30), ('arg2', 'Bosta', 50), ('arg3', 'Academia', 30),
+                                     ('arg4', 'Rojo', 10)]
+    ])
+    await reference_cache.load()
+    board = Leaderboard(reconcile_seconds=0)
+    await board.load()
+    return board
+
+
+def ranks(entries):
+    return [(entry['rank'], entry['team_id'], entry['goals']) for entry in entries]
+
+
+async def test_ranks_by_goals_then_team_id(board):
+    assert board.ranked() == [(1, 'arg2', 50), (2, 'arg1', 30), (3, 'arg3', 30), (4, 'arg4', 10)]
+    assert board.rank('arg3') == 3
+    assert board.rank('missing') is None
+
+
+async def test_pages_keep_absolute_ranks(board):
+    assert ranks(board.page(offset=1, limit=2)) == [(2, 'arg1', 30), (3, 'arg3', 30)]
+    assert ranks(board.page(offset=3, limit=5)) == [(4, 'arg4', 10)]
+    assert board.page(offset=4) == []
+
+
+async def test_goals_move_a_team_and_report_the_change(board):
+    board.drain_changes()
+
+    board.add_goals('arg4', 25)
+
+    assert board.ranked(0, 3) == [(1, 'arg2', 50), (2, 'arg4', 35), (3, 'arg1', 30)]
+    assert board.drain_changes() == ({'arg4'}, False)
+
+
+async def test_team_missing_from_the_reference_cache_keeps_its_rank(board):
+    # e.g. reloaded by the reconciler before this worker's cache heard of it
+    reference_cache.remove_team('arg1')
+
+    entries = board.page()
+
+    assert ranks(entries) == [(1, 'arg2', 50), (2, 'arg1', 30), (3, 'arg3', 30), (4, 'arg4', 10)]
+    assert entries[1]['team_name'] == 'Gallinas' and entries[1]['country_name'] == 'Argentina'
+
+
+async def test_added_and_removed_teams(board):
+    board.add_team({'team_id': 'arg5', 'name': 'Cuervo', 'country_id': 'argentina', 'color': '#0000ff'})
+    board.remove_team('arg2')
+
+    assert board.ranked() == [(1, 'arg1', 30), (2, 'arg3', 30), (3, 'arg4', 10), (4, 'arg5', 0)]
+    assert board.page(offset=3)[0]['team_name'] == 'Cuervo'
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+import live
+from leaderboard import Leaderboard
+from live import LIVE_QUEUE_SIZE, LeaderboardBroadcaster
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def broadcaster(monkeypatch):
+    board = Leaderboard(reconcile_seconds=0)
+    for team_id, goals in [('arg1', 30), ('arg2', 20), ('arg3', 10), ('arg4', 5)]:
+        board.add_team({'team_id': team_id, 'name': team_id, 'country_id': 'argentina'}, goals)
+    monkeypatch.setattr(live, 'leaderboard', board)
+    # Ticks are driven by hand through publish()
+    broadcaster = LeaderboardBroadcaster(tick_ms=3_600_000)
+    broadcaster.start()
+    yield broadcaster
+    await broadcaster.close()
+
+
+def entries(frame):
+    return json.loads(frame.text)['entries']
+
+
+async def test_delta_carries_every_team_whose_rank_moved(broadcaster):
+    subscriber = broadcaster.subscribe()
+
+    live.leaderboard.add_goals('arg3', 15)
+    frame = broadcaster.publish()
+
+    assert (await subscriber.next_frame(1)) is frame
+    assert frame.seq == 1 and frame.kind == 'delta'
+    assert entries(frame) == [
+        {'team_id': 'arg3', 'rank': 2, 'goals': 25},
+        {'team_id': 'arg2', 'rank': 3, 'goals': 20},
+    ]
+    assert broadcaster.publish() is None
+
+
+async def test_snapshot_reflects_the_published_sequence(broadcaster):
+    live.leaderboard.add_goals('arg4', 100)
+    broadcaster.publish()
+    live.leaderboard.remove_team('arg2')
+    removed = broadcaster.publish()
+
+    snapshot = broadcaster.snapshot()
+
+    assert {'team_id': 'arg2', 'removed': True} in entries(removed)
+    assert snapshot.seq == removed.seq == 2
+    assert [(e['team_id'], e['rank'], e['goals']) for e in entries(snapshot)] == [
+        ('arg4', 1, 105), ('arg1', 2, 30), ('arg3', 3, 10)
+    ]
+
+
+async def test_subscriber_that_falls_behind_resyncs_from_a_snapshot(broadcaster):
+    subscriber = broadcaster.subscribe()
+
+    for _ in range(LIVE_QUEUE_SIZE + 1):
+        live.leaderboard.add_goals('arg4', 10)
+        broadcaster.publish()
+
+    frame = await subscriber.next_frame(1)
+    assert frame.kind == 'snapshot' and frame.seq == LIVE_QUEUE_SIZE + 1
+    assert await subscriber.next_frame(0.05) is None
@@ -0,0 +1,45 @@
+import httpx
+import pytest
+
+import metrics
+from reference_cache import reference_cache
+
+pytestmark = pytest.mark.anyio
+
+
+def test_histogram_renders_cumulative_buckets_per_label_set():
+    latency = metrics.Histogram('test_latency_seconds', 'Test latency', ['route'], buckets=(0.1, 1.0))
+    latency.observe(0.05, route='/a')
+    latency.observe(0.5, route='/a')
+    latency.observe(3, route='/b "quoted"')
+
+    assert latency.render() == [
+        '# HELP test_latency_seconds Test latency',
+        '# TYPE test_latency_seconds histogram',
+        'test_latency_seconds_bucket{route="/a",le="0.1"} 1',
+        'test_latency_seconds_bucket{route="/a",le="1.0"} 2',
+        'test_latency_seconds_bucket{route="/a",le="+Inf"} 2',
+        'test_latency_seconds_sum{route="/a"} 0.55',
+        'test_latency_seconds_count{route="/a"} 2',
+        'test_latency_seconds_bucket{route="/b \\"quoted\\"",le="0.1"} 0',
+        'test_latency_seconds_bucket{route="/b \\"quoted\\"",le="1.0"} 0',
+        'test_latency_seconds_bucket{route="/b \\"quoted\\"",le="+Inf"} 1',
+        'test_latency_seconds_sum{route="/b \\"quoted\\""} 3.0',
+        'test_latency_seconds_count{route="/b \\"quoted\\""} 1',
+    ]
+
+
+async def test_requests_are_labelled_by_route_template():
+    import server
+
+    await reference_cache.load()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url='http://test') as client:
+        await client.get('/api/countries/argentina/teams')
+        await client.get('/api/countries/spain/teams')
+        await client.get('/api/no-such-route')
+        exposition = (await client.get('/metrics')).text
+
+    assert 'http_requests_total{method="GET",route="/api/countries/{country_id}/teams",status="200"}' in exposition
+    assert 'http_requests_total{method="GET",route="<unmatched>",status="404"}' in exposition
+    assert 'argentina' not in exposition and 'no-such-route' not in exposition
+    assert 'http_requests_in_flight{method="GET"} 1' in exposition
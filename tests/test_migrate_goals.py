@@ -0,0 +1,41 @@
+from datetime import datetime
+
+import pytest
+
+from database import game_sessions_collection, goals_collection
+from migrate_goals import GOALS_VIEW_PIPELINE, compare
+from write_behind import goal_writer
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_view_exposes_the_records_dual_mode_writes(monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, 'GOALS_STORAGE_MODE', 'dual')
+    for index, (team_id, score) in enumerate([('arg1', 3), ('arg1', 0), ('esp1', 5)]):
+        server._record_game_session({
+            'session_id': f'session{index}', 'team_id': team_id, 'team_name': team_id.upper(),
+            'user_id': 'user1' if index else None, 'score': score, 'timestamp': datetime(2026, 5, 1, 12, index),
+        })
+    await goal_writer.flush()
+
+    view = await game_sessions_collection.aggregate(GOALS_VIEW_PIPELINE).to_list(None)
+    written = await goals_collection.find({}, {'_id': 0}).to_list(None)
+
+    assert sorted(view, key=lambda goal: goal['goal_id']) == sorted(written, key=lambda goal: goal['goal_id'])
+    assert [goal['goal_id'] for goal in written] == ['session0', 'session2']
+
+
+async def test_compare_reports_teams_whose_totals_differ():
+    await game_sessions_collection.insert_many([
+        {'session_id': 's1', 'team_id': 'arg1', 'score': 3},
+        {'session_id': 's2', 'team_id': 'esp1', 'score': 2},
+        {'session_id': 's3', 'team_id': 'esp1', 'score': 0},
+    ])
+    await goals_collection.insert_many([
+        {'goal_id': 's1', 'team_id': 'arg1', 'score': 3},
+        {'goal_id': 'lost', 'team_id': 'ita1', 'score': 1},
+    ])
+
+    assert await compare('goals') == {'esp1': (0, 2), 'ita1': (1, 0)}
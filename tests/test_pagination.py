@@ -0,0 +1,87 @@
+from datetime import datetime
+
+import httpx
+import pytest
+
+from auth import create_access_token
+from database import countries_collection, game_sessions_collection, teams_collection, users_collection
+from leaderboard import leaderboard
+from pagination import NEXT_CURSOR_HEADER, build_query, fetch_page
+from reference_cache import reference_cache
+
+pytestmark = pytest.mark.anyio
+
+NOON = datetime(2026, 5, 1, 12, 0)
+ONE = datetime(2026, 5, 1, 13, 0)
+
+
+@pytest.fixture
+async def client():
+    import server
+
+    token = create_access_token({'sub': 'admin', 'username': 'admin', 'role': 'admin'})
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=server.app), base_url='http://test',
+        headers={'Authorization': f'Bearer {token}'}
+    ) as client:
+        yield client
+
+
+async def test_cursor_resumes_after_ties_on_the_leading_field():
+    # Sessions sharing a timestamp are told apart by session_id
+    await game_sessions_collection.insert_many([
+        {'session_id': session_id, 'team_id': 'arg1', 'score': 1, 'timestamp': timestamp}
+        for session_id, timestamp in [('a', NOON), ('b', ONE), ('c', NOON), ('d', ONE), ('e', NOON)]
+    ])
+    sort_fields = ('timestamp', 'session_id')
+
+    seen, cursor = [], None
+    while True:
+        query = build_query(sort_fields, cursor, {'team_id': 'arg1'}, descending=True)
+        page, cursor = await fetch_page(game_sessions_collection, query, sort_fields, 2, descending=True)
+        seen.append([session['session_id'] for session in page])
+        if cursor is None:
+            break
+
+    assert seen == [['d', 'b'], ['e', 'c'], ['a']]
+
+
+async def test_admin_listing_is_followed_through_the_next_cursor_header(client):
+    await users_collection.insert_many([
+        {'user_id': f'user{i}', 'username': f'player{i}', 'email': f'player{i}@example.com', 'role': 'user',
+         'password_hash': 'x', 'created_at': NOON if i % 2 else ONE}
+        for i in range(5)
+    ])
+
+    pages, after = [], None
+    while True:
+        response = await client.get('/api/admin/users', params={'limit': 2, **({'after': after} if after else {})})
+        assert response.status_code == 200
+        pages.append([user['user_id'] for user in response.json()])
+        after = response.headers.get(NEXT_CURSOR_HEADER)
+        if after is None:
+            break
+
+    assert pages == [['user1', 'user3'], ['user0', 'user2'], ['user4']]
+    assert 'password_hash' not in response.json()[0]
+    assert (await client.get('/api/admin/users', params={'after': 'not-a-cursor'})).status_code == 400
+
+
+async def test_dashboard_totals_are_counted_on_the_server(client):
+    await countries_collection.insert_one({'country_id': 'argentina', 'name': 'Argentina', 'flag': '🇦🇷',
+                                           'color': '#75aadb'})
+    await teams_collection.insert_many([
+        {'team_id': f'arg{i}', 'name': f'Team {i}', 'country_id': 'argentina', 'color': '#ffffff', 'goals': i}
+        for i in range(4)
+    ])
+    await users_collection.insert_many([
+        {'user_id': f'user{i}', 'username': f'player{i}', 'email': f'player{i}@example.com', 'role': 'user',
+         'password_hash': 'x', 'created_at': NOON}
+        for i in range(3)
+    ])
+    await reference_cache.load()
+    await leaderboard.load()
+
+    response = await client.get('/api/admin/summary')
+
+    assert response.json() == {'total_countries': 1, 'total_teams': 4, 'total_goals': 6, 'total_users': 3}
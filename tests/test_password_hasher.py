@@ -0,0 +1,37 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from auth import PasswordHasher
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_cancelled_request_keeps_its_slot_until_the_thread_finishes():
+    hasher = PasswordHasher(workers=1, queue_limit=0)
+    started, release = threading.Event(), threading.Event()
+
+    def slow_hash(password):
+        started.set()
+        release.wait(5)
+        return password
+
+    request = asyncio.create_task(hasher._run('hash', slow_hash, 'secret'))
+    await asyncio.to_thread(started.wait, 5)
+    request.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await request
+
+    with pytest.raises(HTTPException) as rejected:
+        await hasher.hash('another')
+    assert rejected.value.status_code == 503
+
+    release.set()
+    for _ in range(100):
+        if not hasher._pending:
+            break
+        await asyncio.sleep(0.01)
+    assert await hasher._run('hash', lambda password: password, 'again') == 'again'
+    hasher.shutdown()
@@ -0,0 +1,43 @@
+import asyncio
+import logging
+
+import pytest
+
+from periodic import PeriodicTask
+
+pytestmark = pytest.mark.anyio
+
+logger = logging.getLogger(__name__)
+
+
+async def test_keeps_running_after_a_failure(caplog):
+    calls = []
+
+    def action():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+
+    task = PeriodicTask(action, 0.01, logger, "Action failed")
+    task.start()
+    await asyncio.sleep(0.1)
+    await task.close()
+
+    assert len(calls) > 1
+    assert "Action failed" in caplog.text
+    assert not task.running
+
+
+async def test_wakeup_runs_the_action_before_the_interval_ends():
+    ran = asyncio.Event()
+
+    async def action():
+        ran.set()
+
+    wakeup = asyncio.Event()
+    task = PeriodicTask(action, 60, logger, "Action failed", wakeup=wakeup)
+    task.start()
+    wakeup.set()
+    await asyncio.wait_for(ran.wait(), 1)
+    await task.close()
+    await task.close()
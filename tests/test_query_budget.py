@@ -0,0 +1,61 @@
+from datetime import datetime
+
+import httpx
+import pytest
+
+from auth import create_access_token
+from database import countries_collection, teams_collection
+from instrumentation import assert_max_queries
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def client():
+    import server
+
+    now = datetime.utcnow()
+    await countries_collection.insert_many([
+        {'country_id': 'argentina', 'name': 'Argentina', 'flag': '🇦🇷', 'color': '#75aadb', 'created_at': now},
+        {'country_id': 'spain', 'name': 'Spain', 'flag': '🇪🇸', 'color': '#c60b1e', 'created_at': now},
+    ])
+    await teams_collection.insert_many([
+        {'team_id': 'arg1', 'name': 'Gallinas', 'country_id': 'argentina', 'color': '#ffffff', 'goals': 10,
+         'created_at': now},
+        {'team_id': 'esp1', 'name': 'Madrid', 'country_id': 'spain', 'color': '#ffffff', 'goals': 20,
+         'created_at': now},
+    ])
+    for handler in server.app.router.on_startup:
+        await handler()
+    token = create_access_token({'sub': 'admin', 'username': 'admin', 'role': 'admin'})
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=server.app), base_url='http://test',
+        headers={'Authorization': f'Bearer {token}'}
+    ) as client:
+        yield client
+    for handler in server.app.router.on_shutdown:
+        await handler()
+
+
+async def test_counts_collection_calls_of_the_in_memory_database():
+    with assert_max_queries(10) as log:
+        await teams_collection.find_one({'team_id': 'arg1'})
+        await teams_collection.find({'country_id': 'spain'}).to_list(None)
+
+    assert log.count == 2
+    assert log.shapes['teams.find {"team_id": "?"}'] == 1
+    with pytest.raises(AssertionError, match='at most 0 queries, got 1'):
+        with assert_max_queries(0):
+            await teams_collection.count_documents({})
+
+
+# One test, since the app's background tasks stay bound to the event loop they started on
+async def test_hot_reads_stay_within_their_query_budget(client):
+    with assert_max_queries(0):
+        response = await client.get('/api/leaderboard')
+    assert [entry['team_id'] for entry in response.json()] == ['esp1', 'arg1']
+
+    with assert_max_queries(1) as log:
+        response = await client.get('/api/stats/teams')
+    assert response.status_code == 200
+    assert [shape.split()[0] for shape in log.shapes] == ['game_sessions.aggregate']
@@ -0,0 +1,63 @@
+from datetime import datetime
+
+import httpx
+import pytest
+
+from auth import create_access_token
+from database import countries_collection, teams_collection
+from instrumentation import assert_max_queries
+from reference_cache import ReferenceCache, reference_cache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def client():
+    import server
+
+    now = datetime.utcnow()
+    await countries_collection.insert_many([
+        {'country_id': 'argentina', 'name': 'Argentina', 'flag': '🇦🇷', 'color': '#75aadb', 'created_at': now},
+        {'country_id': 'spain', 'name': 'Spain', 'flag': '🇪🇸', 'color': '#c60b1e', 'created_at': now},
+    ])
+    await teams_collection.insert_one({'team_id': 'arg1', 'name': 'Gallinas', 'country_id': 'argentina',
+                                       'color': '#ffffff', 'goals': 10, 'created_at': now})
+    await reference_cache.load()
+    token = create_access_token({'sub': 'admin', 'username': 'admin', 'role': 'admin'})
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=server.app), base_url='http://test',
+        headers={'Authorization': f'Bearer {token}'}
+    ) as client:
+        yield client
+
+
+async def test_moving_a_team_updates_both_countries():
+    cache = ReferenceCache()
+    cache.set_team({'team_id': 'arg1', 'name': 'Gallinas', 'country_id': 'argentina'})
+
+    cache.set_team({'team_id': 'arg1', 'name': 'Gallinas', 'country_id': 'spain'})
+
+    assert cache.country_teams('argentina') == []
+    assert [team['team_id'] for team in cache.country_teams('spain')] == ['arg1']
+
+
+async def test_team_writes_check_the_country_without_querying_it(client):
+    with assert_max_queries(10) as log:
+        created = await client.post('/api/admin/teams', json={
+            'team_id': 'esp1', 'name': 'Madrid', 'country_id': 'spain', 'color': '#ffffff'
+        })
+        moved = await client.put('/api/admin/teams/arg1', json={'country_id': 'spain'})
+
+    assert created.status_code == moved.status_code == 200
+    assert created.json()['country_name'] == moved.json()['country_name'] == 'Spain'
+    assert not [shape for shape in log.shapes if shape.startswith('countries.')]
+
+
+async def test_team_writes_reject_an_unknown_country(client):
+    created = await client.post('/api/admin/teams', json={
+        'team_id': 'fra1', 'name': 'Paris', 'country_id': 'france', 'color': '#ffffff'
+    })
+    moved = await client.put('/api/admin/teams/arg1', json={'country_id': 'france'})
+
+    assert created.status_code == moved.status_code == 404
+    assert await teams_collection.count_documents({'team_id': 'fra1'}) == 0
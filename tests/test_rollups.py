@@ -0,0 +1,80 @@
+from datetime import datetime
+
+import pytest
+
+import rollups
+from database import game_sessions_collection, stats_rollups_collection
+from reference_cache import reference_cache
+from write_behind import GoalWriteBehind
+
+pytestmark = pytest.mark.anyio
+
+SESSIONS = [
+    ('arg1', datetime(2026, 5, 1, 12, 10), 3),
+    ('arg1', datetime(2026, 5, 1, 12, 50), 5),
+    ('arg1', datetime(2026, 5, 1, 13, 5), 0),
+    ('esp1', datetime(2026, 5, 2, 9, 0), 2),
+]
+
+
+async def test_increments_add_up_per_bucket_and_granularity():
+    pending = {}
+    for team_id, timestamp, score in SESSIONS:
+        rollups.accumulate(pending, team_id, timestamp, score)
+    await stats_rollups_collection.bulk_write(rollups.rollup_ops(pending))
+    # A second flush adds to the same buckets
+    second = {}
+    rollups.accumulate(second, 'arg1', datetime(2026, 5, 1, 12, 30), 1)
+    await stats_rollups_collection.bulk_write(rollups.rollup_ops(second))
+
+    hour = await stats_rollups_collection.find_one(
+        {'granularity': 'hour', 'bucket': datetime(2026, 5, 1, 12), 'team_id': 'arg1'}, {'_id': 0}
+    )
+    assert hour == {'granularity': 'hour', 'bucket': datetime(2026, 5, 1, 12), 'team_id': 'arg1',
+                    'goals': 9, 'games': 3, 'max_score': 5}
+    assert await rollups.team_totals('month', datetime(2026, 5, 1)) == {
+        'arg1': {'goals': 9, 'games': 4, 'max_score': 5},
+        'esp1': {'goals': 2, 'games': 1, 'max_score': 2},
+    }
+    assert [period['total_games'] for period in await rollups.period_totals('day', datetime(2026, 5, 1))] == [4, 1]
+
+
+async def test_backfill_overwrites_buckets_with_the_stored_sessions():
+    await game_sessions_collection.insert_many([
+        {'session_id': f's{i}', 'team_id': team_id, 'timestamp': timestamp, 'score': score}
+        for i, (team_id, timestamp, score) in enumerate(SESSIONS)
+    ])
+    await stats_rollups_collection.insert_one(
+        {'granularity': 'day', 'bucket': datetime(2026, 5, 1), 'team_id': 'arg1', 'goals': 99, 'games': 99,
+         'max_score': 99}
+    )
+
+    assert await rollups.backfill('day') == 2
+    assert await rollups.backfill('day') == 2
+
+    assert await rollups.team_totals('day', datetime(2026, 5, 1)) == {
+        'arg1': {'goals': 8, 'games': 3, 'max_score': 5},
+        'esp1': {'goals': 2, 'games': 1, 'max_score': 2},
+    }
+
+
+async def test_backfill_refuses_to_run_while_a_writer_is_flushing(capsys):
+    await GoalWriteBehind().flush()
+
+    assert await rollups.main('backfill') == 1
+    assert 'stop every server' in capsys.readouterr().out
+    assert await stats_rollups_collection.count_documents({}) == 0
+
+
+async def test_team_stats_skip_buckets_without_games():
+    import server
+
+    reference_cache.set_team({'team_id': 'arg1', 'name': 'Gallinas', 'country_id': 'argentina'})
+    reference_cache.set_team({'team_id': 'esp1', 'name': 'Madrid', 'country_id': 'spain'})
+
+    stats = server._ranked_team_stats({
+        'arg1': {'goals': 0, 'games': 0, 'max_score': 3},
+        'esp1': {'goals': 5, 'games': 2, 'max_score': 4},
+    })
+
+    assert [(team.team_id, team.average_score) for team in stats] == [('esp1', 2.5)]
@@ -0,0 +1,84 @@
+import asyncio
+import io
+
+import httpx
+import pytest
+from fastapi import HTTPException, UploadFile
+
+import shirt_storage
+from auth import create_access_token
+from database import teams_collection
+from reference_cache import reference_cache
+from shirt_storage import SHIRT_URL_PREFIX, release_shirt, store_shirt
+
+pytestmark = pytest.mark.anyio
+
+PIL = pytest.importorskip('PIL.Image')
+
+
+@pytest.fixture(autouse=True)
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(shirt_storage, 'UPLOAD_DIR', tmp_path)
+    return tmp_path
+
+
+def png_bytes() -> bytes:
+    buffer = io.BytesIO()
+    PIL.new('RGBA', (12, 12), (255, 0, 0, 255)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def upload(data: bytes) -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename='shirt.png')
+
+
+async def test_stores_a_readable_image():
+    url = await store_shirt(upload(png_bytes()))
+
+    assert url.startswith(SHIRT_URL_PREFIX) and url.endswith('.png')
+
+
+async def test_rejects_garbage_behind_an_image_signature(upload_dir):
+    with pytest.raises(HTTPException) as error:
+        await store_shirt(upload(png_bytes()[:16] + b'not really a png' * 64))
+
+    assert error.value.status_code == 415
+    assert list(upload_dir.iterdir()) == []
+
+
+async def test_release_inside_the_grace_period_is_retried(upload_dir, monkeypatch):
+    monkeypatch.setattr(shirt_storage, 'SHIRT_GC_GRACE_SECONDS', 0.2)
+    url = await store_shirt(upload(png_bytes()))
+
+    await release_shirt(url)
+    assert len(list(upload_dir.iterdir())) == 1
+
+    await asyncio.sleep(0.4)
+    assert list(upload_dir.iterdir()) == []
+
+
+async def test_replacing_the_shirt_url_by_hand_releases_the_old_file(upload_dir, monkeypatch):
+    import server
+
+    monkeypatch.setattr(shirt_storage, 'SHIRT_GC_GRACE_SECONDS', 0)
+    url = await store_shirt(upload(png_bytes()))
+    await teams_collection.insert_many([
+        {'team_id': team_id, 'name': team_id, 'country_id': 'argentina', 'color': '#ffffff', 'goals': 0,
+         'shirt_design_url': url}
+        for team_id in ('arg1', 'arg2')
+    ])
+    await reference_cache.load()
+    token = create_access_token({'sub': 'admin', 'username': 'admin', 'role': 'admin'})
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=server.app), base_url='http://test',
+        headers={'Authorization': f'Bearer {token}'}
+    ) as client:
+        first = await client.put('/api/admin/teams/arg1', json={'shirt_design_url': 'https://example.com/a.png'})
+        # Still used by arg2
+        assert len(list(upload_dir.iterdir())) == 1
+        second = await client.put('/api/admin/teams/arg2', json={'shirt_design_url': 'https://example.com/b.png'})
+
+    assert first.json()['shirt_design_url'] == 'https://example.com/a.png'
+    assert second.status_code == 200
+    assert list(upload_dir.iterdir()) == []
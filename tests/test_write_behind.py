@@ -0,0 +1,225 @@
+from datetime import datetime
+
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+import leaderboard as leaderboard_module
+import write_behind
+from database import (
+    game_sessions_collection, stats_rollups_collection, teams_collection, write_dead_letters_collection
+)
+from leaderboard import Leaderboard
+from write_behind import GoalWriteBehind
+
+pytestmark = pytest.mark.anyio
+
+
+class FaultyCollection:
+    """Wraps a collection and makes chosen writes fail the way MongoDB reports them.
+
+    `reject(item)` picks inserted documents or bulk operations that are
+    refused one by one (a BulkWriteError for just those); `outages` is the
+    number of calls that fail as a whole, after writing the first
+    `partial` items of the call.
+    """
+
+    def __init__(self, collection, reject=lambda item: False, outages: int = 0, partial: int = 0):
+        self.collection = collection
+        self.name = collection.name
+        self.reject = reject
+        self.outages = outages
+        self.partial = partial
+
+    def __getattr__(self, name):
+        # Reads go straight through
+        return getattr(self.collection, name)
+
+    async def insert_many(self, documents, ordered=True):
+        await self._write(documents, lambda items: self.collection.insert_many(items, ordered=ordered))
+
+    async def bulk_write(self, requests, ordered=True):
+        await self._write(requests, lambda items: self.collection.bulk_write(items, ordered=ordered))
+
+    async def _write(self, items, write):
+        if self.outages:
+            self.outages -= 1
+            if self.partial:
+                await write(items[:self.partial])
+            raise AutoReconnect("connection reset")
+        accepted = [item for item in items if not self.reject(item)]
+        if accepted:
+            try:
+                await write(accepted)
+            except BulkWriteError as e:
+                # Report indexes relative to the caller's list
+                positions = [index for index, item in enumerate(items) if not self.reject(item)]
+                errors = [{**err, 'index': positions[err['index']]} for err in e.details['writeErrors']]
+                raise BulkWriteError({'writeErrors': errors})
+        errors = [
+            {'index': index, 'code': 121, 'errmsg': 'Document failed validation'}
+            for index, item in enumerate(items) if self.reject(item)
+        ]
+        if errors:
+            raise BulkWriteError({'writeErrors': errors})
+
+
+def session(session_id: str, team_id: str = 'arg1', score: int = 2) -> dict:
+    return {
+        'session_id': session_id, 'team_id': team_id, 'team_name': team_id, 'user_id': None,
+        'score': score, 'timestamp': datetime(2026, 5, 1, 12, 0, 0)
+    }
+
+
+async def team_goals(team_id: str) -> int:
+    return (await teams_collection.find_one({'team_id': team_id}))['goals']
+
+
+@pytest.fixture
+async def teams():
+    await teams_collection.insert_many([
+        {'team_id': 'arg1', 'name': 'Gallinas', 'goals': 10},
+        {'team_id': 'esp1', 'name': 'Cule', 'goals': 20},
+    ])
+
+
+async def test_rejected_session_is_dead_lettered_without_blocking_the_batch(teams, monkeypatch):
+    monkeypatch.setattr(write_behind, 'game_sessions_collection', FaultyCollection(
+        game_sessions_collection, reject=lambda document: document['session_id'] == 'bad'
+    ))
+    writer = GoalWriteBehind()
+    for session_id in ('s1', 'bad', 's2'):
+        writer.add_session(session(session_id))
+
+    await writer.flush()
+
+    assert await game_sessions_collection.count_documents({}) == 2
+    dead = await write_dead_letters_collection.find_one({})
+    assert dead['collection'] == 'game_sessions' and dead['document']['session_id'] == 'bad'
+    # Later stages still ran and nothing is left to retry
+    assert await team_goals('arg1') == 16
+    assert writer.pending_goals('arg1') == 0
+    await writer.flush()
+    assert await team_goals('arg1') == 16
+
+
+async def test_partially_inserted_sessions_are_not_duplicated_on_retry(teams, monkeypatch):
+    monkeypatch.setattr(write_behind, 'game_sessions_collection', FaultyCollection(
+        game_sessions_collection, outages=1, partial=2
+    ))
+    writer = GoalWriteBehind()
+    for index in range(4):
+        writer.add_session(session(f's{index}'))
+
+    with pytest.raises(AutoReconnect):
+        await writer.flush()
+    assert await game_sessions_collection.count_documents({}) == 2
+    assert writer.pending_goals('arg1') == 8
+
+    await writer.flush()
+    assert await game_sessions_collection.count_documents({}) == 4
+    assert await team_goals('arg1') == 18
+    assert await write_dead_letters_collection.count_documents({}) == 0
+
+
+async def test_session_written_by_another_worker_is_not_counted_twice(teams):
+    await game_sessions_collection.create_index('session_id', unique=True)
+    # A replayed game another worker re-recorded and flushed first
+    await game_sessions_collection.insert_one(session('s1', 'arg1', 3))
+    writer = GoalWriteBehind()
+    writer.add_session(session('s1', 'arg1', 3))
+    writer.add_session(session('s2', 'arg1', 1))
+
+    await writer.flush()
+
+    assert await game_sessions_collection.count_documents({}) == 2
+    assert await team_goals('arg1') == 11
+    daily = await stats_rollups_collection.find_one({'granularity': 'day', 'team_id': 'arg1'})
+    assert daily['games'] == 1 and daily['goals'] == 1
+    assert await write_dead_letters_collection.count_documents({}) == 0
+
+
+async def test_only_session_written_elsewhere_leaves_no_empty_bucket(teams):
+    await game_sessions_collection.create_index('session_id', unique=True)
+    await game_sessions_collection.insert_one(session('s1', 'arg1', 3))
+    writer = GoalWriteBehind()
+    writer.add_session(session('s1', 'arg1', 3))
+
+    await writer.flush()
+
+    assert await stats_rollups_collection.count_documents({}) == 0
+    assert await team_goals('arg1') == 10
+
+
+async def test_failed_team_increment_stage_is_requeued_alone(teams, monkeypatch):
+    monkeypatch.setattr(write_behind, 'teams_collection', FaultyCollection(teams_collection, outages=1))
+    writer = GoalWriteBehind()
+    writer.add_session(session('s1', 'arg1', 3))
+    writer.add_session(session('s2', 'esp1', 1))
+
+    with pytest.raises(AutoReconnect):
+        await writer.flush()
+    assert writer.pending_goals('arg1') == 3
+    assert await team_goals('arg1') == 10
+
+    await writer.flush()
+    assert await team_goals('arg1') == 13
+    assert await team_goals('esp1') == 21
+    # Sessions and rollups were written by the first flush only
+    assert await game_sessions_collection.count_documents({}) == 2
+    daily = await stats_rollups_collection.find_one({'granularity': 'day', 'team_id': 'arg1'})
+    assert daily['games'] == 1 and daily['goals'] == 3
+
+
+async def test_team_increment_mongo_rejects_is_dead_lettered(teams, monkeypatch):
+    monkeypatch.setattr(write_behind, 'teams_collection', FaultyCollection(
+        teams_collection, reject=lambda op: op._filter == {'team_id': 'esp1'}
+    ))
+    writer = GoalWriteBehind()
+    writer.add_session(session('s1', 'arg1', 3))
+    writer.add_session(session('s2', 'esp1', 1))
+
+    await writer.flush()
+
+    assert await team_goals('arg1') == 13
+    assert writer.pending_goals('esp1') == 0
+    dead = await write_dead_letters_collection.find_one({'collection': 'teams'})
+    assert dead['document'] == {'team_id': 'esp1', 'goals': 1}
+
+
+async def test_close_dead_letters_what_the_final_flush_could_not_write(teams, monkeypatch):
+    monkeypatch.setattr(write_behind, 'game_sessions_collection', FaultyCollection(
+        game_sessions_collection, outages=1
+    ))
+    writer = GoalWriteBehind()
+    writer.add_session(session('s1', 'arg1', 3))
+
+    await writer.close()
+
+    assert writer.pending_goals('arg1') == 0
+    dead = await write_dead_letters_collection.find({}, {'_id': 0, 'collection': 1}).to_list(None)
+    assert sorted(letter['collection'] for letter in dead) == ['game_sessions', 'stats_rollups', 'stats_rollups',
+                                                              'stats_rollups', 'teams']
+
+
+async def test_full_buffer_turns_sessions_away():
+    writer = GoalWriteBehind(max_pending=2)
+    writer.add_session(session('s1'))
+    assert writer.has_room(1)
+    assert not writer.has_room(2)
+    writer.add_session(session('s2'))
+    assert not writer.has_room()
+
+
+async def test_leaderboard_load_counts_buffered_goals_once(teams, monkeypatch):
+    writer = GoalWriteBehind()
+    monkeypatch.setattr(leaderboard_module, 'goal_writer', writer)
+    board = Leaderboard(reconcile_seconds=0)
+    writer.add_session(session('s1', 'arg1', 4))
+
+    await board.load()
+    assert board.goals('arg1') == 14
+
+    await writer.flush()
+    await board.load()
+    assert board.goals('arg1') == 14
+    assert board.ranked() == [(1, 'esp1', 20), (2, 'arg1', 14)]